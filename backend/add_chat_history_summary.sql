@@ -0,0 +1,13 @@
+-- Add rolling history summary fields to chat_conversations
+
+-- Summary of the messages compacted out of the history sent to Gemini
+ALTER TABLE chat_conversations
+ADD COLUMN IF NOT EXISTS history_summary text;
+
+-- Number of leading messages the summary covers
+ALTER TABLE chat_conversations
+ADD COLUMN IF NOT EXISTS history_summary_count integer NOT NULL DEFAULT 0;
+
+-- Add comments for documentation
+COMMENT ON COLUMN chat_conversations.history_summary IS 'Rolling summary of older chat turns used for prompt compaction';
+COMMENT ON COLUMN chat_conversations.history_summary_count IS 'Number of leading messages covered by history_summary';
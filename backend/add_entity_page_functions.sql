@@ -0,0 +1,43 @@
+-- Batch listing of files and documents for many entities in one query
+
+-- Each function returns one page per requested key: rows are ranked within
+-- their key, newest first, and only the first per_key rows of every key are
+-- returned, so a busy entity cannot crowd the others out of a batch.
+-- keys is a JSON array of objects holding the key columns (entity_type,
+-- entity_id and, for documents, entity_field) and, past the first page, the
+-- created_at and id of the key's cursor row.
+
+CREATE OR REPLACE FUNCTION list_entity_files(keys jsonb, per_key integer, filter_category text DEFAULT NULL)
+RETURNS SETOF files
+LANGUAGE sql STABLE
+AS $$
+  SELECT (ranked.file).*
+  FROM (
+    SELECT f AS file,
+           row_number() OVER (PARTITION BY k.ordinality ORDER BY f.created_at DESC, f.id DESC) AS key_rank
+    FROM jsonb_populate_recordset(NULL::files, keys) WITH ORDINALITY AS k
+    JOIN files f ON f.entity_type = k.entity_type AND f.entity_id = k.entity_id
+    WHERE f.deleted_at IS NULL
+      AND (filter_category IS NULL OR f.category = filter_category)
+      AND (k.created_at IS NULL OR (f.created_at, f.id) < (k.created_at, k.id))
+  ) ranked
+  WHERE ranked.key_rank <= per_key;
+$$;
+
+-- A key without entity_field matches every field of its entity
+CREATE OR REPLACE FUNCTION list_entity_documents(keys jsonb, per_key integer, filter_category text DEFAULT NULL)
+RETURNS SETOF documents
+LANGUAGE sql STABLE
+AS $$
+  SELECT (ranked.document).*
+  FROM (
+    SELECT d AS document,
+           row_number() OVER (PARTITION BY k.ordinality ORDER BY d.created_at DESC, d.id DESC) AS key_rank
+    FROM jsonb_populate_recordset(NULL::documents, keys) WITH ORDINALITY AS k
+    JOIN documents d ON d.entity_type = k.entity_type AND d.entity_id = k.entity_id
+    WHERE (k.entity_field IS NULL OR d.entity_field = k.entity_field)
+      AND (filter_category IS NULL OR d.category = filter_category)
+      AND (k.created_at IS NULL OR (d.created_at, d.id) < (k.created_at, k.id))
+  ) ranked
+  WHERE ranked.key_rank <= per_key;
+$$;
@@ -1,147 +1,122 @@
-from fastapi import APIRouter, HTTPException, Header
-from typing import List, Optional
-import google.generativeai as genai
+from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi.responses import StreamingResponse
+from typing import List, Optional, Tuple
 from datetime import datetime
+import json
 
-from app.core.config import settings
-from app.core.supabase import get_supabase_client, supabase
+from app.core.auth import AuthenticatedUser, get_current_user, get_optional_user
+from app.core.pagination import decode_cursor, encode_cursor, parse_timestamp, project, select_columns
 from app.models.chat import ChatMessage, ChatRequest, ChatResponse
+from app.repositories import conversation_repository, message_repository
+from app.services import conversation_cache, conversation_history, gemini, history_compaction, response_cache
+from app.services.message_writer import message_writer
 
 router = APIRouter()
 
-# Configure Gemini with API key
-if settings.GEMINI_API_KEY:
-    genai.configure(api_key=settings.GEMINI_API_KEY)
+# Columns clients may request from /chat/history; id and created_at are always included for cursors
+HISTORY_FIELDS = ('id', 'conversation_id', 'content', 'sender', 'created_at')
 
 
 async def find_or_create_conversation(user_id: str, agent_id: str, startup_id: Optional[str] = None):
     """Find existing conversation or create new one"""
-    try:
+    async def load():
         # Try to find existing conversation
-        query = supabase.table('chat_conversations').select('*').eq('user_id', user_id).eq('agent_id', agent_id)
-
-        if startup_id:
-            query = query.eq('startup_id', startup_id)
-        else:
-            query = query.is_('startup_id', 'null')
-
-        result = query.order('last_message_at', desc=True).limit(1).execute()
-
-        if result.data and len(result.data) > 0:
-            return result.data[0]
+        conversation = await conversation_repository.find_latest(user_id, agent_id, startup_id)
+        if conversation:
+            return conversation
 
         # Create new conversation
-        new_conversation = {
-            'user_id': user_id,
-            'agent_id': agent_id,
-            'startup_id': startup_id,
-            'last_message_at': datetime.utcnow().isoformat()
-        }
+        return await conversation_repository.create(user_id, agent_id, startup_id)
 
-        result = supabase.table('chat_conversations').insert(new_conversation).execute()
-        return result.data[0]
+    try:
+        return await conversation_cache.get_conversation(
+            conversation_cache.cache_key(user_id, agent_id, startup_id),
+            load,
+            flight='create'
+        )
     except Exception as e:
         print(f"Error finding/creating conversation: {e}")
         return None
 
 
 async def save_message(conversation_id: str, content: str, sender: str):
-    """Save a message to the database"""
-    try:
-        message_data = {
-            'conversation_id': conversation_id,
-            'content': content,
-            'sender': sender
-        }
-
-        result = supabase.table('chat_messages').insert(message_data).execute()
-
-        # Update conversation's last_message_at
-        supabase.table('chat_conversations').update({
-            'last_message_at': datetime.utcnow().isoformat()
-        }).eq('id', conversation_id).execute()
+    """
+    Save a message to the database
 
-        return result.data[0] if result.data else None
+    The insert and the conversation's last_message_at update are written
+    behind by the message writer; the message is visible to server-side
+    history immediately.
+    """
+    try:
+        message = message_writer.enqueue(conversation_id, content, sender)
+        conversation_history.record_message(conversation_id, content, sender)
+        return message
     except Exception as e:
         print(f"Error saving message: {e}")
         return None
 
+async def start_conversation_turn(request: ChatRequest, user: Optional[AuthenticatedUser]):
+    """
+    Find or create the user's conversation, resolve the history to send and save the user message
+
+    Returns the conversation (None for anonymous requests), the request with
+    its history loaded if omitted and compacted to the token budget, and the
+    summary of older turns to send ahead of it.
+    """
+    # Find or create conversation (only for authenticated users)
+    conversation = None
+    if user:
+        conversation = await find_or_create_conversation(
+            user_id=user.id,
+            agent_id=request.agentId,
+            startup_id=request.startupId
+        )
+
+    # Resolve history before saving the new message so it isn't sent twice
+    request, summary = await history_compaction.compact_history(request, conversation)
+
+    # Save user message (if we have a conversation)
+    if conversation:
+        await save_message(
+            conversation_id=conversation['id'],
+            content=request.message,
+            sender='user'
+        )
+
+    return conversation, request, summary
+
+
+def unavailable_error(error: gemini.GenerationUnavailable) -> HTTPException:
+    """Map a rejected or over-quota generation to its status code with Retry-After"""
+    return HTTPException(
+        status_code=error.status_code,
+        detail=str(error),
+        headers={'Retry-After': str(error.retry_after)}
+    )
+
+
+def sse_event(event: str, data: dict) -> str:
+    """Format a Server-Sent Events message"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
 @router.post("/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest, authorization: Optional[str] = Header(None)):
+async def chat(request: ChatRequest, user: Optional[AuthenticatedUser] = Depends(get_optional_user)):
     """
     Process a chat request using Google Gemini AI and save to database
     """
     try:
-        # Extract user_id from JWT token
-        user_id = None
-        if authorization and authorization.startswith('Bearer '):
-            token = authorization.split(' ')[1]
-            try:
-                # Get user from token using Supabase
-                client = get_supabase_client(token)
-                user = client.auth.get_user(token)
-                if user and user.user:
-                    user_id = user.user.id
-            except Exception as e:
-                print(f"Error getting user from token: {e}")
-
-        # Find or create conversation (only if we have user_id)
-        conversation = None
-        if user_id:
-            conversation = await find_or_create_conversation(
-                user_id=user_id,
-                agent_id=request.agentId,
-                startup_id=request.startupId
-            )
-
-        # Save user message (if we have a conversation)
-        if conversation:
-            await save_message(
-                conversation_id=conversation['id'],
-                content=request.message,
-                sender='user'
-            )
+        # Reject before saving anything when the model is saturated
+        gemini.limiter.check_capacity()
 
-        # Initialize the model
-        model = genai.GenerativeModel(
-            model_name=settings.GEMINI_MODEL,
-            generation_config={
-                "temperature": settings.GEMINI_TEMPERATURE,
-                "max_output_tokens": settings.GEMINI_MAX_TOKENS,
-            }
-        )
+        conversation, request, summary = await start_conversation_turn(request, user)
 
-        # Prepare conversation history for Gemini
-        history = []
-
-        # Add system prompt as the first message if provided
-        if request.systemPrompt:
-            history.append({
-                "role": "user",
-                "parts": [f"System instruction: {request.systemPrompt}"]
-            })
-            history.append({
-                "role": "model",
-                "parts": ["Understood. I'll follow these instructions."]
-            })
-
-        # Add conversation history
-        for msg in request.conversationHistory:
-            # Map 'assistant' role to 'model' for Gemini
-            role = "model" if msg.role == "assistant" else msg.role
-            history.append({
-                "role": role,
-                "parts": [msg.content]
-            })
-
-        # Create a chat session with history
-        chat_session = model.start_chat(history=history)
-
-        # Send the current message and get response
-        response = chat_session.send_message(request.message)
-
-        # Extract the response text
-        ai_response = response.text
+        # Reuse an identical earlier reply if this agent's responses are cacheable
+        ai_response = response_cache.get(request, summary)
+        if ai_response is None:
+            # Send the current message with history and await the response text
+            ai_response = await gemini.generate_reply(request, summary)
+            response_cache.put(request, ai_response, summary)
 
         # Save agent response (if we have a conversation)
         if conversation:
@@ -153,62 +128,212 @@ async def chat(request: ChatRequest, authorization: Optional[str] = Header(None)
 
         return ChatResponse(response=ai_response)
 
+    except gemini.GenerationUnavailable as e:
+        raise unavailable_error(e)
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error communicating with Gemini: {str(e)}"
+        )
+
+
+@router.post("/chat/stream")
+async def chat_stream(request: ChatRequest, user: Optional[AuthenticatedUser] = Depends(get_optional_user)):
+    """
+    Stream a chat response as Server-Sent Events
+
+    Emits 'delta' events with text chunks as Gemini generates them, then a
+    'done' event with the full response, time-to-first-token and total
+    latency. The agent message is saved once the stream completes.
+
+    The first chunk is awaited before the response starts, so admission
+    rejections and upstream quota errors are returned as 429/503 with
+    Retry-After rather than as an error event.
+    """
+    timings = {}
+    chunks = None
+    first_chunk = None
+    try:
+        # Reject before saving anything when the model is saturated
+        gemini.limiter.check_capacity()
+
+        conversation, request, summary = await start_conversation_turn(request, user)
+
+        cached = response_cache.get(request, summary)
+        if cached is None:
+            chunks = gemini.stream_reply(request, timings, summary)
+            first_chunk = await anext(chunks, None)
+    except gemini.GenerationUnavailable as e:
+        raise unavailable_error(e)
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Error communicating with Gemini: {str(e)}"
         )
 
+    async def event_stream():
+        parts = []
+        try:
+            if cached is not None:
+                parts.append(cached)
+                timings['cached'] = True
+                yield sse_event('delta', {'text': cached})
+            else:
+                if first_chunk is not None:
+                    parts.append(first_chunk)
+                    yield sse_event('delta', {'text': first_chunk})
+                async for text in chunks:
+                    parts.append(text)
+                    yield sse_event('delta', {'text': text})
+        except Exception as e:
+            yield sse_event('error', {'detail': f"Error communicating with Gemini: {str(e)}"})
+            return
+        finally:
+            # Release the generation slot promptly if the client disconnects mid-stream
+            if chunks is not None:
+                await chunks.aclose()
+
+        ai_response = ''.join(parts)
+        if cached is None:
+            response_cache.put(request, ai_response, summary)
+
+        # Save agent response (if we have a conversation)
+        if conversation:
+            await save_message(
+                conversation_id=conversation['id'],
+                content=ai_response,
+                sender='agent'
+            )
+
+        yield sse_event('done', {'response': ai_response, **timings})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
+def history_projection(fields: Optional[str]) -> List[str]:
+    """Resolve a comma-separated fields parameter to the columns to return"""
+    return select_columns(fields, HISTORY_FIELDS)
+
+
+def with_queued_messages(
+    messages: List[dict],
+    queued: List[dict],
+    columns: List[str],
+    limit: int,
+    newest_first: bool,
+    cursor: Optional[Tuple[str, str]] = None,
+    since: Optional[str] = None
+) -> List[dict]:
+    """
+    Merge messages still queued in the message writer into a history page
+
+    Queued messages inside the page's window are added to the rows read
+    from the database (dropping any already written), and the page is
+    re-sorted and trimmed to limit.
+    """
+    def position(message: dict) -> Tuple[datetime, str]:
+        return parse_timestamp(message['created_at']), message['id']
+
+    seen = {message['id'] for message in messages}
+    boundary = (parse_timestamp(cursor[0]), cursor[1]) if cursor else None
+    for message in queued:
+        if message['id'] in seen:
+            continue
+        if since and parse_timestamp(message['created_at']) <= parse_timestamp(since):
+            continue
+        if boundary and (position(message) >= boundary if newest_first else position(message) <= boundary):
+            continue
+        seen.add(message['id'])
+        messages.append(project(message, columns))
+
+    messages.sort(key=position, reverse=newest_first)
+    return messages[:limit]
+
 
 @router.get("/chat/history")
 async def get_chat_history(
     agent_id: str,
     startup_id: Optional[str] = None,
-    authorization: Optional[str] = Header(None)
+    before: Optional[str] = None,
+    after: Optional[str] = None,
+    since: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    fields: Optional[str] = None,
+    user: AuthenticatedUser = Depends(get_current_user)
 ):
     """
-    Get chat history for a specific agent and user
+    Get a page of chat history for a specific agent and user
+
+    Without a cursor the most recent `limit` messages are returned. Pass the
+    returned before_cursor as `before` to page back through older messages,
+    and after_cursor as `after` (or a timestamp as `since`) to fetch only
+    messages newer than what the client already has. Messages within a page
+    are always in chronological order.
     """
     try:
-        # Extract user_id from JWT token
-        user_id = None
-        if authorization and authorization.startswith('Bearer '):
-            token = authorization.split(' ')[1]
-            try:
-                # Get user from token using Supabase
-                client = get_supabase_client(token)
-                user = client.auth.get_user(token)
-                if user and user.user:
-                    user_id = user.user.id
-            except Exception as e:
-                print(f"Error getting user from token: {e}")
-                raise HTTPException(status_code=401, detail="Invalid authentication")
-
-        if not user_id:
-            raise HTTPException(status_code=401, detail="Authentication required")
+        user_id = user.id
 
-        # Find conversation
-        query = supabase.table('chat_conversations').select('*').eq('user_id', user_id).eq('agent_id', agent_id)
+        if sum(1 for value in (before, after, since) if value) > 1:
+            raise HTTPException(status_code=400, detail="Use only one of before, after and since")
 
-        if startup_id:
-            query = query.eq('startup_id', startup_id)
-        else:
-            query = query.is_('startup_id', 'null')
+        columns = history_projection(fields)
 
-        conversation_result = query.order('last_message_at', desc=True).limit(1).execute()
+        # Find conversation
+        conversation = await conversation_cache.get_conversation(
+            conversation_cache.cache_key(user_id, agent_id, startup_id),
+            lambda: conversation_repository.find_latest(user_id, agent_id, startup_id)
+        )
 
-        if not conversation_result.data or len(conversation_result.data) == 0:
+        if not conversation:
             # No conversation found, return empty messages
-            return {"messages": []}
+            return {"messages": [], "has_more": False, "before_cursor": None, "after_cursor": after}
 
-        conversation = conversation_result.data[0]
+        newer = bool(after or since)
+        since_value = None
+        if since:
+            try:
+                since_value = parse_timestamp(since).isoformat()
+            except ValueError:
+                raise HTTPException(status_code=400, detail="Invalid since timestamp")
+
+        # Get one page of messages for this conversation, plus one row to detect more.
+        # Messages are written behind, so ones still queued are merged in; the queue
+        # is read before and after the query so a batch written meanwhile isn't missed.
+        cursor = decode_cursor(after or before) if (after or before) else None
+        queued = message_writer.pending_messages(conversation['id'])
+        messages = await message_repository.page(
+            conversation['id'],
+            ', '.join(columns),
+            limit + 1,
+            newest_first=not newer,
+            cursor=cursor,
+            since=since_value
+        )
+        messages = with_queued_messages(
+            messages,
+            queued + message_writer.pending_messages(conversation['id']),
+            columns,
+            limit + 1,
+            newest_first=not newer,
+            cursor=cursor,
+            since=since_value
+        )
 
-        # Get messages for this conversation
-        messages_result = supabase.table('chat_messages').select('*').eq(
-            'conversation_id', conversation['id']
-        ).order('created_at', desc=False).execute()
+        has_more = len(messages) > limit
+        messages = messages[:limit]
+        if not newer:
+            messages.reverse()
 
-        return {"messages": messages_result.data or []}
+        return {
+            "messages": messages,
+            "has_more": has_more,
+            "before_cursor": encode_cursor(messages[0]) if messages else None,
+            "after_cursor": encode_cursor(messages[-1]) if messages else after
+        }
 
     except HTTPException:
         raise
@@ -3,28 +3,23 @@ Document upload endpoints for WebDAV storage with Supabase
 Documents are similar to files but specifically for user-uploaded documents
 """
 
-from fastapi import APIRouter, UploadFile, File, HTTPException, Query, Depends, Header
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, UploadFile, File, HTTPException, Query, Depends, Request, Response
 from typing import Optional
 from datetime import datetime
 import uuid
-import requests
 
-from app.services.storage import storage_service
-from app.core.supabase import supabase
+from app.services.storage import async_storage_service as storage_service, UploadTooLargeError
+from app.services.file_proxy import proxy_storage_object, record_etag
+from app.services.metadata_cache import DOCUMENT_PROXY_FIELDS, document_metadata_cache
+from app.services.blob_references import release_blob, retain_blob
+from app.core.auth import AuthenticatedUser, get_optional_user
+from app.core.pagination import decode_cursor, encode_cursor, project, select_columns, set_page_headers
+from app.models.entities import EntityBatchRequest
+from app.repositories import document_repository
+from app.repositories.documents import DOCUMENT_COLUMNS
 
 router = APIRouter()
 
-async def get_optional_user_token(authorization: Optional[str] = Header(None)) -> Optional[str]:
-    """Get the user token if provided, otherwise return None"""
-    if not authorization:
-        return None
-    
-    if not authorization.startswith("Bearer "):
-        return None
-    
-    return authorization.replace("Bearer ", "")
-
 @router.post("/upload")
 async def upload_document(
     file: UploadFile = File(...),
@@ -35,14 +30,14 @@ async def upload_document(
     entity_id: Optional[str] = Query(default=None),
     entity_field: Optional[str] = Query(default=None),
     metadata: Optional[str] = Query(default=None),
-    access_token: Optional[str] = Depends(get_optional_user_token),
+    user: Optional[AuthenticatedUser] = Depends(get_optional_user),
 ):
     """
     Upload document to storage and save metadata to Supabase documents table
     """
     try:
         # Upload to WebDAV storage
-        upload_result = storage_service.upload_file(
+        upload_result = await storage_service.upload_file(
             file=file.file,
             filename=file.filename,
             category=category,
@@ -52,16 +47,8 @@ async def upload_document(
             metadata={"original_metadata": metadata} if metadata else None
         )
         
-        # Get current user from auth token if provided
-        user_id = None
-        if access_token:
-            try:
-                auth_response = supabase.auth.get_user(access_token)
-                if auth_response and auth_response.user:
-                    user_id = auth_response.user.id
-            except Exception as e:
-                # Log but don't fail if auth check fails
-                print(f"Warning: Could not get user from token: {e}")
+        # Current user from the auth token if provided
+        user_id = user.id if user else None
         
         # Save to Supabase documents table
         document_record = {
@@ -78,7 +65,7 @@ async def upload_document(
             'entity_type': entity_type,
             'entity_id': entity_id,
             'entity_field': entity_field,
-            'metadata': {"original_metadata": metadata} if metadata else {},
+            'metadata': {"original_metadata": metadata, "etag": upload_result['etag']} if metadata else {"etag": upload_result['etag']},
             'uploaded_by': user_id,  # Now properly set from auth
             'uploaded_at': datetime.now().isoformat(),
             'created_at': datetime.now().isoformat(),
@@ -86,68 +73,62 @@ async def upload_document(
         }
         
         # Insert into Supabase documents table
-        result = supabase.table('documents').insert(document_record).execute()
+        document = await document_repository.create(document_record)
+        
+        if storage_service.is_blob_key(document['storage_path']):
+            # A delete may have released the shared blob before this row referenced it
+            await retain_blob(document['storage_path'], file.file, file.content_type)
         
-        if result.data:
-            return {
-                "id": result.data[0]['id'],
-                "filename": result.data[0]['filename'],
-                "mime_type": result.data[0]['mime_type'],
-                "size_bytes": result.data[0]['size_bytes'],
-                "entity_type": result.data[0].get('entity_type'),
-                "entity_id": result.data[0].get('entity_id'),
-                "entity_field": result.data[0].get('entity_field'),
-                "url": f"/api/documents/{result.data[0]['id']}"
-            }
-        else:
-            raise Exception("Failed to save document record to database")
+        return {
+            "id": document['id'],
+            "filename": document['filename'],
+            "mime_type": document['mime_type'],
+            "size_bytes": document['size_bytes'],
+            "entity_type": document.get('entity_type'),
+            "entity_id": document.get('entity_id'),
+            "entity_field": document.get('entity_field'),
+            "url": f"/api/documents/{document['id']}"
+        }
             
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/{document_id}")
-async def get_document(document_id: str, download: bool = True):
+async def get_document(document_id: str, request: Request, download: bool = True):
     """
     Serve a document directly from storage
+    Supports byte ranges and conditional requests via the stored MD5 ETag
     """
     try:
-        # Get document metadata from Supabase
-        result = supabase.table('documents').select('*').eq('id', document_id).execute()
-        
-        if not result.data or len(result.data) == 0:
-            raise HTTPException(status_code=404, detail="Document not found")
-        
-        document_record = result.data[0]
+        # Get document metadata from the in-process cache, falling back to Supabase
+        document_record = document_metadata_cache.get(document_id)
+        if document_record is None:
+            document_record = await document_repository.get(document_id, DOCUMENT_PROXY_FIELDS)
+            
+            if not document_record:
+                raise HTTPException(status_code=404, detail="Document not found")
+            
+            document_metadata_cache.set(document_id, document_record)
         
         # Get the storage path
         storage_path = document_record.get('storage_path')
         if not storage_path:
             raise HTTPException(status_code=404, detail="Document path not found")
         
-        # Construct WebDAV URL
-        full_path = f"{storage_service.base_path}/{storage_path}"
-        webdav_url = f"{storage_service.base_url}{full_path}"
-        
-        # Fetch document from WebDAV storage with authentication
-        response = requests.get(
-            webdav_url,
-            auth=storage_service.auth,
-            stream=True
-        )
-        
-        if response.status_code != 200:
-            raise HTTPException(status_code=404, detail="Document not found in storage")
-        
-        # Stream the document back to the client with proper headers
+        # Stream from WebDAV storage, honouring Range and conditional headers
         # Use 'attachment' for downloads, 'inline' for viewing
         disposition = 'attachment' if download else 'inline'
-        return StreamingResponse(
-            response.iter_content(chunk_size=8192),
+        return await proxy_storage_object(
+            request,
+            storage_path,
             media_type=document_record.get('mime_type', 'application/octet-stream'),
-            headers={
-                'Cache-Control': 'public, max-age=86400',  # Cache for 1 day
-                'Content-Disposition': f'{disposition}; filename="{document_record.get("filename", "document")}"'
-            }
+            filename=document_record.get("filename", "document"),
+            disposition=disposition,
+            etag=record_etag(document_record),
+            last_modified=document_record.get('uploaded_at') or document_record.get('created_at'),
+            not_found_detail="Document not found in storage"
         )
     except HTTPException:
         raise
@@ -177,15 +158,16 @@ async def update_document(
         update_data['updated_at'] = datetime.now().isoformat()
 
         # Update in Supabase
-        result = supabase.table('documents').update(update_data).eq('id', document_id).execute()
+        document = await document_repository.update(document_id, update_data, 'id, title, description')
+        document_metadata_cache.pop(document_id)
 
-        if not result.data or len(result.data) == 0:
+        if not document:
             raise HTTPException(status_code=404, detail="Document not found")
 
         return {
-            "id": result.data[0]['id'],
-            "title": result.data[0].get('title'),
-            "description": result.data[0].get('description'),
+            "id": document['id'],
+            "title": document.get('title'),
+            "description": document.get('description'),
             "message": "Document updated successfully"
         }
     except HTTPException:
@@ -200,23 +182,31 @@ async def delete_document(document_id: str):
     """
     try:
         # Get document from Supabase
-        result = supabase.table('documents').select('storage_path').eq('id', document_id).execute()
+        document_record = await document_repository.get(document_id, 'storage_path')
         
-        if not result.data or len(result.data) == 0:
+        if not document_record:
             raise HTTPException(status_code=404, detail="Document not found")
         
-        document_record = result.data[0]
+        storage_path = document_record.get('storage_path')
+        
+        if storage_service.is_blob_key(storage_path):
+            # Shared blob: drop this reference first, the blob goes once nothing points at it
+            await document_repository.delete(document_id)
+            document_metadata_cache.pop(document_id)
+            await release_blob(storage_path)
+            return {"message": "Document deleted successfully"}
         
         # Delete from storage
         if document_record.get('storage_path'):
-            success = storage_service.delete_file(document_record['storage_path'])
+            success = await storage_service.delete_file(document_record['storage_path'])
             
             if not success:
                 # Log error but continue to delete from database
                 print(f"Warning: Failed to delete document from storage: {document_record['storage_path']}")
         
         # Delete from Supabase (hard delete for documents)
-        supabase.table('documents').delete().eq('id', document_id).execute()
+        await document_repository.delete(document_id)
+        document_metadata_cache.pop(document_id)
         
         return {"message": "Document deleted successfully"}
     except HTTPException:
@@ -229,30 +219,84 @@ async def delete_document(document_id: str):
 async def get_entity_documents(
     entity_type: str,
     entity_id: str,
+    response: Response,
     entity_field: Optional[str] = Query(default=None),
     category: Optional[str] = Query(default=None),
+    fields: Optional[str] = Query(default=None),
+    limit: int = Query(default=100, ge=1, le=500),
+    cursor: Optional[str] = Query(default=None),
+    include_total: bool = Query(default=False),
 ):
     """
-    Get all documents for a specific entity
+    Get a page of documents for a specific entity, newest first
+    The body is the list of documents; X-Next-Cursor carries the cursor for the next page
+    and X-Total-Count the number of matching documents when include_total is set.
     """
     try:
-        # Build query
-        query = supabase.table('documents').select('*').eq('entity_type', entity_type).eq('entity_id', entity_id)
-        
-        if entity_field:
-            query = query.eq('entity_field', entity_field)
-        if category:
-            query = query.eq('category', category)
-        
-        # Execute query with ordering
-        result = query.order('created_at', desc=True).execute()
-        
-        documents = result.data or []
+        # One extra row tells whether another page follows
+        documents, total = await document_repository.list_for_entity(
+            entity_type,
+            entity_id,
+            limit + 1,
+            cursor=decode_cursor(cursor) if cursor else None,
+            entity_field=entity_field,
+            category=category,
+            columns=', '.join(select_columns(fields, DOCUMENT_COLUMNS)),
+            with_total=include_total
+        )
+        has_more = len(documents) > limit
+        documents = documents[:limit]
         
         # Add URL for each document
         for doc in documents:
             doc['url'] = f"/api/documents/{doc['id']}"
         
+        set_page_headers(response, encode_cursor(documents[-1]) if has_more else None, total)
         return documents
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/entities")
+async def get_documents_for_entities(batch: EntityBatchRequest):
+    """
+    Get documents for many entities (optionally per entity_field) at once
+    Returns one group per requested key in request order, each paged on its own (limit
+    documents per key, newest first): while a group's has_more is true, send its next_cursor
+    back as that key's cursor.
+    """
+    try:
+        returned = select_columns(batch.fields, DOCUMENT_COLUMNS)
+        keys = [(key.entity_type, key.entity_id, key.entity_field) for key in batch.keys]
+        cursors = [decode_cursor(key.cursor) if key.cursor else None for key in batch.keys]
+        
+        # One extra row per key tells whether another page follows
+        pages = await document_repository.list_for_entities(
+            keys, batch.limit + 1, cursors, batch.category, ', '.join(returned)
+        )
+        
+        groups = []
+        for key, documents in zip(batch.keys, pages):
+            has_more = len(documents) > batch.limit
+            documents = documents[:batch.limit]
+            groups.append({
+                "entity_type": key.entity_type,
+                "entity_id": key.entity_id,
+                "entity_field": key.entity_field,
+                "documents": [
+                    {**project(doc, returned), "url": f"/api/documents/{doc['id']}"}
+                    for doc in documents
+                ],
+                "has_more": has_more,
+                "next_cursor": encode_cursor(documents[-1]) if has_more else None
+            })
+        
+        return {
+            "groups": groups,
+            "has_more": any(group["has_more"] for group in groups)
+        }
+    except HTTPException:
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
@@ -2,17 +2,44 @@
 File upload endpoints for WebDAV storage with Supabase
 """
 
-from fastapi import APIRouter, UploadFile, File, HTTPException, Query
-from fastapi.responses import JSONResponse, StreamingResponse
-from typing import Optional, List
-from datetime import datetime
+from fastapi import APIRouter, UploadFile, File, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse
+from typing import BinaryIO, Optional, List
 import uuid
+import time
 
-from app.services.storage import storage_service
-from app.core.supabase import supabase
+from app.services.storage import async_storage_service as storage_service, UploadTooLargeError
+from app.services.file_proxy import proxy_storage_object, record_etag
+from app.services.metadata_cache import FILE_PROXY_FIELDS, file_metadata_cache
+from app.services.blob_references import release_blob, retain_blob
+from app.services.resumable_upload import resumable_upload_service, ResumableUploadError
+from app.core.pagination import decode_cursor, encode_cursor, project, select_columns, set_page_headers
+from app.models.entities import EntityBatchRequest
+from app.repositories import file_repository
+from app.repositories.files import FILE_COLUMNS
 
 router = APIRouter()
 
+# Columns needed to sign URLs, selected even when not requested
+SIGNING_FIELDS = ('storage_path', 's3_key', 'is_public', 'mime_type')
+
+def _sign_private_files(files: List[dict], expires_in: int = 3600):
+    """Add a signed_url to every private file, signing them in one batch"""
+    private = [file for file in files if not file.get('is_public', False)]
+    urls = storage_service.generate_presigned_urls(
+        [(file.get('storage_path') or file.get('s3_key'), file.get('mime_type')) for file in private],
+        expires_in=expires_in
+    )
+    for file, url in zip(private, urls):
+        file['signed_url'] = url
+
+def _project_file(file: dict, columns: List[str]) -> dict:
+    """Keep the requested columns of a file, plus its signed URL if it has one"""
+    projected = project(file, columns)
+    if 'signed_url' in file:
+        projected['signed_url'] = file['signed_url']
+    return projected
+
 @router.post("/presigned-upload")
 async def get_presigned_upload_url(
     filename: str,
@@ -44,6 +71,7 @@ async def get_presigned_upload_url(
         # Return upload details
         return {
             "url": presigned_data["url"],
+            "resumable_url": presigned_data["resumable_url"],
             "fields": presigned_data["fields"],
             "s3_key": s3_key,
             "bucket": storage_service.bucket_name,
@@ -53,6 +81,45 @@ async def get_presigned_upload_url(
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+async def _save_file_record(
+    upload_result: dict,
+    filename: str,
+    mime_type: Optional[str],
+    category: str,
+    entity_type: Optional[str],
+    entity_id: Optional[str],
+    metadata: Optional[str],
+    source: Optional[BinaryIO] = None
+) -> dict:
+    """
+    Insert the files row for a completed upload and return it
+    source is the uploaded content, used to restore a shared blob released meanwhile
+    """
+    # Save to Supabase using SDK
+    file_record = {
+        'id': str(uuid.uuid4()),
+        'filename': filename,
+        'original_name': filename,
+        'mime_type': mime_type,
+        'size_bytes': upload_result['size_bytes'],
+        'bucket': upload_result['bucket'],
+        'category': category,
+        'entity_type': entity_type,
+        'entity_id': entity_id,
+        'is_public': False,
+        'metadata': {"original_metadata": metadata, "etag": upload_result['etag']} if metadata else {"etag": upload_result['etag']},
+        'storage_path': upload_result['s3_key']
+    }
+    
+    # Insert into Supabase
+    record = await file_repository.create(file_record)
+    
+    if storage_service.is_blob_key(record['storage_path']):
+        # A delete may have released the shared blob before this row referenced it
+        await retain_blob(record['storage_path'], source, mime_type)
+    
+    return record
+
 @router.post("/upload")
 async def upload_file(
     file: UploadFile = File(...),
@@ -66,7 +133,7 @@ async def upload_file(
     """
     try:
         # Upload to WebDAV storage
-        upload_result = storage_service.upload_file(
+        upload_result = await storage_service.upload_file(
             file=file.file,
             filename=file.filename,
             category=category,
@@ -76,76 +143,196 @@ async def upload_file(
             metadata={"original_metadata": metadata} if metadata else None
         )
         
-        # Save to Supabase using SDK
-        file_record = {
-            'id': str(uuid.uuid4()),
-            'filename': file.filename,
-            'original_name': file.filename,
-            'mime_type': file.content_type,
-            'size_bytes': upload_result['size_bytes'],
-            'bucket': upload_result['bucket'],
-            'category': category,
-            'entity_type': entity_type,
-            'entity_id': entity_id,
-            'is_public': False,
-            'metadata': {"original_metadata": metadata, "etag": upload_result['etag']} if metadata else {"etag": upload_result['etag']},
-            'storage_path': upload_result['s3_key']
+        return await _save_file_record(
+            upload_result,
+            filename=file.filename,
+            mime_type=file.content_type,
+            category=category,
+            entity_type=entity_type,
+            entity_id=entity_id,
+            metadata=metadata,
+            source=file.file
+        )
+            
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/uploads")
+async def initiate_resumable_upload(
+    token: str,
+    filename: str,
+    size_bytes: int,
+    content_type: Optional[str] = None,
+    category: str = "general",
+    entity_type: Optional[str] = None,
+    entity_id: Optional[str] = None,
+    metadata: Optional[str] = None,
+):
+    """
+    Start a resumable chunked upload using the token from /presigned-upload
+    Returns the upload id, part size and number of parts to PUT
+    """
+    claims = storage_service.validate_upload_token(token)
+    if not claims:
+        raise HTTPException(status_code=401, detail="Invalid or expired upload token")
+    
+    try:
+        manifest = resumable_upload_service.initiate(
+            claims,
+            filename=filename,
+            size_bytes=size_bytes,
+            content_type=content_type,
+            category=category,
+            entity_type=entity_type,
+            entity_id=entity_id,
+            metadata=metadata
+        )
+        return {
+            "upload_id": manifest['upload_id'],
+            "part_size": manifest['part_size'],
+            "total_parts": manifest['total_parts'],
+            "expires_at": manifest['expires_at']
         }
-        
-        # Insert into Supabase
-        result = supabase.table('files').insert(file_record).execute()
-        
-        if result.data:
-            return result.data[0]
-        else:
-            raise Exception("Failed to save file record to database")
+    except ResumableUploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.put("/uploads/{upload_id}/parts/{part_number}")
+async def upload_part(upload_id: str, part_number: int, request: Request):
+    """
+    Upload one numbered part as the raw request body
+    Parts may be sent in any order and in parallel; re-sending a part replaces it
+    """
+    try:
+        return await resumable_upload_service.write_part(upload_id, part_number, request.stream())
+    except ResumableUploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/uploads/{upload_id}")
+async def get_resumable_upload(upload_id: str):
+    """
+    Report received parts and offsets so a client can resume after a dropped connection
+    """
+    try:
+        return resumable_upload_service.status(upload_id)
+    except ResumableUploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+
+@router.post("/uploads/{upload_id}/complete")
+async def complete_resumable_upload(upload_id: str):
+    """
+    Assemble the staged parts into the stored object and save the file record
+    """
+    try:
+        manifest, reader = resumable_upload_service.begin_complete(upload_id)
+    except ResumableUploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    
+    try:
+        with reader:
+            upload_result = await storage_service.upload_file(
+                file=reader,
+                filename=manifest['filename'],
+                content_type=manifest['content_type'],
+                metadata={"original_metadata": manifest['metadata']} if manifest['metadata'] else None,
+                max_size=manifest['max_size'],
+                s3_key=manifest['s3_key']
+            )
             
+            file_record = await _save_file_record(
+                upload_result,
+                filename=manifest['filename'],
+                mime_type=manifest['content_type'],
+                category=manifest['category'],
+                entity_type=manifest['entity_type'],
+                entity_id=manifest['entity_id'],
+                metadata=manifest['metadata'],
+                source=reader
+            )
+    except UploadTooLargeError as e:
+        resumable_upload_service.release_complete(upload_id)
+        raise HTTPException(status_code=413, detail=str(e))
+    except Exception as e:
+        resumable_upload_service.release_complete(upload_id)
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    resumable_upload_service.abort(upload_id)
+    return file_record
+
+@router.delete("/uploads/{upload_id}")
+async def abort_resumable_upload(upload_id: str):
+    """
+    Discard a resumable upload and its staged parts
+    """
+    try:
+        resumable_upload_service.abort(upload_id)
+        return {"message": "Upload aborted"}
+    except ResumableUploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+
+@router.get("/access/{token}")
+async def access_signed_file(token: str, request: Request):
+    """
+    Serve a file through a signed URL from generate_presigned_url
+    The token carries the storage path and content type, so no database lookup is needed
+    """
+    try:
+        claims = storage_service.decode_signed_url(token)
+        if not claims:
+            raise HTTPException(status_code=403, detail="Invalid or expired signed URL")
+        
+        storage_path = claims['path']
+        return await proxy_storage_object(
+            request,
+            storage_path,
+            media_type=claims.get('content_type') or 'application/octet-stream',
+            filename=storage_path.rsplit('/', 1)[-1],
+            not_found_detail="File not found in storage",
+            # Private objects: only the requester may cache them, and no longer than the URL is valid
+            cache_control=f"private, max-age={max(int(claims['exp'] - time.time()), 0)}"
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/{file_id}")
-async def get_file(file_id: str):
+async def get_file(file_id: str, request: Request):
     """
     Serve a file directly from storage
     Simple endpoint that works with <img src="/api/files/{id}"> tags
+    Supports byte ranges and conditional requests via the stored MD5 ETag
     """
     try:
-        # Get file metadata from Supabase
-        result = supabase.table('files').select('*').eq('id', file_id).is_('deleted_at', 'null').execute()
-        
-        if not result.data or len(result.data) == 0:
-            raise HTTPException(status_code=404, detail="File not found")
-        
-        file_record = result.data[0]
+        # Get file metadata from the in-process cache, falling back to Supabase
+        file_record = file_metadata_cache.get(file_id)
+        if file_record is None:
+            file_record = await file_repository.get(file_id, FILE_PROXY_FIELDS)
+            
+            if not file_record:
+                raise HTTPException(status_code=404, detail="File not found")
+            
+            file_metadata_cache.set(file_id, file_record)
         
         # Get the storage path
         storage_path = file_record.get('storage_path') or file_record.get('s3_key')
         if not storage_path:
             raise HTTPException(status_code=404, detail="File path not found")
         
-        # Construct WebDAV URL
-        full_path = f"{storage_service.base_path}/{storage_path}"
-        webdav_url = f"{storage_service.base_url}{full_path}"
-        
-        # Fetch file from WebDAV storage with authentication
-        import requests
-        response = requests.get(
-            webdav_url,
-            auth=storage_service.auth,
-            stream=True
-        )
-        
-        if response.status_code != 200:
-            raise HTTPException(status_code=404, detail="File not found in storage")
-        
-        # Stream the file back to the client with proper headers
-        return StreamingResponse(
-            response.iter_content(chunk_size=8192),
+        # Stream from WebDAV storage, honouring Range and conditional headers
+        return await proxy_storage_object(
+            request,
+            storage_path,
             media_type=file_record.get('mime_type', 'application/octet-stream'),
-            headers={
-                'Cache-Control': 'public, max-age=86400',  # Cache for 1 day
-                'Content-Disposition': f'inline; filename="{file_record.get("filename", "file")}"'
-            }
+            filename=file_record.get("filename", "file"),
+            etag=record_etag(file_record),
+            last_modified=file_record.get('created_at'),
+            not_found_detail="File not found in storage"
         )
     except HTTPException:
         raise
@@ -161,21 +348,29 @@ async def delete_file(
     """
     try:
         # Get file from Supabase
-        result = supabase.table('files').select('s3_key').eq('id', file_id).is_('deleted_at', 'null').execute()
+        file_record = await file_repository.get(file_id, 'storage_path, s3_key')
         
-        if not result.data or len(result.data) == 0:
+        if not file_record:
             raise HTTPException(status_code=404, detail="File not found")
         
-        file_record = result.data[0]
+        storage_path = file_record.get('storage_path') or file_record.get('s3_key')
+        
+        if storage_service.is_blob_key(storage_path):
+            # Shared blob: drop this reference first, the blob goes once nothing points at it
+            await file_repository.soft_delete(file_id)
+            file_metadata_cache.pop(file_id)
+            await release_blob(storage_path)
+            return {"message": "File deleted successfully"}
         
         # Delete from storage
-        success = storage_service.delete_file(file_record['s3_key'])
+        success = await storage_service.delete_file(storage_path)
         
         if not success:
             raise HTTPException(status_code=500, detail="Failed to delete from storage")
         
         # Soft delete in Supabase
-        supabase.table('files').update({'deleted_at': datetime.now().isoformat()}).eq('id', file_id).execute()
+        await file_repository.soft_delete(file_id)
+        file_metadata_cache.pop(file_id)
         
         return {"message": "File deleted successfully"}
     except HTTPException:
@@ -187,32 +382,87 @@ async def delete_file(
 async def get_entity_files(
     entity_type: str,
     entity_id: str,
+    response: Response,
     category: Optional[str] = Query(default=None),
+    fields: Optional[str] = Query(default=None),
+    limit: int = Query(default=100, ge=1, le=500),
+    cursor: Optional[str] = Query(default=None),
+    include_total: bool = Query(default=False),
 ):
     """
-    Get all files for a specific entity
+    Get a page of files for a specific entity, newest first
+    The body is the list of files; X-Next-Cursor carries the cursor for the next page
+    and X-Total-Count the number of matching files when include_total is set.
     """
     try:
-        # Build query
-        query = supabase.table('files').select('*').eq('entity_type', entity_type).eq('entity_id', entity_id).is_('deleted_at', 'null')
+        returned = select_columns(fields, FILE_COLUMNS)
+        columns = returned + [field for field in SIGNING_FIELDS if field not in returned]
+        
+        # One extra row tells whether another page follows
+        files, total = await file_repository.list_for_entity(
+            entity_type,
+            entity_id,
+            limit + 1,
+            cursor=decode_cursor(cursor) if cursor else None,
+            category=category,
+            columns=', '.join(columns),
+            with_total=include_total
+        )
+        has_more = len(files) > limit
+        files = files[:limit]
         
-        if category:
-            query = query.eq('category', category)
+        # Generate signed URLs for private files
+        _sign_private_files(files)
+        
+        set_page_headers(response, encode_cursor(files[-1]) if has_more else None, total)
+        return [_project_file(file, returned) for file in files]
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/entities")
+async def get_files_for_entities(batch: EntityBatchRequest):
+    """
+    Get files for many entities at once
+    Returns one group per requested key in request order, each paged on its own (limit files
+    per key, newest first): while a group's has_more is true, send its next_cursor back as
+    that key's cursor.
+    """
+    if any(key.entity_field is not None for key in batch.keys):
+        raise HTTPException(status_code=400, detail="entity_field only applies to documents")
+    
+    try:
+        returned = select_columns(batch.fields, FILE_COLUMNS)
+        columns = returned + [field for field in SIGNING_FIELDS if field not in returned]
+        keys = [(key.entity_type, key.entity_id, None) for key in batch.keys]
+        cursors = [decode_cursor(key.cursor) if key.cursor else None for key in batch.keys]
         
-        # Execute query with ordering
-        result = query.order('created_at', desc=True).execute()
+        # One extra row per key tells whether another page follows
+        pages = await file_repository.list_for_entities(
+            keys, batch.limit + 1, cursors, batch.category, ', '.join(columns)
+        )
+        pages = [(page[:batch.limit], len(page) > batch.limit) for page in pages]
         
-        files = result.data or []
+        # Sign every key's private files in one batch
+        _sign_private_files([file for files, _ in pages for file in files])
         
-        # Generate signed URLs for private files
-        for file in files:
-            if not file.get('is_public', False):
-                file['signed_url'] = storage_service.generate_presigned_url(
-                    s3_key=file['s3_key'],
-                    expires_in=3600
-                )
+        groups = []
+        for key, (files, has_more) in zip(batch.keys, pages):
+            groups.append({
+                "entity_type": key.entity_type,
+                "entity_id": key.entity_id,
+                "files": [_project_file(file, returned) for file in files],
+                "has_more": has_more,
+                "next_cursor": encode_cursor(files[-1]) if has_more else None
+            })
         
-        return files
+        return {
+            "groups": groups,
+            "has_more": any(group["has_more"] for group in groups)
+        }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -228,29 +478,33 @@ async def copy_file(
     """
     try:
         # Get original file from Supabase
-        result = supabase.table('files').select('*').eq('id', file_id).is_('deleted_at', 'null').execute()
+        original_file = await file_repository.get(file_id)
         
-        if not result.data or len(result.data) == 0:
+        if not original_file:
             raise HTTPException(status_code=404, detail="File not found")
         
-        original_file = result.data[0]
-        
-        # Generate new S3 key
-        new_s3_key = storage_service.generate_s3_key(
-            filename=original_file['original_name'],
-            category=original_file['category'],
-            entity_type=new_entity_type or original_file['entity_type'],
-            entity_id=new_entity_id or original_file['entity_id']
-        )
+        source_key = original_file.get('storage_path') or original_file.get('s3_key')
         
-        # Copy in storage
-        success = storage_service.copy_file(
-            source_key=original_file['s3_key'],
-            destination_key=new_s3_key
-        )
-        
-        if not success:
-            raise HTTPException(status_code=500, detail="Failed to copy file")
+        if storage_service.is_blob_key(source_key):
+            # Content-addressed blob: the copy is just another reference, no bytes move
+            new_s3_key = source_key
+        else:
+            # Generate new S3 key
+            new_s3_key = storage_service.generate_s3_key(
+                filename=original_file['original_name'],
+                category=original_file['category'],
+                entity_type=new_entity_type or original_file['entity_type'],
+                entity_id=new_entity_id or original_file['entity_id']
+            )
+            
+            # Copy in storage
+            success = await storage_service.copy_file(
+                source_key=source_key,
+                destination_key=new_s3_key
+            )
+            
+            if not success:
+                raise HTTPException(status_code=500, detail="Failed to copy file")
         
         # Create new database record
         # Get original etag from metadata if available
@@ -278,12 +532,14 @@ async def copy_file(
         }
         
         # Insert into Supabase
-        result = supabase.table('files').insert(new_file_record).execute()
+        new_file = await file_repository.create(new_file_record)
         
-        if result.data:
-            return result.data[0]
-        else:
-            raise Exception("Failed to save copied file record")
+        if storage_service.is_blob_key(new_s3_key) and not await retain_blob(new_s3_key):
+            # The original was deleted and its blob released while copying
+            await file_repository.soft_delete(new_file['id'])
+            raise HTTPException(status_code=404, detail="File not found")
+        
+        return new_file
             
     except HTTPException:
         raise
@@ -1,4 +1,17 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
+
+from app.core import auth
+from app.core.database import database
+from app.services import (
+    conversation_cache,
+    conversation_history,
+    gemini,
+    history_compaction,
+    metadata_cache,
+    response_cache
+)
+from app.services.message_writer import message_writer
+from app.services.storage import async_storage_service
 
 router = APIRouter()
 
@@ -9,6 +22,24 @@ async def health_check():
     """
     return {"status": "healthy"}
 
+@router.get("/health/metrics", dependencies=[Depends(auth.get_current_user)])
+async def metrics():
+    """
+    In-process cache metrics; requires authentication since they expose internals
+    """
+    return {
+        "storage": async_storage_service.stats(),
+        "database": database.stats(),
+        "auth_claims_cache": auth.stats(),
+        "metadata_cache": metadata_cache.stats(),
+        "chat": gemini.stats(),
+        "history_compaction": history_compaction.stats(),
+        "conversation_cache": conversation_cache.stats(),
+        "conversation_history_cache": conversation_history.stats(),
+        "message_writer": message_writer.stats(),
+        "response_cache": response_cache.stats()
+    }
+
 @router.get("/")
 async def root():
     """
@@ -1,23 +1,15 @@
-from fastapi import APIRouter, HTTPException, Depends, Header
+from fastapi import APIRouter, HTTPException, Depends
 from typing import Dict, Any, Optional
 from datetime import datetime, timedelta
 import secrets
 import os
-from app.core.supabase import get_supabase_client
+from app.core.auth import AuthenticatedUser, get_current_user, get_current_user_checked
+from app.repositories import invitation_repository
 from app.services.email import email_service
 from pydantic import BaseModel, EmailStr
 
 router = APIRouter()
 
-async def get_current_user_token(authorization: Optional[str] = Header(None)) -> str:
-    if not authorization:
-        raise HTTPException(status_code=401, detail="Authorization header missing")
-    
-    if not authorization.startswith("Bearer "):
-        raise HTTPException(status_code=401, detail="Invalid authorization header format")
-    
-    return authorization.replace("Bearer ", "")
-
 class InvitationCreate(BaseModel):
     email: EmailStr
     startup_id: str
@@ -30,22 +22,15 @@ class InvitationResend(BaseModel):
 @router.post("/invitations/send")
 async def send_invitation(
     invitation: InvitationCreate,
-    access_token: str = Depends(get_current_user_token)
+    user: AuthenticatedUser = Depends(get_current_user_checked)
 ) -> Dict[str, Any]:
     try:
-        supabase = get_supabase_client(access_token)
-        
         token = secrets.token_urlsafe(32)
         expires_at = datetime.now() + timedelta(days=7)
         
-        auth_response = supabase.auth.get_user(access_token)
-        if not auth_response or not auth_response.user:
-            raise HTTPException(status_code=401, detail="Not authenticated")
-        
-        user_id = auth_response.user.id
+        user_id = user.id
         
-        existing = supabase.table('invitations').select("*").eq('email', invitation.email).eq('startup_id', invitation.startup_id).eq('invitation_status', 'pending').execute()
-        if existing.data:
+        if await invitation_repository.has_pending(user.access_token, invitation.email, invitation.startup_id):
             raise HTTPException(status_code=400, detail="An active invitation already exists for this email")
         
         invitation_data = {
@@ -57,9 +42,9 @@ async def send_invitation(
             "expires_at": expires_at.isoformat()
         }
         
-        result = supabase.table('invitations').insert(invitation_data).execute()
+        created = await invitation_repository.create(user.access_token, invitation_data)
         
-        if not result.data:
+        if not created:
             raise HTTPException(status_code=500, detail="Failed to create invitation")
         
         frontend_url = os.getenv("FRONTEND_URL", "http://localhost:5173")
@@ -79,7 +64,7 @@ async def send_invitation(
         
         return {
             "success": True,
-            "invitation": result.data[0],
+            "invitation": created,
             "email_sent": email_sent
         }
         
@@ -92,32 +77,24 @@ async def send_invitation(
 @router.post("/invitations/resend")
 async def resend_invitation(
     resend: InvitationResend,
-    access_token: str = Depends(get_current_user_token)
+    user: AuthenticatedUser = Depends(get_current_user)
 ) -> Dict[str, Any]:
     try:
-        supabase = get_supabase_client(access_token)
-        
-        auth_response = supabase.auth.get_user(access_token)
-        if not auth_response or not auth_response.user:
-            raise HTTPException(status_code=401, detail="Not authenticated")
-        
-        invitation_result = supabase.table('invitations').select("*, invited_by:profiles!invitations_invited_by_id_fkey(given_name, family_name), startup:startups(name)").eq('id', resend.invitation_id).single().execute()
+        invitation = await invitation_repository.get_for_resend(user.access_token, resend.invitation_id)
         
-        if not invitation_result.data:
+        if not invitation:
             raise HTTPException(status_code=404, detail="Invitation not found")
         
-        invitation = invitation_result.data
-        
         if invitation['invitation_status'] != 'pending':
             raise HTTPException(status_code=400, detail="Can only resend pending invitations")
         
         new_expires_at = datetime.now() + timedelta(days=7)
         
-        update_result = supabase.table('invitations').update({
+        updated = await invitation_repository.update(user.access_token, resend.invitation_id, {
             "expires_at": new_expires_at.isoformat()
-        }).eq('id', resend.invitation_id).execute()
+        })
         
-        if not update_result.data:
+        if not updated:
             raise HTTPException(status_code=500, detail="Failed to update invitation")
         
         frontend_url = os.getenv("FRONTEND_URL", "http://localhost:5173")
@@ -140,7 +117,7 @@ async def resend_invitation(
         
         return {
             "success": True,
-            "invitation": update_result.data[0],
+            "invitation": updated,
             "email_sent": email_sent
         }
         
@@ -153,24 +130,16 @@ async def resend_invitation(
 @router.post("/invitations/accept/{token}")
 async def accept_invitation(
     token: str,
-    access_token: str = Depends(get_current_user_token)
+    user: AuthenticatedUser = Depends(get_current_user_checked)
 ) -> Dict[str, Any]:
     try:
-        supabase = get_supabase_client(access_token)
-        
-        auth_response = supabase.auth.get_user(access_token)
-        if not auth_response or not auth_response.user:
-            raise HTTPException(status_code=401, detail="Not authenticated")
-        
-        user_id = auth_response.user.id
+        user_id = user.id
         
-        invitation_result = supabase.table('invitations').select("*, startup:startups(*)").eq('token', token).single().execute()
+        invitation = await invitation_repository.get_for_accept(user.access_token, token)
         
-        if not invitation_result.data:
+        if not invitation:
             raise HTTPException(status_code=404, detail="Invalid invitation token")
         
-        invitation = invitation_result.data
-        
         if invitation['invitation_status'] != 'pending':
             raise HTTPException(status_code=400, detail="Invitation has already been used")
         
@@ -178,17 +147,11 @@ async def accept_invitation(
         if expires_at < datetime.now(expires_at.tzinfo):
             raise HTTPException(status_code=400, detail="Invitation has expired")
         
-        supabase.table('invitations').update({
+        await invitation_repository.update(user.access_token, invitation['id'], {
             "invitation_status": "accepted"
-        }).eq('id', invitation['id']).execute()
-        
-        existing_member = supabase.table('startups_users_lnk').select("*").eq('startup_id', invitation['startup_id']).eq('user_id', user_id).execute()
+        })
         
-        if not existing_member.data:
-            supabase.table('startups_users_lnk').insert({
-                "startup_id": invitation['startup_id'],
-                "user_id": user_id
-            }).execute()
+        await invitation_repository.ensure_membership(user.access_token, invitation['startup_id'], user_id)
         
         return {
             "success": True,
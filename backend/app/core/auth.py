@@ -0,0 +1,163 @@
+"""
+Supabase access token verification
+
+Tokens are verified locally with PyJWT: HS256 tokens against the project's
+JWT secret (SUPABASE_JWT_SECRET), asymmetric ones against the project's
+cached JWKS. Verified claims are cached briefly by token hash so repeated
+requests skip even the signature check. Supabase Auth is only called for
+revocation-sensitive routes, or when neither verification method applies.
+"""
+
+import os
+import time
+import asyncio
+import hashlib
+from typing import Dict, Optional
+
+import jwt
+from fastapi import Header, HTTPException
+from pydantic import BaseModel
+
+from app.core.cache import TTLCache
+from app.core.supabase import SUPABASE_URL, supabase
+
+SUPABASE_JWT_SECRET = os.getenv("SUPABASE_JWT_SECRET")
+SUPABASE_JWT_AUDIENCE = os.getenv("SUPABASE_JWT_AUDIENCE", "authenticated")
+ASYMMETRIC_ALGORITHMS = ["RS256", "ES256"]
+
+_jwks_client = jwt.PyJWKClient(
+    f"{SUPABASE_URL}/auth/v1/.well-known/jwks.json",
+    cache_keys=True,
+    lifespan=int(os.getenv("SUPABASE_JWKS_CACHE_TTL", "600"))
+)
+
+# Keyed by sha256 of the token; entries never outlive the token's exp
+claims_cache = TTLCache(
+    maxsize=int(os.getenv("AUTH_CLAIMS_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("AUTH_CLAIMS_CACHE_TTL", "60"))
+)
+
+class AuthenticatedUser(BaseModel):
+    id: str
+    email: Optional[str] = None
+    role: Optional[str] = None
+    access_token: str
+
+def _token_key(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+def _bearer_token(authorization: Optional[str]) -> str:
+    if not authorization:
+        raise HTTPException(status_code=401, detail="Authorization header missing")
+    if not authorization.startswith("Bearer "):
+        raise HTTPException(status_code=401, detail="Invalid authorization header format")
+    return authorization[len("Bearer "):]
+
+async def _verify_locally(token: str) -> Optional[Dict]:
+    """
+    Verify a token's signature and expiry without calling Supabase Auth
+    
+    Returns the claims, or None when no local key applies to the token's
+    algorithm or the JWKS cannot be fetched. Raises jwt.PyJWTError for
+    tokens that fail verification.
+    """
+    algorithm = jwt.get_unverified_header(token).get("alg")
+    
+    if algorithm == "HS256" and SUPABASE_JWT_SECRET:
+        key = SUPABASE_JWT_SECRET
+    elif algorithm in ASYMMETRIC_ALGORITHMS:
+        # Served from the cached key set; only an unknown kid triggers a fetch
+        try:
+            key = (await asyncio.to_thread(_jwks_client.get_signing_key_from_jwt, token)).key
+        except jwt.PyJWKClientConnectionError as e:
+            print(f"Error fetching Supabase JWKS: {e}")
+            return None
+    else:
+        return None
+    
+    return jwt.decode(
+        token,
+        key,
+        algorithms=[algorithm],
+        audience=SUPABASE_JWT_AUDIENCE,
+        options={"require": ["exp", "sub"]}
+    )
+
+async def _verify_remotely(token: str) -> Optional[Dict]:
+    """Ask Supabase Auth whether the token's session is still valid"""
+    try:
+        response = await asyncio.to_thread(supabase.auth.get_user, token)
+    except Exception as e:
+        print(f"Error getting user from token: {e}")
+        return None
+    if not response or not response.user:
+        return None
+    return {"sub": response.user.id, "email": response.user.email, "role": response.user.role}
+
+async def verify_token(token: str, check_revocation: bool = False) -> Optional[AuthenticatedUser]:
+    """
+    Return the user a token belongs to, or None if it is invalid
+    
+    With check_revocation the token is also confirmed with Supabase Auth so
+    signed-out or deleted users are rejected before the token expires.
+    """
+    key = _token_key(token)
+    claims = claims_cache.get(key)
+    
+    if claims is None:
+        try:
+            claims = await _verify_locally(token)
+        except jwt.PyJWTError:
+            return None
+        if claims is None:
+            claims = await _verify_remotely(token)
+            if claims is None:
+                return None
+            check_revocation = False
+        if claims.get("exp"):
+            claims_cache.set(key, claims, ttl=min(claims_cache.ttl, claims["exp"] - time.time()))
+        else:
+            claims_cache.set(key, claims)
+    
+    if check_revocation and await _verify_remotely(token) is None:
+        claims_cache.pop(key)
+        return None
+    
+    return AuthenticatedUser(
+        id=claims["sub"],
+        email=claims.get("email"),
+        role=claims.get("role"),
+        access_token=token
+    )
+
+async def get_optional_user(authorization: Optional[str] = Header(None)) -> Optional[AuthenticatedUser]:
+    """Dependency: the authenticated user, or None for missing or invalid tokens"""
+    if not authorization or not authorization.startswith("Bearer "):
+        return None
+    return await verify_token(authorization[len("Bearer "):])
+
+async def get_current_user(authorization: Optional[str] = Header(None)) -> AuthenticatedUser:
+    """Dependency: the authenticated user; 401 without a valid token"""
+    user = await verify_token(_bearer_token(authorization))
+    if not user:
+        raise HTTPException(status_code=401, detail="Invalid authentication")
+    return user
+
+async def get_current_user_checked(authorization: Optional[str] = Header(None)) -> AuthenticatedUser:
+    """Dependency for revocation-sensitive routes: also confirms the session with Supabase Auth"""
+    user = await verify_token(_bearer_token(authorization), check_revocation=True)
+    if not user:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    return user
+
+def stats() -> Dict:
+    """Return claims cache hit/miss counters"""
+    return claims_cache.stats()
+
+__all__ = [
+    "AuthenticatedUser",
+    "verify_token",
+    "get_optional_user",
+    "get_current_user",
+    "get_current_user_checked",
+]
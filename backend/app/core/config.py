@@ -26,6 +26,21 @@ class Settings:
     GEMINI_MODEL: str = os.getenv("GEMINI_MODEL", "gemini-2.0-flash-exp")
     GEMINI_TEMPERATURE: float = float(os.getenv("GEMINI_TEMPERATURE", "0.7"))
     GEMINI_MAX_TOKENS: int = int(os.getenv("GEMINI_MAX_TOKENS", "1000"))
+    # Gemini admission control per worker: concurrent generations, requests allowed
+    # to wait for a slot and for how long (seconds), and retries of upstream quota errors
+    GEMINI_MAX_CONCURRENCY: int = int(os.getenv("GEMINI_MAX_CONCURRENCY", "32"))
+    GEMINI_MAX_QUEUE: int = int(os.getenv("GEMINI_MAX_QUEUE", "100"))
+    GEMINI_QUEUE_TIMEOUT: float = float(os.getenv("GEMINI_QUEUE_TIMEOUT", "15"))
+    GEMINI_MAX_RETRIES: int = int(os.getenv("GEMINI_MAX_RETRIES", "3"))
+    GEMINI_RETRY_BASE_DELAY: float = float(os.getenv("GEMINI_RETRY_BASE_DELAY", "1.0"))
+    # Distinct (agent, system prompt, generation config) models kept built
+    GEMINI_MODEL_CACHE_SIZE: int = int(os.getenv("GEMINI_MODEL_CACHE_SIZE", "256"))
+    
+    # Chat history compaction: estimated input tokens per request (0 disables),
+    # most recent messages always sent verbatim, and summary length cap
+    CHAT_HISTORY_TOKEN_BUDGET: int = int(os.getenv("CHAT_HISTORY_TOKEN_BUDGET", "8000"))
+    CHAT_HISTORY_RECENT_MESSAGES: int = int(os.getenv("CHAT_HISTORY_RECENT_MESSAGES", "12"))
+    CHAT_HISTORY_SUMMARY_MAX_TOKENS: int = int(os.getenv("CHAT_HISTORY_SUMMARY_MAX_TOKENS", "512"))
     
     # Add more CORS origins from environment
     additional_origins = os.getenv("ADDITIONAL_CORS_ORIGINS", "")
@@ -0,0 +1,165 @@
+"""
+Async PostgREST access over one pooled HTTP client
+
+Repositories build queries with database.table(), or database.rpc() for
+database functions, which return postgrest-py async request builders bound
+to a shared httpx.AsyncClient, so queries await I/O instead of blocking the
+event loop. Queries run with the service key unless an access token is
+given, in which case they are sent with the user's bearer token and the
+anon key, as a Supabase client would, and row level security applies.
+The client speaks HTTP/2, so concurrent queries multiplex over a few
+connections.
+"""
+
+import os
+import time
+from typing import Dict, Optional
+
+import httpx
+from httpx import Headers, QueryParams
+from postgrest import AsyncRequestBuilder, AsyncRPCFilterRequestBuilder
+
+from app.core.metrics import LatencyStats
+from app.core.supabase import SUPABASE_URL, SUPABASE_SERVICE_KEY, SUPABASE_ANON_KEY
+
+# Default read timeouts (seconds) per kind of query, overridable via SUPABASE_<OP>_TIMEOUT
+DEFAULT_TIMEOUTS = {
+    'read': 5,
+    'write': 10,
+}
+
+class _Session:
+    """Sends a request builder's requests through the pooled client with its own auth and timeout"""
+
+    __slots__ = ('_database', '_authorization', '_apikey', '_timeout')
+
+    def __init__(self, database: 'AsyncDatabase', authorization: str, apikey: str, timeout: httpx.Timeout):
+        self._database = database
+        self._authorization = authorization
+        self._apikey = apikey
+        self._timeout = timeout
+
+    async def request(self, method: str, url: str, *, headers=None, **kwargs) -> httpx.Response:
+        headers = httpx.Headers(headers)
+        headers['Authorization'] = self._authorization
+        headers['apikey'] = self._apikey
+        return await self._database.send(method, url, headers=headers, timeout=self._timeout, **kwargs)
+
+class AsyncDatabase:
+    """Shared async PostgREST client for the repositories"""
+
+    def __init__(self):
+        self.base_url = f"{SUPABASE_URL}/rest/v1"
+        self.service_key = SUPABASE_SERVICE_KEY
+        # Sent as apikey with user tokens, as a Supabase client would
+        self.anon_key = SUPABASE_ANON_KEY
+
+        # Pool and timeout configuration for the shared keep-alive client
+        self.connect_timeout = float(os.getenv('SUPABASE_CONNECT_TIMEOUT', '5'))
+        self.timeouts = {
+            operation: float(os.getenv(f'SUPABASE_{operation.upper()}_TIMEOUT', str(default)))
+            for operation, default in DEFAULT_TIMEOUTS.items()
+        }
+        self.limits = httpx.Limits(
+            max_keepalive_connections=int(os.getenv('SUPABASE_POOL_CONNECTIONS', '20')),
+            max_connections=int(os.getenv('SUPABASE_POOL_MAXSIZE', '50'))
+        )
+        self._client: Optional[httpx.AsyncClient] = None
+
+        self.latency = LatencyStats()
+        self.errors = 0
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Pooled keep-alive client, created lazily inside the running event loop"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers={
+                    'Accept': 'application/json',
+                    'Content-Type': 'application/json',
+                    'apikey': self.service_key,
+                },
+                limits=self.limits,
+                http2=True,
+                timeout=httpx.Timeout(self.timeouts['read'], connect=self.connect_timeout)
+            )
+        return self._client
+
+    async def aclose(self):
+        """Close the pooled client and release its connections"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def table(
+        self,
+        name: str,
+        access_token: Optional[str] = None,
+        timeout: Optional[float] = None,
+        operation: str = 'read'
+    ) -> AsyncRequestBuilder:
+        """
+        Start a query on a table
+
+        Args:
+            access_token: Run as this user (RLS applies) instead of the service role
+            timeout: Read timeout in seconds for this query, defaulting to the operation's
+            operation: 'read' or 'write', selecting the default timeout
+        """
+        return AsyncRequestBuilder(self._session(access_token, timeout, operation), f"/{name}")
+
+    def rpc(
+        self,
+        name: str,
+        params: Dict,
+        access_token: Optional[str] = None,
+        timeout: Optional[float] = None,
+        operation: str = 'read'
+    ) -> AsyncRPCFilterRequestBuilder:
+        """
+        Start a call to a database function; its result can be filtered and projected like a table's
+
+        Args:
+            params: The function's arguments
+            access_token, timeout, operation: As for table()
+        """
+        return AsyncRPCFilterRequestBuilder(
+            self._session(access_token, timeout, operation), f"/rpc/{name}", 'POST', Headers(), QueryParams(), json=params
+        )
+
+    def _session(self, access_token: Optional[str], timeout: Optional[float], operation: str) -> _Session:
+        """Session sending one query with the caller's auth and timeout"""
+        if access_token and not self.anon_key:
+            raise RuntimeError("SUPABASE_ANON_KEY must be set for user-scoped queries")
+        return _Session(
+            self,
+            f"Bearer {access_token or self.service_key}",
+            self.anon_key if access_token else self.service_key,
+            httpx.Timeout(timeout if timeout is not None else self.timeouts[operation], connect=self.connect_timeout)
+        )
+
+    async def send(self, method: str, url: str, **kwargs) -> httpx.Response:
+        """Send one PostgREST request over the pooled client and record its latency"""
+        started = time.perf_counter()
+        try:
+            return await self.client.request(method, url, **kwargs)
+        except httpx.TransportError:
+            self.errors += 1
+            raise
+        finally:
+            self.latency.record(time.perf_counter() - started)
+
+    def stats(self) -> Dict:
+        """Return pool configuration, transport errors and query latency"""
+        return {
+            'max_connections': self.limits.max_connections,
+            'timeouts': self.timeouts,
+            'transport_errors': self.errors,
+            'latency': self.latency.stats()
+        }
+
+# Singleton instance
+database = AsyncDatabase()
+
+__all__ = ["AsyncDatabase", "database"]
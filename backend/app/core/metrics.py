@@ -0,0 +1,51 @@
+"""
+Lightweight in-process latency metrics
+"""
+
+import threading
+from collections import deque
+from typing import Dict
+
+class LatencyStats:
+    """
+    Running latency summary in milliseconds
+    
+    Keeps totals for the process lifetime plus a bounded window of recent
+    samples for percentiles.
+    """
+    
+    def __init__(self, window: int = 1000):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+    
+    def record(self, seconds: float):
+        """Record one observation given in seconds"""
+        ms = seconds * 1000
+        with self._lock:
+            self._samples.append(ms)
+            self.count += 1
+            self.total_ms += ms
+            self.max_ms = max(self.max_ms, ms)
+    
+    def stats(self) -> Dict:
+        """Return count, mean, max and recent p50/p95"""
+        with self._lock:
+            samples = sorted(self._samples)
+        
+        def percentile(p: float) -> float:
+            if not samples:
+                return 0.0
+            return round(samples[min(len(samples) - 1, int(p * len(samples)))], 1)
+        
+        return {
+            'count': self.count,
+            'mean_ms': round(self.total_ms / self.count, 1) if self.count else 0.0,
+            'max_ms': round(self.max_ms, 1),
+            'p50_ms': percentile(0.5),
+            'p95_ms': percentile(0.95)
+        }
+
+__all__ = ["LatencyStats"]
@@ -0,0 +1,93 @@
+"""
+Keyset pagination and column projection helpers for list endpoints
+
+Lists are ordered by (created_at, id) and paged with opaque cursors that
+encode the last row's position, so each page is one indexed range scan
+however deep the client pages. Filters are built as raw PostgREST logic
+expressions because postgrest-py 0.13 has no or_() or multi-column order.
+"""
+
+import re
+import base64
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, Response
+
+ID_PATTERN = re.compile(r'^[0-9a-fA-F-]{1,36}$')
+
+# Pagination metadata for endpoints whose body stays a plain list
+NEXT_CURSOR_HEADER = 'X-Next-Cursor'
+TOTAL_COUNT_HEADER = 'X-Total-Count'
+
+def encode_cursor(row: Dict) -> str:
+    """Encode a row's (created_at, id) position as an opaque cursor"""
+    return base64.urlsafe_b64encode(f"{row['created_at']}|{row['id']}".encode()).decode()
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    """Decode a cursor into (created_at, id), rejecting anything malformed"""
+    try:
+        created_at, row_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        parse_timestamp(created_at)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not ID_PATTERN.match(row_id):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return created_at, row_id
+
+def parse_timestamp(value: str) -> datetime:
+    """Parse an ISO 8601 timestamp, accepting a trailing Z, as an aware datetime; naive values are UTC"""
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+def select_columns(fields: Optional[str], allowed: Sequence[str], always: Iterable[str] = ('id', 'created_at')) -> List[str]:
+    """
+    Resolve a comma-separated fields parameter to the columns to select
+
+    Returns every allowed column when fields is empty; otherwise the
+    requested columns plus the always-included ones. Unknown columns are
+    rejected with a 400.
+    """
+    always = list(always)
+    if not fields:
+        return always + [column for column in allowed if column not in always]
+
+    requested = [field.strip() for field in fields.split(',') if field.strip()]
+    unknown = [field for field in requested if field not in allowed]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+
+    return always + [field for field in dict.fromkeys(requested) if field not in always]
+
+def project(row: Dict, columns: Sequence[str]) -> Dict:
+    """Keep only the given columns of a row"""
+    return {column: row.get(column) for column in columns}
+
+def set_page_headers(response: Response, next_cursor: Optional[str], total: Optional[int] = None):
+    """Advertise the next page's cursor (if any) and the total match count (if counted)"""
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    if total is not None:
+        response.headers[TOTAL_COUNT_HEADER] = str(total)
+
+def keyset_order(newest_first: bool = True) -> str:
+    """PostgREST order value for (created_at, id)"""
+    direction = 'desc' if newest_first else 'asc'
+    return f'created_at.{direction},id.{direction}'
+
+def keyset_filter(cursor: Tuple[str, str], newest_first: bool = True) -> str:
+    """PostgREST logic expression matching rows strictly after a cursor in keyset order"""
+    created_at, row_id = cursor
+    op = 'lt' if newest_first else 'gt'
+    return f'or(created_at.{op}."{created_at}",and(created_at.eq."{created_at}",id.{op}.{row_id}))'
+
+__all__ = [
+    "encode_cursor",
+    "decode_cursor",
+    "parse_timestamp",
+    "select_columns",
+    "project",
+    "set_page_headers",
+    "keyset_order",
+    "keyset_filter",
+]
@@ -5,7 +5,6 @@ Supabase client configuration
 import os
 from supabase import create_client, Client
 from dotenv import load_dotenv
-from typing import Optional
 
 load_dotenv()
 
@@ -22,18 +21,5 @@ if not SUPABASE_URL or not SUPABASE_SERVICE_KEY:
 # Create Supabase client with service key (bypasses RLS)
 supabase: Client = create_client(SUPABASE_URL, SUPABASE_SERVICE_KEY)
 
-def get_supabase_client(access_token: Optional[str] = None) -> Client:
-    """
-    Get a Supabase client. 
-    If access_token is provided, creates a client with user authentication.
-    Otherwise returns the service client.
-    """
-    if access_token and SUPABASE_ANON_KEY:
-        # Create client with user authentication
-        client = create_client(SUPABASE_URL, SUPABASE_ANON_KEY)
-        client.auth.set_session(access_token, None)
-        return client
-    return supabase
-
 # Export for use in other modules
-__all__ = ["supabase", "get_supabase_client"]
\ No newline at end of file
+__all__ = ["supabase"]
@@ -3,6 +3,12 @@ from fastapi.middleware.cors import CORSMiddleware
 
 from app.api.v1.api import api_router
 from app.core.config import settings
+from app.core.database import database
+from app.core.pagination import NEXT_CURSOR_HEADER, TOTAL_COUNT_HEADER
+from app.repositories import conversation_repository
+from app.services import history_compaction
+from app.services.message_writer import message_writer
+from app.services.storage import async_storage_service
 
 def create_application() -> FastAPI:
     """
@@ -21,11 +27,25 @@ def create_application() -> FastAPI:
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        # Pagination metadata of the entity file/document listings
+        expose_headers=[NEXT_CURSOR_HEADER, TOTAL_COUNT_HEADER],
     )
 
     # Include API router
     app.include_router(api_router)
 
+    # Find out whether the history summary migration has been applied
+    app.add_event_handler("startup", conversation_repository.check_schema)
+    # Create the storage base collection once, so uploads start from a cached parent
+    app.add_event_handler("startup", async_storage_service.ensure_base_directory)
+
+    # Finish history summaries and flush queued chat messages, then release
+    # pooled database and storage connections on shutdown
+    app.add_event_handler("shutdown", history_compaction.close)
+    app.add_event_handler("shutdown", message_writer.close)
+    app.add_event_handler("shutdown", database.aclose)
+    app.add_event_handler("shutdown", async_storage_service.aclose)
+
     return app
 
 app = create_application()
@@ -8,7 +8,8 @@ class ChatMessage(BaseModel):
 class ChatRequest(BaseModel):
     message: str
     systemPrompt: str
-    conversationHistory: List[ChatMessage]
+    # Omit to have the server load the conversation's stored history
+    conversationHistory: Optional[List[ChatMessage]] = None
     agentId: str
     startupId: Optional[str] = None
 
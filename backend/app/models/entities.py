@@ -0,0 +1,21 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional
+
+# Keys accepted per batch listing request
+MAX_ENTITY_KEYS = 100
+
+class EntityKey(BaseModel):
+    entity_type: str = Field(min_length=1)
+    entity_id: str = Field(min_length=1)
+    # Documents only; omit to match every field of the entity
+    entity_field: Optional[str] = None
+    # This key's next_cursor from the previous page
+    cursor: Optional[str] = None
+
+class EntityBatchRequest(BaseModel):
+    keys: List[EntityKey] = Field(min_length=1, max_length=MAX_ENTITY_KEYS)
+    category: Optional[str] = None
+    # Comma-separated columns to return; id and created_at are always included
+    fields: Optional[str] = None
+    # Rows per key per page, newest first
+    limit: int = Field(default=20, ge=1, le=100)
@@ -0,0 +1,25 @@
+"""
+Async data access for Supabase tables
+
+One repository per table (or closely related tables), all sharing the pooled
+client in app.core.database. Queries select only the columns callers use.
+"""
+
+from app.repositories.conversations import ConversationRepository, conversation_repository
+from app.repositories.messages import MessageRepository, message_repository
+from app.repositories.files import FileRepository, file_repository
+from app.repositories.documents import DocumentRepository, document_repository
+from app.repositories.invitations import InvitationRepository, invitation_repository
+
+__all__ = [
+    "ConversationRepository",
+    "MessageRepository",
+    "FileRepository",
+    "DocumentRepository",
+    "InvitationRepository",
+    "conversation_repository",
+    "message_repository",
+    "file_repository",
+    "document_repository",
+    "invitation_repository",
+]
@@ -0,0 +1,113 @@
+"""
+chat_conversations queries
+"""
+
+import logging
+from datetime import datetime
+from typing import Dict, Optional
+
+from postgrest.exceptions import APIError
+from postgrest.types import ReturnMethod
+
+from app.core.database import database
+
+logger = logging.getLogger(__name__)
+
+# Everything the chat endpoints read from a conversation
+CONVERSATION_FIELDS = 'id, user_id, agent_id, startup_id, last_message_at'
+
+# History compaction state, added by add_chat_history_summary.sql
+SUMMARY_FIELDS = 'history_summary, history_summary_count'
+
+# PostgREST/Postgres error codes for a selected column that doesn't exist
+UNDEFINED_COLUMN_CODES = ('42703', 'PGRST204')
+
+class ConversationRepository:
+    """Each user's conversation with an agent, per startup"""
+
+    table = 'chat_conversations'
+
+    def __init__(self):
+        # Cleared by check_schema when the summary columns are missing
+        self.summaries_available = True
+
+    @property
+    def fields(self) -> str:
+        """Columns to select, including the summary ones when the database has them"""
+        return f'{CONVERSATION_FIELDS}, {SUMMARY_FIELDS}' if self.summaries_available else CONVERSATION_FIELDS
+
+    async def check_schema(self):
+        """
+        Check at startup whether the history summary columns exist
+
+        Without them every conversation query selecting them would fail, and
+        chat persistence would silently stop. They are then left out of
+        selects and history compaction drops older turns instead of
+        summarizing them, with an error logged here.
+        """
+        try:
+            await database.table(self.table).select(SUMMARY_FIELDS).limit(0).execute()
+        except APIError as e:
+            if e.code not in UNDEFINED_COLUMN_CODES:
+                logger.warning(f"Could not check {self.table} for history summary columns: {e.message}")
+                return
+            self.summaries_available = False
+            logger.error(
+                f"{self.table} has no history summary columns ({e.message}); apply "
+                "add_chat_history_summary.sql to enable history compaction summaries"
+            )
+        except Exception as e:
+            logger.warning(f"Could not check {self.table} for history summary columns: {str(e)}")
+
+    async def find_latest(
+        self,
+        user_id: str,
+        agent_id: str,
+        startup_id: Optional[str] = None,
+        timeout: Optional[float] = None
+    ) -> Optional[Dict]:
+        """Return the user's most recently active conversation with an agent, or None"""
+        query = database.table(self.table, timeout=timeout).select(self.fields).eq(
+            'user_id', user_id
+        ).eq('agent_id', agent_id)
+
+        if startup_id:
+            query = query.eq('startup_id', startup_id)
+        else:
+            query = query.is_('startup_id', 'null')
+
+        result = await query.order('last_message_at', desc=True).limit(1).execute()
+        return result.data[0] if result.data else None
+
+    async def create(
+        self,
+        user_id: str,
+        agent_id: str,
+        startup_id: Optional[str] = None,
+        timeout: Optional[float] = None
+    ) -> Dict:
+        """Insert a new conversation and return it"""
+        query = database.table(self.table, timeout=timeout, operation='write').insert({
+            'user_id': user_id,
+            'agent_id': agent_id,
+            'startup_id': startup_id,
+            'last_message_at': datetime.utcnow().isoformat()
+        })
+        query.params = query.params.add('select', self.fields)
+        result = await query.execute()
+        return result.data[0]
+
+    async def save_summary(self, conversation_id: str, summary: str, count: int, timeout: Optional[float] = None):
+        """Store the rolling history summary and how many leading messages it covers"""
+        await database.table(self.table, timeout=timeout, operation='write').update({
+            'history_summary': summary,
+            'history_summary_count': count
+        }, returning=ReturnMethod.minimal).eq('id', conversation_id).execute()
+
+    async def touch(self, conversation_id: str, last_message_at: str, timeout: Optional[float] = None):
+        """Set a conversation's last_message_at"""
+        await database.table(self.table, timeout=timeout, operation='write').update({
+            'last_message_at': last_message_at
+        }, returning=ReturnMethod.minimal).eq('id', conversation_id).execute()
+
+conversation_repository = ConversationRepository()
@@ -0,0 +1,101 @@
+"""
+documents table queries
+"""
+
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from postgrest.types import CountMethod, ReturnMethod
+
+from app.core.database import database
+from app.repositories.entities import EntityKey, fetch_entity_pages, fetch_page
+
+# Columns returned to clients for a document record
+DOCUMENT_COLUMNS = (
+    'id', 'filename', 'original_name', 'mime_type', 'size_bytes', 'bucket', 'storage_path', 'category', 'title',
+    'description', 'uploaded_by', 'uploaded_at', 'entity_type', 'entity_id', 'entity_field', 'metadata', 'created_at', 'updated_at'
+)
+DOCUMENT_FIELDS = ', '.join(DOCUMENT_COLUMNS)
+
+class DocumentRepository:
+    """Document records; deletes are hard"""
+
+    table = 'documents'
+
+    async def get(self, document_id: str, columns: str = DOCUMENT_FIELDS, timeout: Optional[float] = None) -> Optional[Dict]:
+        """Return a document record, or None"""
+        result = await database.table(self.table, timeout=timeout).select(columns).eq(
+            'id', document_id
+        ).limit(1).execute()
+        return result.data[0] if result.data else None
+
+    async def create(self, record: Dict, timeout: Optional[float] = None) -> Dict:
+        """Insert a document record and return it"""
+        query = database.table(self.table, timeout=timeout, operation='write').insert(record)
+        query.params = query.params.add('select', DOCUMENT_FIELDS)
+        result = await query.execute()
+        if not result.data:
+            raise Exception("Failed to save document record to database")
+        return result.data[0]
+
+    async def update(
+        self,
+        document_id: str,
+        changes: Dict,
+        columns: str = DOCUMENT_FIELDS,
+        timeout: Optional[float] = None
+    ) -> Optional[Dict]:
+        """Apply changes to a document and return the updated record, or None if it doesn't exist"""
+        query = database.table(self.table, timeout=timeout, operation='write').update(changes).eq('id', document_id)
+        query.params = query.params.add('select', columns)
+        result = await query.execute()
+        return result.data[0] if result.data else None
+
+    async def delete(self, document_id: str, timeout: Optional[float] = None):
+        """Delete a document record"""
+        await database.table(self.table, timeout=timeout, operation='write').delete(
+            returning=ReturnMethod.minimal
+        ).eq('id', document_id).execute()
+
+    async def list_for_entity(
+        self,
+        entity_type: str,
+        entity_id: str,
+        limit: int,
+        cursor: Optional[Tuple[str, str]] = None,
+        entity_field: Optional[str] = None,
+        category: Optional[str] = None,
+        columns: str = DOCUMENT_FIELDS,
+        with_total: bool = False,
+        timeout: Optional[float] = None
+    ) -> Tuple[List[Dict], Optional[int]]:
+        """Return one page of an entity's documents, newest first, and the total if requested"""
+        def select(count: Optional[CountMethod]):
+            query = database.table(self.table, timeout=timeout).select(columns, count=count).eq(
+                'entity_type', entity_type
+            ).eq('entity_id', entity_id)
+            if entity_field:
+                query = query.eq('entity_field', entity_field)
+            return query.eq('category', category) if category else query
+
+        return await fetch_page(select, limit, cursor, with_total)
+
+    async def list_for_entities(
+        self,
+        keys: Sequence[EntityKey],
+        limit: int,
+        cursors: Sequence[Optional[Tuple[str, str]]],
+        category: Optional[str] = None,
+        columns: str = DOCUMENT_FIELDS,
+        timeout: Optional[float] = None
+    ) -> List[List[Dict]]:
+        """Return one page of documents per key, each past its own cursor, newest first, in one query"""
+        return await fetch_entity_pages('list_entity_documents', keys, limit, cursors, category, columns, timeout)
+
+    async def count_by_storage_path(self, storage_path: str, timeout: Optional[float] = None) -> int:
+        """Count records that reference a storage path"""
+        result = await database.table(self.table, timeout=timeout).select('id', count=CountMethod.exact).eq(
+            'storage_path', storage_path
+        ).limit(1).execute()
+        return result.count or 0
+
+document_repository = DocumentRepository()
@@ -0,0 +1,115 @@
+"""
+Shared paging for records attached to entities (files and documents)
+"""
+
+import asyncio
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from postgrest.types import CountMethod
+
+from app.core.database import database
+from app.core.pagination import keyset_filter, keyset_order, parse_timestamp
+
+# (entity_type, entity_id, entity_field); entity_field None matches any field
+EntityKey = Tuple[str, str, Optional[str]]
+
+async def fetch_page(
+    select: Callable[[Optional[CountMethod]], object],
+    limit: int,
+    cursor: Optional[Tuple[str, str]] = None,
+    with_total: bool = False
+) -> Tuple[List[Dict], Optional[int]]:
+    """
+    Run one keyset page of a filtered select, newest first, optionally with the total match count
+
+    select(count) must build the filtered query. The total ignores the
+    cursor: on the first page it comes with the rows, on later pages from a
+    concurrent count-only query.
+    """
+    query = select(CountMethod.exact if with_total and not cursor else None)
+    query.params = query.params.add('order', keyset_order())
+    if cursor:
+        query.params = query.params.add('and', f'({keyset_filter(cursor)})')
+
+    if not (with_total and cursor):
+        result = await query.limit(limit).execute()
+        return result.data or [], result.count if with_total else None
+
+    result, total = await asyncio.gather(
+        query.limit(limit).execute(),
+        select(CountMethod.exact).limit(0).execute()
+    )
+    return result.data or [], total.count
+
+async def fetch_entity_pages(
+    function: str,
+    keys: Sequence[EntityKey],
+    limit: int,
+    cursors: Sequence[Optional[Tuple[str, str]]],
+    category: Optional[str] = None,
+    columns: str = '*',
+    timeout: Optional[float] = None
+) -> List[List[Dict]]:
+    """
+    Fetch one page per key, each past its own cursor, newest first, with one call to a list_entity_* function
+
+    The function ranks rows within each key (see add_entity_page_functions.sql),
+    so every key gets up to limit rows however busy the others are.
+    """
+    requests = list(dict.fromkeys(zip(keys, cursors)))
+    arguments = []
+    for (entity_type, entity_id, entity_field), cursor in requests:
+        argument = {'entity_type': entity_type, 'entity_id': entity_id}
+        if entity_field is not None:
+            argument['entity_field'] = entity_field
+        if cursor:
+            argument['created_at'], argument['id'] = cursor
+        arguments.append(argument)
+
+    # The key columns are needed to tell the keys' rows apart
+    selected = [column.strip() for column in columns.split(',')]
+    if '*' not in selected:
+        selected += [column for column in ('id', 'created_at', 'entity_type', 'entity_id') if column not in selected]
+        if any(key[2] is not None for key in keys) and 'entity_field' not in selected:
+            selected.append('entity_field')
+
+    query = database.rpc(function, {'keys': arguments, 'per_key': limit, 'filter_category': category}, timeout=timeout)
+    query.params = query.params.add('select', ', '.join(selected))
+    result = await query.execute()
+    return split_pages(result.data or [], list(zip(keys, cursors)), limit)
+
+def split_pages(
+    rows: List[Dict],
+    requests: Sequence[Tuple[EntityKey, Optional[Tuple[str, str]]]],
+    limit: int
+) -> List[List[Dict]]:
+    """
+    Split the rows of one list_entity_* call into each (key, cursor) request's page, in request order
+
+    A row comes back once per key it was ranked under, and keys can overlap
+    (a documents key without entity_field covers the entity's per-field
+    keys), so each request takes the newest limit distinct rows that match
+    its key and lie past its cursor.
+    """
+    rows = sorted(
+        {row['id']: row for row in rows}.values(),
+        key=lambda row: (parse_timestamp(row['created_at']), row['id']),
+        reverse=True
+    )
+
+    pages = []
+    for (entity_type, entity_id, entity_field), cursor in requests:
+        after = (parse_timestamp(cursor[0]), cursor[1]) if cursor else None
+        page = []
+        for row in rows:
+            if len(page) == limit:
+                break
+            if row['entity_type'] != entity_type or str(row['entity_id']) != entity_id:
+                continue
+            if entity_field is not None and row.get('entity_field') != entity_field:
+                continue
+            if after and (parse_timestamp(row['created_at']), row['id']) >= after:
+                continue
+            page.append(row)
+        pages.append(page)
+    return pages
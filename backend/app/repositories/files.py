@@ -0,0 +1,86 @@
+"""
+files table queries
+"""
+
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from postgrest.types import CountMethod, ReturnMethod
+
+from app.core.database import database
+from app.repositories.entities import EntityKey, fetch_entity_pages, fetch_page
+
+# Columns returned to clients for a file record
+FILE_COLUMNS = (
+    'id', 'filename', 'original_name', 'mime_type', 'size_bytes', 'bucket', 'storage_path', 's3_key', 'category',
+    'entity_type', 'entity_id', 'is_public', 'signed_url_expires_in', 'uploaded_by', 'metadata', 'created_at', 'updated_at'
+)
+FILE_FIELDS = ', '.join(FILE_COLUMNS)
+
+class FileRepository:
+    """File records; deletes are soft (deleted_at) and reads only see live rows"""
+
+    table = 'files'
+
+    async def get(self, file_id: str, columns: str = FILE_FIELDS, timeout: Optional[float] = None) -> Optional[Dict]:
+        """Return a live file record, or None"""
+        result = await database.table(self.table, timeout=timeout).select(columns).eq(
+            'id', file_id
+        ).is_('deleted_at', 'null').limit(1).execute()
+        return result.data[0] if result.data else None
+
+    async def create(self, record: Dict, timeout: Optional[float] = None) -> Dict:
+        """Insert a file record and return it"""
+        query = database.table(self.table, timeout=timeout, operation='write').insert(record)
+        query.params = query.params.add('select', FILE_FIELDS)
+        result = await query.execute()
+        if not result.data:
+            raise Exception("Failed to save file record to database")
+        return result.data[0]
+
+    async def soft_delete(self, file_id: str, timeout: Optional[float] = None):
+        """Mark a file record deleted"""
+        await database.table(self.table, timeout=timeout, operation='write').update(
+            {'deleted_at': datetime.now().isoformat()}, returning=ReturnMethod.minimal
+        ).eq('id', file_id).execute()
+
+    async def list_for_entity(
+        self,
+        entity_type: str,
+        entity_id: str,
+        limit: int,
+        cursor: Optional[Tuple[str, str]] = None,
+        category: Optional[str] = None,
+        columns: str = FILE_FIELDS,
+        with_total: bool = False,
+        timeout: Optional[float] = None
+    ) -> Tuple[List[Dict], Optional[int]]:
+        """Return one page of an entity's live files, newest first, and the total if requested"""
+        def select(count: Optional[CountMethod]):
+            query = database.table(self.table, timeout=timeout).select(columns, count=count).eq(
+                'entity_type', entity_type
+            ).eq('entity_id', entity_id).is_('deleted_at', 'null')
+            return query.eq('category', category) if category else query
+
+        return await fetch_page(select, limit, cursor, with_total)
+
+    async def list_for_entities(
+        self,
+        keys: Sequence[EntityKey],
+        limit: int,
+        cursors: Sequence[Optional[Tuple[str, str]]],
+        category: Optional[str] = None,
+        columns: str = FILE_FIELDS,
+        timeout: Optional[float] = None
+    ) -> List[List[Dict]]:
+        """Return one page of live files per key, each past its own cursor, newest first, in one query"""
+        return await fetch_entity_pages('list_entity_files', keys, limit, cursors, category, columns, timeout)
+
+    async def count_by_storage_path(self, storage_path: str, timeout: Optional[float] = None) -> int:
+        """Count live records that reference a storage path"""
+        result = await database.table(self.table, timeout=timeout).select('id', count=CountMethod.exact).eq(
+            'storage_path', storage_path
+        ).is_('deleted_at', 'null').limit(1).execute()
+        return result.count or 0
+
+file_repository = FileRepository()
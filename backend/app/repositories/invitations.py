@@ -0,0 +1,79 @@
+"""
+invitations and startup membership queries
+
+All queries run with the calling user's access token, so row level security
+decides which invitations and startups they can see and change.
+"""
+
+from typing import Dict, Optional
+
+from postgrest.types import ReturnMethod
+
+from app.core.database import database
+
+# Invitation plus what the reminder email needs: inviter name and startup name
+RESEND_FIELDS = (
+    'id, email, token, invitation_status, expires_at, '
+    'invited_by:profiles!invitations_invited_by_id_fkey(given_name, family_name), startup:startups(name)'
+)
+
+# Invitation plus the full startup, which accept returns to the client
+ACCEPT_FIELDS = 'id, startup_id, invitation_status, expires_at, startup:startups(*)'
+
+class InvitationRepository:
+    """Startup invitations and the memberships they grant"""
+
+    table = 'invitations'
+
+    async def has_pending(self, access_token: str, email: str, startup_id: str, timeout: Optional[float] = None) -> bool:
+        """Whether an email already has a pending invitation to a startup"""
+        result = await database.table(self.table, access_token, timeout).select('id').eq(
+            'email', email
+        ).eq('startup_id', startup_id).eq('invitation_status', 'pending').limit(1).execute()
+        return bool(result.data)
+
+    async def create(self, access_token: str, invitation: Dict, timeout: Optional[float] = None) -> Optional[Dict]:
+        """Insert an invitation and return it, or None if nothing was inserted"""
+        result = await database.table(self.table, access_token, timeout, 'write').insert(invitation).execute()
+        return result.data[0] if result.data else None
+
+    async def get_for_resend(self, access_token: str, invitation_id: str, timeout: Optional[float] = None) -> Optional[Dict]:
+        """Return an invitation with its inviter and startup names, or None"""
+        result = await database.table(self.table, access_token, timeout).select(RESEND_FIELDS).eq(
+            'id', invitation_id
+        ).limit(1).execute()
+        return result.data[0] if result.data else None
+
+    async def get_for_accept(self, access_token: str, token: str, timeout: Optional[float] = None) -> Optional[Dict]:
+        """Return the invitation for an invitation token with its startup, or None"""
+        result = await database.table(self.table, access_token, timeout).select(ACCEPT_FIELDS).eq(
+            'token', token
+        ).limit(1).execute()
+        return result.data[0] if result.data else None
+
+    async def update(
+        self,
+        access_token: str,
+        invitation_id: str,
+        changes: Dict,
+        timeout: Optional[float] = None
+    ) -> Optional[Dict]:
+        """Apply changes to an invitation and return it, or None if it wasn't updated"""
+        result = await database.table(self.table, access_token, timeout, 'write').update(changes).eq(
+            'id', invitation_id
+        ).execute()
+        return result.data[0] if result.data else None
+
+    async def ensure_membership(self, access_token: str, startup_id: str, user_id: str, timeout: Optional[float] = None):
+        """Add a user to a startup unless they already belong to it"""
+        existing = await database.table('startups_users_lnk', access_token, timeout).select('user_id').eq(
+            'startup_id', startup_id
+        ).eq('user_id', user_id).limit(1).execute()
+
+        if not existing.data:
+            await database.table('startups_users_lnk', access_token, timeout, 'write').insert({
+                'startup_id': startup_id,
+                'user_id': user_id
+            }, returning=ReturnMethod.minimal).execute()
+
+invitation_repository = InvitationRepository()
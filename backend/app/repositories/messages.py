@@ -0,0 +1,86 @@
+"""
+chat_messages queries
+"""
+
+from typing import Dict, List, Optional, Tuple
+
+from postgrest.types import CountMethod, ReturnMethod
+
+from app.core.database import database
+from app.core.pagination import keyset_filter, keyset_order
+
+# Columns needed to rebuild the role/content history sent to Gemini, plus id to merge queued messages
+HISTORY_MESSAGE_FIELDS = 'id, content, sender'
+
+class MessageRepository:
+    """Messages of a conversation, ordered by (created_at, id)"""
+
+    table = 'chat_messages'
+
+    async def insert_batch(self, messages: List[Dict], timeout: Optional[float] = None):
+        """
+        Insert messages in one request
+
+        Rows carry client-generated ids, so re-sending a batch that was
+        already committed is a no-op.
+        """
+        await database.table(self.table, timeout=timeout, operation='write').upsert(
+            messages, ignore_duplicates=True, returning=ReturnMethod.minimal
+        ).execute()
+
+    async def fetch_tail(
+        self,
+        conversation_id: str,
+        limit: int,
+        timeout: Optional[float] = None
+    ) -> Tuple[List[Dict], int]:
+        """Return the last limit messages in chronological order, and the conversation's message count"""
+        result = await database.table(self.table, timeout=timeout).select(
+            HISTORY_MESSAGE_FIELDS, count=CountMethod.exact
+        ).eq('conversation_id', conversation_id).order('created_at', desc=True).limit(limit).execute()
+
+        rows = list(reversed(result.data or []))
+        return rows, result.count if result.count is not None else len(rows)
+
+    async def fetch_range(
+        self,
+        conversation_id: str,
+        start: int,
+        end: int,
+        timeout: Optional[float] = None
+    ) -> List[Dict]:
+        """Return messages start..end-1 (by position in the conversation) in chronological order"""
+        # postgrest-py's range() end is exclusive; it sends Range: start-(end-1)
+        result = await database.table(self.table, timeout=timeout).select(HISTORY_MESSAGE_FIELDS).eq(
+            'conversation_id', conversation_id
+        ).order('created_at', desc=False).range(start, end).execute()
+        return result.data or []
+
+    async def page(
+        self,
+        conversation_id: str,
+        columns: str,
+        limit: int,
+        newest_first: bool = True,
+        cursor: Optional[Tuple[str, str]] = None,
+        since: Optional[str] = None,
+        timeout: Optional[float] = None
+    ) -> List[Dict]:
+        """
+        Return up to limit messages past a (created_at, id) cursor, in query order
+
+        newest_first pages backwards from the cursor, otherwise forwards;
+        since additionally restricts to messages created after a timestamp.
+        """
+        query = database.table(self.table, timeout=timeout).select(columns).eq('conversation_id', conversation_id)
+        if since:
+            query = query.gt('created_at', since)
+
+        query.params = query.params.add('order', keyset_order(newest_first))
+        if cursor:
+            query.params = query.params.add('and', f'({keyset_filter(cursor, newest_first)})')
+
+        result = await query.limit(limit).execute()
+        return result.data or []
+
+message_repository = MessageRepository()
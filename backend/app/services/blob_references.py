@@ -0,0 +1,93 @@
+"""
+Reference counting for shared content-addressed blobs
+
+In deduplicated storage mode several files/documents rows point at the same
+blobs/<sha256> object. The rows themselves are the references: a blob is
+removed once no live row refers to it any more.
+
+Counting references and deleting the blob cannot be one atomic step, so a
+release races with uploads that start referencing the blob in between. Both
+sides therefore check again afterwards: release_blob moves the blob aside,
+recounts and moves it back if a reference appeared, and uploads call
+retain_blob after inserting their row, which puts the blob back if a release
+took it away.
+"""
+
+import uuid
+import asyncio
+import logging
+from typing import BinaryIO, Optional
+
+from app.repositories import document_repository, file_repository
+from app.services.storage import async_storage_service
+
+logger = logging.getLogger(__name__)
+
+# Blobs being released are moved here until their deletion is confirmed
+RELEASED_PREFIX = 'released-blobs'
+
+async def blob_reference_count(storage_path: str) -> int:
+    """Count live files and documents rows that reference a storage path"""
+    files, documents = await asyncio.gather(
+        file_repository.count_by_storage_path(storage_path),
+        document_repository.count_by_storage_path(storage_path)
+    )
+    return files + documents
+
+async def release_blob(storage_path: str) -> bool:
+    """
+    Delete a blob from storage if nothing references it any more
+    
+    Call after the referencing row has been deleted. Errors are logged, not
+    raised: the row is already gone and a leftover blob only costs space.
+    
+    Returns:
+        True if the blob was removed
+    """
+    try:
+        if await blob_reference_count(storage_path) > 0:
+            return False
+        
+        # Take the blob out of reach before deleting it, then make sure no upload referenced it meanwhile
+        released_key = f"{RELEASED_PREFIX}/{uuid.uuid4()}"
+        if not await async_storage_service.move_file(storage_path, released_key, overwrite=False):
+            # Already gone, e.g. released concurrently by another delete
+            return False
+        
+        if await blob_reference_count(storage_path) > 0:
+            if not await async_storage_service.move_file(released_key, storage_path):
+                logger.error(f"Failed to restore referenced blob {storage_path} from {released_key}")
+            return False
+        
+        if not await async_storage_service.delete_file(released_key):
+            logger.warning(f"Failed to delete unreferenced blob {storage_path} from storage: {released_key}")
+        return True
+    except Exception as e:
+        logger.error(f"Failed to release blob {storage_path}: {str(e)}")
+        return False
+
+async def retain_blob(storage_path: str, file: Optional[BinaryIO] = None, content_type: Optional[str] = None) -> bool:
+    """
+    Make sure a blob that a new row references still exists
+    
+    Call after the row has been inserted. A release that counted references
+    before the insert may have removed the blob; it is uploaded again from
+    file (the same content, so the same key) when one is given.
+    
+    Returns:
+        True if the blob exists
+    """
+    if await async_storage_service.get_file_info(storage_path) is not None:
+        return True
+    if file is None:
+        logger.error(f"Referenced blob {storage_path} is missing from storage")
+        return False
+    
+    file.seek(0)
+    await async_storage_service.upload_file(
+        file,
+        storage_path.rsplit('/', 1)[-1],
+        content_type=content_type,
+        s3_key=storage_path
+    )
+    return True
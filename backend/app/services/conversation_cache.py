@@ -0,0 +1,61 @@
+"""
+Cache of each user's conversation with an agent
+
+Maps (user_id, agent_id, startup_id) to the chat_conversations row so chat
+turns and history reads skip the ordered conversation lookup. Misses are
+single-flight: concurrent callers for the same key share one lookup, so
+simultaneous first messages create only one conversation in this worker.
+"""
+
+import os
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable, Optional
+
+from app.core.cache import TTLCache
+
+conversation_cache = TTLCache(
+    maxsize=int(os.getenv('CONVERSATION_CACHE_SIZE', '10000')),
+    ttl=float(os.getenv('CONVERSATION_CACHE_TTL', '3600'))
+)
+
+_inflight: Dict[Hashable, asyncio.Future] = {}
+
+def cache_key(user_id: str, agent_id: str, startup_id: Optional[str] = None) -> tuple:
+    return (user_id, agent_id, startup_id or None)
+
+async def get_conversation(
+    key: tuple,
+    loader: Callable[[], Awaitable[Optional[Dict]]],
+    flight: str = 'lookup'
+) -> Optional[Dict]:
+    """
+    Return the cached conversation for key, or await loader to fetch it
+    
+    Concurrent misses with the same key and flight share one loader call.
+    Lookups that may create a conversation use their own flight so they never
+    adopt the None result of a read-only lookup. Misses are not cached.
+    """
+    conversation = conversation_cache.get(key)
+    if conversation is not None:
+        return conversation
+    
+    flight_key = (flight, key)
+    future = _inflight.get(flight_key)
+    if future is None:
+        future = asyncio.ensure_future(loader())
+        _inflight[flight_key] = future
+        future.add_done_callback(lambda _: _inflight.pop(flight_key, None))
+    
+    # Shield so a cancelled caller doesn't cancel the lookup other callers are waiting on
+    conversation = await asyncio.shield(future)
+    if conversation:
+        conversation_cache.set(key, conversation)
+    return conversation
+
+def invalidate(key: tuple):
+    """Drop a cached conversation"""
+    conversation_cache.pop(key)
+
+def stats() -> Dict:
+    """Return hit/miss counters and the number of lookups in flight"""
+    return {**conversation_cache.stats(), 'inflight': len(_inflight)}
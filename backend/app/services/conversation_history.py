@@ -0,0 +1,113 @@
+"""
+Server-side chat history with an in-process per-conversation tail cache
+
+Requests that omit conversationHistory have it loaded here by conversation
+id. The most recent messages of each active conversation are kept in memory
+and appended to by save_message, so steady-state turns read history without
+a PostgREST query.
+"""
+
+import os
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+from app.core.cache import TTLCache
+from app.models.chat import ChatMessage
+from app.repositories import message_repository
+from app.services.message_writer import message_writer
+
+TAIL_SIZE = int(os.getenv('CHAT_HISTORY_TAIL_SIZE', '100'))
+
+class ConversationTail:
+    """The last messages of a conversation and the conversation's total message count"""
+    
+    __slots__ = ('messages', 'total')
+    
+    def __init__(self, messages: List[ChatMessage], total: int):
+        self.messages = deque(messages, maxlen=TAIL_SIZE)
+        self.total = total
+    
+    @property
+    def first_index(self) -> int:
+        """Index within the conversation of the oldest cached message"""
+        return self.total - len(self.messages)
+
+# Keyed by conversation id; entries expire so other workers' writes are picked up eventually
+tail_cache = TTLCache(
+    maxsize=int(os.getenv('CHAT_HISTORY_CACHE_SIZE', '5000')),
+    ttl=float(os.getenv('CHAT_HISTORY_CACHE_TTL', '600'))
+)
+
+def to_chat_message(row: Dict) -> ChatMessage:
+    """Convert a chat_messages row to the role/content shape sent to Gemini"""
+    return ChatMessage(
+        role='assistant' if row['sender'] == 'agent' else 'user',
+        content=row['content']
+    )
+
+def record_message(conversation_id: str, content: str, sender: str):
+    """
+    Append a saved message to the conversation's cached tail
+    
+    Conversations without a cached tail are left alone; their next load
+    fetches the tail from the database and merges in the messages the
+    message writer has not written yet, so the message is still included.
+    """
+    tail = tail_cache.get(conversation_id)
+    if tail is not None:
+        tail.messages.append(to_chat_message({'content': content, 'sender': sender}))
+        tail.total += 1
+
+async def _fetch_tail(conversation_id: str) -> ConversationTail:
+    # Queued messages are taken before and after the query: a batch written
+    # meanwhile shows up in the rows, and one enqueued meanwhile in the queue
+    queued = message_writer.pending_messages(conversation_id)
+    rows, total = await message_repository.fetch_tail(conversation_id, TAIL_SIZE)
+    
+    stored = {row['id'] for row in rows}
+    for message in queued + message_writer.pending_messages(conversation_id):
+        if message['id'] not in stored:
+            stored.add(message['id'])
+            rows.append(message)
+            total += 1
+    return ConversationTail([to_chat_message(row) for row in rows], total)
+
+async def _fetch_range(conversation_id: str, start: int, end: int) -> List[ChatMessage]:
+    rows = await message_repository.fetch_range(conversation_id, start, end)
+    return [to_chat_message(row) for row in rows]
+
+async def load_history(conversation_id: str, start: int = 0) -> Tuple[List[ChatMessage], int]:
+    """
+    Return the conversation's messages from index start onward, and start
+    
+    Served from the cached tail whenever it reaches back to start; older
+    ranges (e.g. a long conversation with no compaction summary yet) are
+    read from the database.
+    """
+    tail: Optional[ConversationTail] = tail_cache.get(conversation_id)
+    if tail is None:
+        tail = await _fetch_tail(conversation_id)
+        tail_cache.set(conversation_id, tail)
+    
+    start = min(start, tail.total)
+    if start >= tail.first_index:
+        return list(tail.messages)[start - tail.first_index:], start
+    
+    older = await _fetch_range(conversation_id, start, tail.first_index)
+    return older + list(tail.messages), start
+
+def invalidate(conversation_id: str):
+    """Drop a conversation's cached tail"""
+    tail_cache.pop(conversation_id)
+
+def _forget_dropped(batch: List[Dict]):
+    # Tails hold messages from the moment they are queued; once the writer
+    # gives up on a batch they must be reloaded from what the database has
+    for conversation_id in {message['conversation_id'] for message in batch}:
+        invalidate(conversation_id)
+
+message_writer.drop_handlers.append(_forget_dropped)
+
+def stats() -> Dict:
+    """Return tail cache hit/miss counters"""
+    return tail_cache.stats()
@@ -0,0 +1,162 @@
+"""
+Local on-disk read-through cache for stored objects
+"""
+
+import os
+import uuid
+import asyncio
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import AsyncIterator, Dict, Optional
+
+class DiskFileCache:
+    """
+    Size-bounded LRU cache of object bodies on local disk
+    
+    Entries are keyed by storage path + ETag, so a changed object never
+    serves stale bytes. Files are named <sha256(storage_path)>-<etag> which
+    lets invalidate() drop every version of a path without an index lookup.
+    """
+    
+    def __init__(self, directory: str, max_bytes: int, max_object_bytes: int):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.max_object_bytes = min(max_object_bytes, max_bytes)
+        self.enabled = max_bytes > 0
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        
+        if self.enabled:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self._load()
+    
+    def _load(self):
+        """Index files left by a previous process, oldest first"""
+        files = [path for path in self.directory.iterdir() if path.is_file() and not path.name.startswith('.')]
+        for path in sorted(files, key=lambda path: path.stat().st_mtime):
+            size = path.stat().st_size
+            self._entries[path.name] = size
+            self._size += size
+        self._evict()
+    
+    @staticmethod
+    def _path_prefix(storage_path: str) -> str:
+        return hashlib.sha256(storage_path.encode()).hexdigest()
+    
+    def _key(self, storage_path: str, etag: str) -> str:
+        safe_etag = "".join(c for c in etag if c.isalnum())
+        return f"{self._path_prefix(storage_path)}-{safe_etag}"
+    
+    def lookup(self, storage_path: str, etag: Optional[str]) -> Optional[Path]:
+        """Return the cached file for an object version, or None on miss"""
+        if not self.enabled or not etag:
+            return None
+        
+        key = self._key(storage_path, etag)
+        with self._lock:
+            if key in self._entries and (self.directory / key).exists():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self.directory / key
+            if key in self._entries:
+                self._size -= self._entries.pop(key)
+            self.misses += 1
+        return None
+    
+    def should_store(self, etag: Optional[str], size: Optional[int]) -> bool:
+        """Only whole objects with a known ETag and size under the per-object limit are cached"""
+        return self.enabled and bool(etag) and size is not None and 0 < size <= self.max_object_bytes
+    
+    async def tee(
+        self,
+        storage_path: str,
+        etag: str,
+        size: int,
+        chunks: AsyncIterator[bytes]
+    ) -> AsyncIterator[bytes]:
+        """
+        Pass chunks through to the client while writing them to the cache
+        
+        The entry is committed only if exactly size bytes were streamed; a
+        client disconnect or upstream error discards the partial file.
+        """
+        key = self._key(storage_path, etag)
+        temp_path = self.directory / f".{key}.{uuid.uuid4().hex}"
+        written = 0
+        handle = await asyncio.to_thread(open, temp_path, 'wb')
+        try:
+            async for chunk in chunks:
+                await asyncio.to_thread(handle.write, chunk)
+                written += len(chunk)
+                yield chunk
+            await asyncio.to_thread(handle.close)
+            if written == size:
+                os.replace(temp_path, self.directory / key)
+                self._add(key, size)
+        finally:
+            handle.close()
+            if temp_path.exists():
+                temp_path.unlink()
+    
+    def _add(self, key: str, size: int):
+        with self._lock:
+            if key in self._entries:
+                self._size -= self._entries[key]
+            self._entries[key] = size
+            self._entries.move_to_end(key)
+            self._size += size
+            self._evict()
+    
+    def _evict(self):
+        """Drop least recently used entries until the cache fits in max_bytes"""
+        while self._size > self.max_bytes and self._entries:
+            key, size = self._entries.popitem(last=False)
+            self._size -= size
+            self.evictions += 1
+            try:
+                (self.directory / key).unlink()
+            except FileNotFoundError:
+                pass
+    
+    def invalidate(self, storage_path: str):
+        """Remove every cached version of a storage path"""
+        if not self.enabled:
+            return
+        
+        prefix = f"{self._path_prefix(storage_path)}-"
+        with self._lock:
+            for key in [key for key in self._entries if key.startswith(prefix)]:
+                self._size -= self._entries.pop(key)
+                try:
+                    (self.directory / key).unlink()
+                except FileNotFoundError:
+                    pass
+    
+    def stats(self) -> Dict:
+        """Return size and hit/miss counters"""
+        lookups = self.hits + self.misses
+        return {
+            'enabled': self.enabled,
+            'directory': str(self.directory),
+            'entries': len(self._entries),
+            'size_bytes': self._size,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+# Singleton instance; FILE_CACHE_MAX_BYTES=0 disables the cache
+file_cache = DiskFileCache(
+    directory=os.getenv('FILE_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'di-companion-file-cache')),
+    max_bytes=int(os.getenv('FILE_CACHE_MAX_BYTES', str(512 * 1024 * 1024))),
+    max_object_bytes=int(os.getenv('FILE_CACHE_MAX_OBJECT_BYTES', str(25 * 1024 * 1024)))
+)
@@ -0,0 +1,224 @@
+"""
+Streaming proxy responses for stored objects with Range and conditional GET support
+"""
+
+import json
+import asyncio
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from pathlib import Path
+from typing import AsyncIterator, Dict, Optional, Tuple, Union
+
+from fastapi import HTTPException, Request, Response
+from fastapi.responses import FileResponse, StreamingResponse
+from starlette.background import BackgroundTask
+
+from app.services.file_cache import file_cache
+from app.services.storage import async_storage_service
+
+def record_etag(record: Dict) -> Optional[str]:
+    """Return the MD5 ETag stored in a files/documents record's metadata, if any"""
+    metadata = record.get('metadata') or {}
+    if isinstance(metadata, str):
+        try:
+            metadata = json.loads(metadata)
+        except ValueError:
+            return None
+    return metadata.get('etag') if isinstance(metadata, dict) else None
+
+def _parse_timestamp(value: Optional[str]) -> Optional[datetime]:
+    """Parse an ISO timestamp from a database record, assuming UTC when naive"""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.replace(microsecond=0)
+
+def _etag_matches(header: str, etag: str) -> bool:
+    """Check an If-None-Match / If-Range header value against an entity tag"""
+    if header.strip() == '*':
+        return True
+    candidates = [candidate.strip() for candidate in header.split(',')]
+    return any(candidate.removeprefix('W/').strip('"') == etag for candidate in candidates)
+
+def _not_modified(request: Request, etag: Optional[str], last_modified: Optional[datetime]) -> bool:
+    """Evaluate If-None-Match, falling back to If-Modified-Since when it is absent"""
+    if_none_match = request.headers.get('if-none-match')
+    if if_none_match is not None:
+        return bool(etag) and _etag_matches(if_none_match, etag)
+
+    if_modified_since = request.headers.get('if-modified-since')
+    if if_modified_since and last_modified:
+        try:
+            return last_modified <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+def _range_header(request: Request, etag: Optional[str], last_modified: Optional[datetime]) -> Optional[str]:
+    """
+    Return the Range header to forward to storage, or None to serve the whole object
+
+    Only single byte ranges are forwarded; multi-range requests are answered
+    with the full body, which RFC 9110 allows. An If-Range validator that no
+    longer matches also yields the full body.
+    """
+    range_header = request.headers.get('range')
+    if not range_header or not range_header.startswith('bytes=') or ',' in range_header:
+        return None
+
+    if_range = request.headers.get('if-range')
+    if if_range:
+        if if_range.startswith('"') or if_range.startswith('W/'):
+            if not etag or if_range.strip('"') != etag:
+                return None
+        else:
+            try:
+                if not last_modified or parsedate_to_datetime(if_range) != last_modified:
+                    return None
+            except (TypeError, ValueError):
+                return None
+
+    return range_header
+
+def _parse_byte_range(range_header: str, size: int) -> Union[Tuple[int, int], None, bool]:
+    """
+    Resolve a single 'bytes=' range against an object size
+
+    Returns (start, end) inclusive, None if the header is malformed (serve the
+    whole object), or False if the range is unsatisfiable.
+    """
+    try:
+        start, end = range_header[len('bytes='):].split('-', 1)
+        if not start:
+            length = int(end)
+            if length <= 0:
+                return False
+            return max(size - length, 0), size - 1
+        start = int(start)
+        end = min(int(end), size - 1) if end else size - 1
+    except ValueError:
+        return None
+    if start >= size or start > end:
+        return False
+    return start, end
+
+async def _iter_file_range(path: Path, start: int, length: int, chunk_size: int = 64 * 1024) -> AsyncIterator[bytes]:
+    """Read a byte range from a local file without blocking the event loop"""
+    handle = await asyncio.to_thread(open, path, 'rb')
+    try:
+        await asyncio.to_thread(handle.seek, start)
+        while length > 0:
+            chunk = await asyncio.to_thread(handle.read, min(chunk_size, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+    finally:
+        handle.close()
+
+def _cached_response(
+    path: Path,
+    range_header: Optional[str],
+    media_type: str,
+    headers: Dict[str, str]
+) -> Response:
+    """Serve a cache hit: FileResponse for whole objects, a ranged stream for byte ranges"""
+    size = path.stat().st_size
+    byte_range = _parse_byte_range(range_header, size) if range_header else None
+
+    if byte_range is False:
+        return Response(status_code=416, headers={'Content-Range': f'bytes */{size}', 'Accept-Ranges': 'bytes'})
+
+    if byte_range is None:
+        return FileResponse(path, media_type=media_type, headers=headers)
+
+    start, end = byte_range
+    headers['Content-Range'] = f'bytes {start}-{end}/{size}'
+    headers['Content-Length'] = str(end - start + 1)
+    return StreamingResponse(
+        _iter_file_range(path, start, end - start + 1),
+        status_code=206,
+        media_type=media_type,
+        headers=headers
+    )
+
+async def proxy_storage_object(
+    request: Request,
+    storage_path: str,
+    media_type: str,
+    filename: str,
+    disposition: str = 'inline',
+    etag: Optional[str] = None,
+    last_modified: Optional[str] = None,
+    not_found_detail: str = "File not found in storage",
+    cache_control: str = 'public, max-age=86400'
+) -> Response:
+    """
+    Stream a stored object to the client
+
+    Honours If-None-Match / If-Modified-Since with a 304 that skips the
+    storage fetch entirely, and forwards single byte ranges to WebDAV,
+    answering with 206 or 416 as storage reports. Objects with an ETag are
+    served from the local disk cache when present and written through to it
+    on full-body misses. cache_control is sent on 200/206/304 responses and
+    defaults to caching for a day.
+    """
+    modified_at = _parse_timestamp(last_modified)
+
+    headers: Dict[str, str] = {
+        'Cache-Control': cache_control,
+        'Accept-Ranges': 'bytes',
+        'Content-Disposition': f'{disposition}; filename="{filename}"'
+    }
+    if etag:
+        headers['ETag'] = f'"{etag}"'
+    if modified_at:
+        headers['Last-Modified'] = format_datetime(modified_at, usegmt=True)
+
+    if _not_modified(request, etag, modified_at):
+        headers.pop('Content-Disposition')
+        return Response(status_code=304, headers=headers)
+
+    range_header = _range_header(request, etag, modified_at)
+
+    cached_path = file_cache.lookup(storage_path, etag)
+    if cached_path:
+        return _cached_response(cached_path, range_header, media_type, headers)
+
+    response = await async_storage_service.open_stream(
+        storage_path,
+        headers={'Range': range_header} if range_header else None
+    )
+
+    if response.status_code == 416:
+        await response.aclose()
+        content_range = response.headers.get('Content-Range', 'bytes */*')
+        return Response(status_code=416, headers={'Content-Range': content_range, 'Accept-Ranges': 'bytes'})
+
+    if response.status_code not in (200, 206):
+        await response.aclose()
+        raise HTTPException(status_code=404, detail=not_found_detail)
+
+    if response.status_code == 206 and 'Content-Range' in response.headers:
+        headers['Content-Range'] = response.headers['Content-Range']
+    if 'Content-Length' in response.headers:
+        headers['Content-Length'] = response.headers['Content-Length']
+
+    body = response.aiter_bytes(64 * 1024)
+    content_length = response.headers.get('Content-Length')
+    if response.status_code == 200 and content_length and file_cache.should_store(etag, int(content_length)):
+        body = file_cache.tee(storage_path, etag, int(content_length), body)
+
+    # Stream the object back to the client with proper headers
+    return StreamingResponse(
+        body,
+        status_code=response.status_code,
+        background=BackgroundTask(response.aclose),
+        media_type=media_type,
+        headers=headers
+    )
@@ -0,0 +1,280 @@
+"""
+Google Gemini integration for agent chat
+"""
+
+import math
+import time
+import random
+import asyncio
+import hashlib
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional
+
+import google.generativeai as genai
+from google.api_core import exceptions as google_exceptions
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.metrics import LatencyStats
+from app.models.chat import ChatMessage, ChatRequest
+
+# Configure Gemini with API key
+if settings.GEMINI_API_KEY:
+    genai.configure(api_key=settings.GEMINI_API_KEY)
+
+# Upstream errors worth retrying: quota exhaustion (429) and temporary unavailability (503)
+RETRYABLE_ERRORS = (google_exceptions.TooManyRequests, google_exceptions.ServiceUnavailable)
+
+class GenerationUnavailable(Exception):
+    """Raised when a generation is not admitted or upstream stays over quota; carries an HTTP status and Retry-After"""
+    
+    def __init__(self, message: str, status_code: int = 503, retry_after: int = 1):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+class AdmissionController:
+    """
+    Admits Gemini generations in this worker
+    
+    At most max_concurrency generations run at once; up to max_queue more
+    wait for a slot for at most queue_timeout seconds. Requests beyond the
+    queue are rejected with 429 and requests that time out with 503, both
+    with a Retry-After estimated from how long generations hold a slot.
+    """
+    
+    def __init__(self, max_concurrency: int, max_queue: int, queue_timeout: float):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.in_flight = 0
+        self.waiting = 0
+        self.queue_wait = LatencyStats()
+        self.hold_time = LatencyStats()
+        self.rejections = {'queue_full': 0, 'queue_timeout': 0, 'upstream': 0}
+        self.upstream_retries = 0
+    
+    def retry_after(self) -> int:
+        """Seconds a rejected client should wait, from the median slot hold time"""
+        return max(1, math.ceil(self.hold_time.stats()['p50_ms'] / 1000))
+    
+    def check_capacity(self):
+        """Fail fast, before any other work, when the wait queue is already full"""
+        if self.in_flight + self.waiting >= self.max_concurrency + self.max_queue:
+            self.rejections['queue_full'] += 1
+            raise GenerationUnavailable(
+                "Too many chat requests in progress, please retry shortly", 429, self.retry_after()
+            )
+    
+    @asynccontextmanager
+    async def slot(self):
+        self.check_capacity()
+        
+        self.waiting += 1
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejections['queue_timeout'] += 1
+            raise GenerationUnavailable(
+                "Timed out waiting for a free chat slot, please retry shortly", 503, self.retry_after()
+            )
+        finally:
+            self.waiting -= 1
+        
+        acquired = time.perf_counter()
+        self.queue_wait.record(acquired - started)
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+            self.hold_time.record(time.perf_counter() - acquired)
+    
+    def upstream_unavailable(self, error: Exception) -> GenerationUnavailable:
+        """Translate an upstream quota or availability error that outlasted retries"""
+        self.rejections['upstream'] += 1
+        status_code = 429 if isinstance(error, google_exceptions.TooManyRequests) else 503
+        return GenerationUnavailable(
+            "The AI service is over capacity, please retry shortly", status_code, self.retry_after()
+        )
+    
+    def stats(self) -> Dict:
+        return {
+            'max_concurrency': self.max_concurrency,
+            'max_queue': self.max_queue,
+            'in_flight': self.in_flight,
+            'queue_depth': self.waiting,
+            'queue_wait': self.queue_wait.stats(),
+            'rejections': dict(self.rejections),
+            'upstream_retries': self.upstream_retries
+        }
+
+limiter = AdmissionController(
+    settings.GEMINI_MAX_CONCURRENCY,
+    settings.GEMINI_MAX_QUEUE,
+    settings.GEMINI_QUEUE_TIMEOUT
+)
+
+async def _backoff(attempt: int):
+    """Sleep with jittered exponential backoff before retrying an upstream error"""
+    delay = min(settings.GEMINI_RETRY_BASE_DELAY * 2 ** attempt, 30)
+    await asyncio.sleep(delay * random.uniform(0.5, 1))
+
+async def _admitted_call(call):
+    """Run a model call in an admission slot, retrying quota errors outside the slot"""
+    for attempt in range(settings.GEMINI_MAX_RETRIES + 1):
+        try:
+            async with limiter.slot():
+                return await call()
+        except RETRYABLE_ERRORS as e:
+            if attempt == settings.GEMINI_MAX_RETRIES:
+                raise limiter.upstream_unavailable(e) from e
+            limiter.upstream_retries += 1
+            await _backoff(attempt)
+
+# Latency of generations
+generation_latency = LatencyStats()
+time_to_first_token = LatencyStats()
+stream_latency = LatencyStats()
+
+# Models keyed by (agent, model, generation config, system prompt), built once and shared by requests
+model_registry = TTLCache(maxsize=settings.GEMINI_MODEL_CACHE_SIZE, ttl=24 * 3600)
+
+def get_model(
+    agent_id: Optional[str],
+    system_prompt: Optional[str],
+    temperature: float = None,
+    max_output_tokens: int = None
+) -> genai.GenerativeModel:
+    """Return the shared model for an agent's system prompt and generation settings"""
+    generation_config = {
+        "temperature": settings.GEMINI_TEMPERATURE if temperature is None else temperature,
+        "max_output_tokens": settings.GEMINI_MAX_TOKENS if max_output_tokens is None else max_output_tokens,
+    }
+    prompt_hash = hashlib.sha256(system_prompt.encode()).hexdigest() if system_prompt else None
+    key = (agent_id, settings.GEMINI_MODEL, tuple(sorted(generation_config.items())), prompt_hash)
+    
+    model = model_registry.get(key)
+    if model is None:
+        model = genai.GenerativeModel(
+            model_name=settings.GEMINI_MODEL,
+            generation_config=generation_config,
+            system_instruction=system_prompt or None
+        )
+        model_registry.set(key, model)
+    return model
+
+def build_history(request: ChatRequest, summary: Optional[str] = None) -> List[Dict]:
+    """Prepare conversation history for Gemini, led by a summary of compacted turns if any"""
+    history = []
+    
+    # Add the rolling summary of turns compacted out of the history
+    if summary:
+        history.append({
+            "role": "user",
+            "parts": [f"Summary of our conversation so far: {summary}"]
+        })
+        history.append({
+            "role": "model",
+            "parts": ["Understood. I'll keep this context in mind."]
+        })
+    
+    # Add conversation history
+    for msg in request.conversationHistory or []:
+        # Map 'assistant' role to 'model' for Gemini
+        role = "model" if msg.role == "assistant" else msg.role
+        history.append({
+            "role": role,
+            "parts": [msg.content]
+        })
+    
+    return history
+
+def start_chat(request: ChatRequest, summary: Optional[str] = None) -> genai.ChatSession:
+    """Create a chat session on the agent's shared model with the request's history"""
+    model = get_model(request.agentId, request.systemPrompt)
+    return model.start_chat(history=build_history(request, summary))
+
+async def generate_reply(request: ChatRequest, summary: Optional[str] = None) -> str:
+    """Generate the full reply to the request's message without blocking the event loop"""
+    async def generate():
+        started = time.perf_counter()
+        chat_session = start_chat(request, summary)
+        response = await chat_session.send_message_async(request.message)
+        generation_latency.record(time.perf_counter() - started)
+        return response
+    
+    response = await _admitted_call(generate)
+    return response.text
+
+async def stream_reply(
+    request: ChatRequest,
+    timings: Dict,
+    summary: Optional[str] = None
+) -> AsyncIterator[str]:
+    """
+    Stream text deltas for the request's message using Gemini's streaming generation
+    
+    Fills timings with time-to-first-token and total latency in milliseconds
+    once the stream is exhausted. Quota errors are retried only until the
+    first token has been yielded.
+    """
+    started = time.perf_counter()
+    first_token_at = None
+    
+    for attempt in range(settings.GEMINI_MAX_RETRIES + 1):
+        try:
+            async with limiter.slot():
+                chat_session = start_chat(request, summary)
+                response = await chat_session.send_message_async(request.message, stream=True)
+                async for chunk in response:
+                    if not chunk.parts:
+                        continue
+                    text = chunk.text
+                    if not text:
+                        continue
+                    if first_token_at is None:
+                        first_token_at = time.perf_counter()
+                        time_to_first_token.record(first_token_at - started)
+                        timings['ttft_ms'] = round((first_token_at - started) * 1000, 1)
+                    yield text
+            break
+        except RETRYABLE_ERRORS as e:
+            if first_token_at is not None or attempt == settings.GEMINI_MAX_RETRIES:
+                raise limiter.upstream_unavailable(e) from e
+            limiter.upstream_retries += 1
+            await _backoff(attempt)
+    
+    total = time.perf_counter() - started
+    stream_latency.record(total)
+    timings['total_ms'] = round(total * 1000, 1)
+
+async def summarize(summary: Optional[str], messages: List[ChatMessage]) -> str:
+    """Fold messages into a rolling conversation summary, extending the previous one if given"""
+    transcript = "\n".join(
+        f"{'Coach' if msg.role == 'assistant' else 'User'}: {msg.content}" for msg in messages
+    )
+    prompt = (
+        "Update the running summary of a coaching conversation with the new messages below. "
+        "Keep facts, decisions, goals and open questions the coach will need later; "
+        "drop greetings and repetition. Reply with the updated summary only.\n\n"
+        f"Current summary:\n{summary or '(none)'}\n\n"
+        f"New messages:\n{transcript}"
+    )
+    model = get_model(None, None, temperature=0.2, max_output_tokens=settings.CHAT_HISTORY_SUMMARY_MAX_TOKENS)
+    
+    response = await _admitted_call(lambda: model.generate_content_async(prompt))
+    return response.text.strip()
+
+def stats() -> Dict:
+    """Return chat generation latency metrics"""
+    return {
+        'concurrency': limiter.stats(),
+        'model_registry': model_registry.stats(),
+        'generation_latency': generation_latency.stats(),
+        'stream_time_to_first_token': time_to_first_token.stats(),
+        'stream_total_latency': stream_latency.stats()
+    }
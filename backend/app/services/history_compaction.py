@@ -0,0 +1,188 @@
+"""
+Token-budgeted compaction of the conversation history sent to Gemini
+
+While a request fits the token budget its history is sent unchanged. Once it
+does not, every message except the most recent ones is folded into a rolling
+summary stored on the chat_conversations row (history_summary, plus
+history_summary_count: how many leading messages it covers). Later turns
+send the summary and only the messages after it, and the summary is only
+regenerated - from the previous summary plus the newly compacted messages -
+when the budget is exceeded again and the window advances.
+
+Regenerating the summary is a Gemini call, so it runs in the background
+instead of on the request path: the turn that advances the window sends the
+previous summary and the new window, and the updated summary applies from
+the next turn on. At most one summary is generated per conversation at once.
+
+Requests without conversationHistory get it from the server-side store,
+loading only the messages the stored summary does not already cover.
+"""
+
+import time
+import asyncio
+import logging
+from typing import Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.metrics import LatencyStats
+from app.models.chat import ChatMessage, ChatRequest
+from app.repositories import conversation_repository
+from app.services import conversation_history, gemini
+
+# Rough characters-per-token ratio; good enough for budgeting without a
+# count_tokens round trip on every request
+CHARS_PER_TOKEN = 4
+
+logger = logging.getLogger(__name__)
+
+summary_latency = LatencyStats()
+counters = {
+    'requests': 0,
+    'compacted': 0,
+    'summaries_generated': 0,
+    'summary_failures': 0,
+    'estimated_tokens_saved': 0
+}
+
+# Background summary generations keyed by conversation id
+summary_tasks: Dict[str, asyncio.Task] = {}
+
+def estimate_tokens(text: Optional[str]) -> int:
+    """Estimate the token count of a piece of text"""
+    return len(text) // CHARS_PER_TOKEN + 1 if text else 0
+
+def _history_tokens(messages: List[ChatMessage]) -> int:
+    return sum(estimate_tokens(msg.content) for msg in messages)
+
+def _stored_summary(conversation: Optional[Dict], history_length: int = None) -> Tuple[Optional[str], int]:
+    """Return the conversation's summary and covered message count, if it applies to this history"""
+    if not conversation or not conversation.get('history_summary'):
+        return None, 0
+    count = conversation.get('history_summary_count') or 0
+    if history_length is not None and count > history_length:
+        # The client sent a shorter history than the summary covers; start over
+        return None, 0
+    return conversation['history_summary'], count
+
+def _window_start(history: List[ChatMessage], summarized: int, fixed_tokens: int) -> int:
+    """Index of the first message to keep verbatim once the window advances"""
+    earliest = max(summarized, len(history) - settings.CHAT_HISTORY_RECENT_MESSAGES)
+    room = settings.CHAT_HISTORY_TOKEN_BUDGET - fixed_tokens - settings.CHAT_HISTORY_SUMMARY_MAX_TOKENS
+    # Walk back from the newest message, keeping messages while they still fit
+    start, tokens = len(history), 0
+    while start > earliest:
+        tokens += estimate_tokens(history[start - 1].content)
+        if tokens > room:
+            break
+        start -= 1
+    return start
+
+def _with_history(request: ChatRequest, messages: List[ChatMessage]) -> ChatRequest:
+    return request.model_copy(update={'conversationHistory': messages})
+
+async def _save_summary(conversation: Dict, summary: str, count: int):
+    try:
+        await conversation_repository.save_summary(conversation['id'], summary, count)
+        conversation['history_summary'] = summary
+        conversation['history_summary_count'] = count
+    except Exception as e:
+        logger.error(f"Error saving history summary: {e}")
+
+async def _update_summary(conversation: Dict, summary: Optional[str], messages: List[ChatMessage], count: int):
+    """Fold messages into the conversation's summary and store it for later turns"""
+    started = time.perf_counter()
+    try:
+        summary = await gemini.summarize(summary, messages)
+    except Exception as e:
+        # Keep the previous summary; the next turn over budget tries again
+        logger.error(f"Error summarizing chat history: {e}")
+        counters['summary_failures'] += 1
+        return
+    summary_latency.record(time.perf_counter() - started)
+    counters['summaries_generated'] += 1
+    await _save_summary(conversation, summary, count)
+
+def _schedule_summary(conversation: Dict, summary: Optional[str], messages: List[ChatMessage], count: int):
+    """Start generating the conversation's next summary unless one is already under way"""
+    conversation_id = conversation['id']
+    if conversation_id in summary_tasks:
+        return
+    task = asyncio.get_running_loop().create_task(_update_summary(conversation, summary, messages, count))
+    summary_tasks[conversation_id] = task
+    task.add_done_callback(lambda _: summary_tasks.pop(conversation_id, None))
+
+async def close():
+    """Wait for summaries still being generated"""
+    await asyncio.gather(*list(summary_tasks.values()), return_exceptions=True)
+
+async def compact_history(
+    request: ChatRequest,
+    conversation: Optional[Dict] = None
+) -> Tuple[ChatRequest, Optional[str]]:
+    """
+    Fit the request's history into the configured token budget
+    
+    Returns the request with its history trimmed to the verbatim window and
+    the summary to send ahead of it (or None). When the window advances, the
+    messages it passed are summarized in the background and left out of this
+    turn, which still sends the previous summary. Anonymous requests have no
+    conversation row to keep a summary on, so their older turns are dropped
+    instead of summarized, as are all conversations' while the database
+    lacks the summary columns.
+    
+    Message indices (history_summary_count, the window start) count from the
+    start of the conversation; offset is the index of the first message in
+    the history being compacted, which is non-zero when the server-side
+    store skipped messages already covered by the summary.
+    """
+    counters['requests'] += 1
+    budget_enabled = settings.CHAT_HISTORY_TOKEN_BUDGET > 0
+    offset = 0
+    if request.conversationHistory is None:
+        history = []
+        if conversation:
+            start = _stored_summary(conversation)[1] if budget_enabled else 0
+            history, offset = await conversation_history.load_history(conversation['id'], start)
+        request = _with_history(request, history)
+    
+    history = request.conversationHistory
+    if not budget_enabled or not (history or offset):
+        return request, None
+    
+    summary, summarized = _stored_summary(conversation, offset + len(history))
+    # Indices below are relative to the loaded history
+    summarized = max(summarized - offset, 0)
+    fixed_tokens = estimate_tokens(request.systemPrompt) + estimate_tokens(request.message)
+    full_tokens = fixed_tokens + _history_tokens(history)
+    
+    current_tokens = fixed_tokens + estimate_tokens(summary) + _history_tokens(history[summarized:])
+    if current_tokens <= settings.CHAT_HISTORY_TOKEN_BUDGET:
+        if not summarized and not summary:
+            return request, None
+        counters['compacted'] += 1
+        counters['estimated_tokens_saved'] += max(full_tokens - current_tokens, 0)
+        return _with_history(request, history[summarized:]), summary
+    
+    # Over budget: advance the window and fold the messages it passed into the summary
+    start = _window_start(history, summarized, fixed_tokens)
+    can_summarize = conversation is not None and conversation_repository.summaries_available
+    if can_summarize and start > summarized:
+        _schedule_summary(conversation, summary, history[summarized:start], offset + start)
+    elif not can_summarize:
+        summary = None
+    
+    compacted = _with_history(request, history[start:])
+    counters['compacted'] += 1
+    counters['estimated_tokens_saved'] += max(
+        full_tokens - fixed_tokens - estimate_tokens(summary) - _history_tokens(history[start:]), 0
+    )
+    return compacted, summary
+
+def stats() -> Dict:
+    """Return compaction counters and summary generation latency"""
+    return {
+        **counters,
+        'summaries_in_progress': len(summary_tasks),
+        'token_budget': settings.CHAT_HISTORY_TOKEN_BUDGET,
+        'summary_latency': summary_latency.stats()
+    }
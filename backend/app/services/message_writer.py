@@ -0,0 +1,152 @@
+"""
+Write-behind persistence for chat messages
+
+save_message enqueues messages here instead of writing them inline. A
+background task drains the queue in batches: one insert into chat_messages
+per batch and one last_message_at update per conversation in it, awaited on
+the shared async PostgREST client. Messages are written in the order they
+were enqueued, so per-conversation ordering is preserved, and carry
+client-side ids and strictly increasing created_at timestamps so a retried
+batch is idempotent and rows in the same insert still sort correctly.
+"""
+
+import os
+import uuid
+import random
+import asyncio
+import logging
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional
+
+from app.core.metrics import LatencyStats
+from app.repositories import conversation_repository, message_repository
+
+logger = logging.getLogger(__name__)
+
+class MessageWriteQueue:
+    """Batches chat message inserts and coalesces conversation timestamp updates"""
+    
+    def __init__(self, batch_size: int, flush_interval: float, max_retries: int):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self._pending: deque = deque()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._last_timestamp: Optional[datetime] = None
+        self.batch_latency = LatencyStats()
+        self.written = 0
+        self.retries = 0
+        self.dropped = 0
+        # Called with each batch given up on, so caches holding its messages can forget them
+        self.drop_handlers: List[Callable[[List[Dict]], None]] = []
+    
+    def _timestamp(self) -> str:
+        now = datetime.now(timezone.utc)
+        if self._last_timestamp and now <= self._last_timestamp:
+            now = self._last_timestamp + timedelta(microseconds=1)
+        self._last_timestamp = now
+        return now.isoformat()
+    
+    def enqueue(self, conversation_id: str, content: str, sender: str) -> Dict:
+        """Queue a message for persistence and return the row that will be written"""
+        message = {
+            'id': str(uuid.uuid4()),
+            'conversation_id': conversation_id,
+            'content': content,
+            'sender': sender,
+            'created_at': self._timestamp()
+        }
+        self._pending.append(message)
+        self._ensure_worker()
+        self._wakeup.set()
+        return message
+    
+    def pending_messages(self, conversation_id: str) -> List[Dict]:
+        """Return a conversation's queued messages that may not be in the database yet, oldest first"""
+        return [message for message in list(self._pending) if message['conversation_id'] == conversation_id]
+    
+    def _ensure_worker(self):
+        loop = asyncio.get_running_loop()
+        if self._worker is None or self._worker.done() or self._worker.get_loop() is not loop:
+            self._wakeup = asyncio.Event()
+            self._worker = loop.create_task(self._run())
+    
+    async def _run(self):
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            # Linger briefly so the agent reply can join its user message's batch
+            await asyncio.sleep(self.flush_interval)
+            while self._pending:
+                await self._flush_batch()
+    
+    async def _flush_batch(self):
+        # Messages stay queued until written so a shutdown mid-write still flushes them
+        batch = [self._pending[index] for index in range(min(self.batch_size, len(self._pending)))]
+        await self._write(batch)
+        for _ in batch:
+            self._pending.popleft()
+    
+    async def _write(self, batch: List[Dict]):
+        for attempt in range(self.max_retries + 1):
+            try:
+                loop = asyncio.get_running_loop()
+                started = loop.time()
+                await self._write_batch(batch)
+                self.batch_latency.record(loop.time() - started)
+                self.written += len(batch)
+                return
+            except Exception as e:
+                if attempt == self.max_retries:
+                    logger.error(f"Error saving {len(batch)} chat messages, giving up: {str(e)}")
+                    self.dropped += len(batch)
+                    for handler in self.drop_handlers:
+                        handler(batch)
+                    return
+                logger.warning(f"Error saving chat messages (attempt {attempt + 1}), retrying: {str(e)}")
+                self.retries += 1
+                await asyncio.sleep(min(0.5 * 2 ** attempt, 30) * random.uniform(0.5, 1))
+    
+    @staticmethod
+    async def _write_batch(batch: List[Dict]):
+        # Ids are generated here, so re-sending a batch that was committed before a failure is a no-op
+        await message_repository.insert_batch(batch)
+        
+        last_message_at = {}
+        for message in batch:
+            last_message_at[message['conversation_id']] = message['created_at']
+        await asyncio.gather(*(
+            conversation_repository.touch(conversation_id, timestamp)
+            for conversation_id, timestamp in last_message_at.items()
+        ))
+    
+    async def close(self):
+        """Stop the background task and flush everything still queued"""
+        if self._worker and not self._worker.done():
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+        self._worker = None
+        while self._pending:
+            await self._flush_batch()
+    
+    def stats(self) -> Dict:
+        """Return queue depth, throughput counters and batch write latency"""
+        return {
+            'pending': len(self._pending),
+            'written': self.written,
+            'retries': self.retries,
+            'dropped': self.dropped,
+            'batch_latency': self.batch_latency.stats()
+        }
+
+# Singleton instance
+message_writer = MessageWriteQueue(
+    batch_size=int(os.getenv('CHAT_WRITE_BATCH_SIZE', '100')),
+    flush_interval=float(os.getenv('CHAT_WRITE_FLUSH_INTERVAL', '0.05')),
+    max_retries=int(os.getenv('CHAT_WRITE_MAX_RETRIES', '5'))
+)
@@ -0,0 +1,32 @@
+"""
+In-process cache of the immutable files/documents fields used to serve bytes
+"""
+
+import os
+
+from app.core.cache import TTLCache
+
+# Columns the proxy endpoints need; storage location and type never change after upload
+FILE_PROXY_FIELDS = 'id, storage_path, s3_key, mime_type, filename, metadata, created_at'
+DOCUMENT_PROXY_FIELDS = 'id, storage_path, mime_type, filename, metadata, uploaded_at, created_at'
+
+_size = int(os.getenv('METADATA_CACHE_SIZE', '10000'))
+_ttl = float(os.getenv('METADATA_CACHE_TTL', '300'))
+
+# Keyed by record id; entries are evicted by the handlers that delete, update or copy records
+file_metadata_cache = TTLCache(maxsize=_size, ttl=_ttl)
+document_metadata_cache = TTLCache(maxsize=_size, ttl=_ttl)
+
+def stats():
+    """Return hit/miss counters for both caches"""
+    return {
+        'files': file_metadata_cache.stats(),
+        'documents': document_metadata_cache.stats()
+    }
+
+__all__ = [
+    "FILE_PROXY_FIELDS",
+    "DOCUMENT_PROXY_FIELDS",
+    "file_metadata_cache",
+    "document_metadata_cache",
+]
@@ -0,0 +1,55 @@
+"""
+Opt-in exact-match cache of agent replies
+
+Keyed by a hash of everything that shapes a generation: model, generation
+settings, system prompt, compacted-history summary, history and message.
+Only agents listed in RESPONSE_CACHE_AGENTS (or all with "*") use it.
+"""
+
+import os
+import json
+import hashlib
+from typing import Dict, Optional
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.models.chat import ChatRequest
+
+_agents = {agent.strip() for agent in os.getenv('RESPONSE_CACHE_AGENTS', '').split(',') if agent.strip()}
+
+response_cache = TTLCache(
+    maxsize=int(os.getenv('RESPONSE_CACHE_SIZE', '1000')),
+    ttl=float(os.getenv('RESPONSE_CACHE_TTL', '86400'))
+)
+
+def enabled_for(agent_id: str) -> bool:
+    """Whether replies for an agent may be served from the cache"""
+    return '*' in _agents or agent_id in _agents
+
+def cache_key(request: ChatRequest, summary: Optional[str] = None) -> str:
+    """Hash the model settings and full prompt of a request"""
+    payload = json.dumps({
+        'model': settings.GEMINI_MODEL,
+        'temperature': settings.GEMINI_TEMPERATURE,
+        'max_tokens': settings.GEMINI_MAX_TOKENS,
+        'system_prompt': request.systemPrompt,
+        'summary': summary,
+        'history': [[msg.role, msg.content] for msg in request.conversationHistory or []],
+        'message': request.message
+    }, separators=(',', ':'))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+def get(request: ChatRequest, summary: Optional[str] = None) -> Optional[str]:
+    """Return the cached reply for a request, or None on miss or for agents without caching"""
+    if not enabled_for(request.agentId):
+        return None
+    return response_cache.get(cache_key(request, summary))
+
+def put(request: ChatRequest, reply: str, summary: Optional[str] = None):
+    """Cache a generated reply for agents with caching enabled"""
+    if reply and enabled_for(request.agentId):
+        response_cache.set(cache_key(request, summary), reply)
+
+def stats() -> Dict:
+    """Return hit/miss counters and the agents with caching enabled"""
+    return {**response_cache.stats(), 'agents': sorted(_agents)}
@@ -0,0 +1,301 @@
+"""
+Resumable chunked uploads staged on local disk
+
+A client initiates an upload with the token from /api/files/presigned-upload,
+PUTs numbered parts (in any order, in parallel), queries which parts have
+arrived, and completes. Parts are staged as separate files so a dropped
+connection only loses the part in flight; on completion they are streamed to
+storage as one object without being concatenated on disk.
+"""
+
+import io
+import os
+import json
+import hashlib
+import time
+import uuid
+import shutil
+import asyncio
+import tempfile
+from pathlib import Path
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+MANIFEST_NAME = 'manifest.json'
+COMPLETE_LOCK_NAME = 'complete.lock'
+
+class ResumableUploadError(Exception):
+    """Raised for invalid resumable upload requests; carries an HTTP status code"""
+    
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+class StagedPartsReader(io.RawIOBase):
+    """Seekable read-only view over staged part files in order, as one stream"""
+    
+    def __init__(self, paths: List[Path]):
+        self._paths = paths
+        self._sizes = [path.stat().st_size for path in paths]
+        self._size = sum(self._sizes)
+        self._position = 0
+        self._handle = None
+        self._handle_index = -1
+    
+    def readable(self) -> bool:
+        return True
+    
+    def seekable(self) -> bool:
+        return True
+    
+    def tell(self) -> int:
+        return self._position
+    
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        if whence == os.SEEK_SET:
+            self._position = offset
+        elif whence == os.SEEK_CUR:
+            self._position += offset
+        else:
+            self._position = self._size + offset
+        return self._position
+    
+    def read(self, size: int = -1) -> bytes:
+        if size is None or size < 0:
+            size = self._size - self._position
+        chunks = []
+        while size > 0 and self._position < self._size:
+            index, offset = self._locate(self._position)
+            if index != self._handle_index:
+                self._close_handle()
+                self._handle = open(self._paths[index], 'rb')
+                self._handle_index = index
+            self._handle.seek(offset)
+            chunk = self._handle.read(min(size, self._sizes[index] - offset))
+            if not chunk:
+                break
+            chunks.append(chunk)
+            self._position += len(chunk)
+            size -= len(chunk)
+        return b''.join(chunks)
+    
+    def _locate(self, position: int):
+        for index, part_size in enumerate(self._sizes):
+            if position < part_size:
+                return index, position
+            position -= part_size
+        return len(self._sizes) - 1, self._sizes[-1]
+    
+    def _close_handle(self):
+        if self._handle:
+            self._handle.close()
+            self._handle = None
+            self._handle_index = -1
+    
+    def close(self):
+        self._close_handle()
+        super().close()
+
+class ResumableUploadService:
+    """Manages staged multipart upload sessions on local disk"""
+    
+    def __init__(self):
+        self.staging_dir = Path(os.getenv(
+            'UPLOAD_STAGING_DIR',
+            os.path.join(tempfile.gettempdir(), 'di-companion-uploads')
+        ))
+        self.part_size = int(os.getenv('UPLOAD_PART_SIZE', str(8 * 1024 * 1024)))
+    
+    def _session_dir(self, upload_id: str) -> Path:
+        # Upload ids are uuid hex strings; reject anything that could escape the staging dir
+        if not upload_id.isalnum():
+            raise ResumableUploadError("Upload not found", 404)
+        return self.staging_dir / upload_id
+    
+    def _part_path(self, upload_id: str, part_number: int) -> Path:
+        return self._session_dir(upload_id) / f"part-{part_number:05d}"
+    
+    def _load_manifest(self, upload_id: str) -> Dict:
+        path = self._session_dir(upload_id) / MANIFEST_NAME
+        try:
+            manifest = json.loads(path.read_text())
+        except (FileNotFoundError, ValueError):
+            raise ResumableUploadError("Upload not found", 404)
+        if manifest['expires_at'] < time.time():
+            self.abort(upload_id)
+            raise ResumableUploadError("Upload has expired", 410)
+        return manifest
+    
+    def _expected_part_size(self, manifest: Dict, part_number: int) -> int:
+        if part_number == manifest['total_parts']:
+            return manifest['size_bytes'] - manifest['part_size'] * (manifest['total_parts'] - 1)
+        return manifest['part_size']
+    
+    def initiate(
+        self,
+        claims: Dict,
+        filename: str,
+        size_bytes: int,
+        content_type: Optional[str],
+        category: str,
+        entity_type: Optional[str],
+        entity_id: Optional[str],
+        metadata: Optional[str] = None
+    ) -> Dict:
+        """
+        Start an upload session from decoded presigned-upload token claims
+        
+        The token's max_size and content_type claims are checked here, once;
+        parts are raw byte ranges and only their lengths are checked later.
+        Each token has at most one session: its id is derived from the token's
+        claims, so a retried initiate (e.g. after a dropped response) returns
+        the existing session and its received parts instead of starting over.
+        """
+        max_size = claims.get('max_size')
+        if size_bytes <= 0:
+            raise ResumableUploadError("size_bytes must be positive")
+        if max_size and size_bytes > max_size:
+            raise ResumableUploadError(f"File exceeds maximum size of {max_size} bytes", 413)
+        
+        claimed_type = claims.get('content_type')
+        if claimed_type and content_type and content_type != claimed_type:
+            raise ResumableUploadError("Content type does not match upload token", 415)
+        
+        self._sweep_expired()
+        
+        upload_id = hashlib.sha256(f"{claims['path']}:{claims['exp']}".encode()).hexdigest()[:32]
+        total_parts = -(-size_bytes // self.part_size)
+        manifest = {
+            'upload_id': upload_id,
+            's3_key': claims['path'],
+            'expires_at': claims['exp'],
+            'max_size': max_size,
+            'filename': filename,
+            'content_type': claimed_type or content_type or 'application/octet-stream',
+            'size_bytes': size_bytes,
+            'part_size': self.part_size,
+            'total_parts': total_parts,
+            'category': category,
+            'entity_type': entity_type,
+            'entity_id': entity_id,
+            'metadata': metadata
+        }
+        
+        # Build the session under a temporary name and rename it into place so
+        # concurrent initiates with the same token never see a half-written one
+        self.staging_dir.mkdir(parents=True, exist_ok=True)
+        temp_dir = Path(tempfile.mkdtemp(prefix=f".{upload_id}.", dir=self.staging_dir))
+        (temp_dir / MANIFEST_NAME).write_text(json.dumps(manifest))
+        try:
+            os.rename(temp_dir, self._session_dir(upload_id))
+            return manifest
+        except OSError:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+        
+        existing = self._load_manifest(upload_id)
+        if any(existing[field] != manifest[field] for field in ('filename', 'size_bytes', 'content_type')):
+            raise ResumableUploadError("An upload with different parameters is already in progress for this token", 409)
+        return existing
+    
+    async def write_part(self, upload_id: str, part_number: int, chunks: AsyncIterator[bytes]) -> Dict:
+        """
+        Stream one part to the staging area
+        
+        The part is written to a temporary file and renamed into place only
+        once it has exactly the expected length, so retried or parallel PUTs
+        of the same part never leave a torn file behind.
+        """
+        manifest = self._load_manifest(upload_id)
+        if not 1 <= part_number <= manifest['total_parts']:
+            raise ResumableUploadError(f"Part number must be between 1 and {manifest['total_parts']}")
+        
+        expected = self._expected_part_size(manifest, part_number)
+        part_path = self._part_path(upload_id, part_number)
+        temp_path = part_path.with_name(f".{part_path.name}.{uuid.uuid4().hex}")
+        written = 0
+        
+        handle = await asyncio.to_thread(open, temp_path, 'wb')
+        try:
+            async for chunk in chunks:
+                written += len(chunk)
+                if written > expected:
+                    raise ResumableUploadError(f"Part {part_number} exceeds expected size of {expected} bytes", 413)
+                await asyncio.to_thread(handle.write, chunk)
+            await asyncio.to_thread(handle.close)
+            
+            if written != expected:
+                raise ResumableUploadError(f"Part {part_number} is {written} bytes, expected {expected}")
+            os.replace(temp_path, part_path)
+        finally:
+            handle.close()
+            if temp_path.exists():
+                temp_path.unlink()
+        
+        return {'part_number': part_number, 'size_bytes': written}
+    
+    def status(self, upload_id: str) -> Dict:
+        """Report which parts (and byte offsets) have been received"""
+        manifest = self._load_manifest(upload_id)
+        received = [
+            part_number for part_number in range(1, manifest['total_parts'] + 1)
+            if self._part_path(upload_id, part_number).exists()
+        ]
+        received_set = set(received)
+        return {
+            'upload_id': upload_id,
+            'size_bytes': manifest['size_bytes'],
+            'part_size': manifest['part_size'],
+            'total_parts': manifest['total_parts'],
+            'received_parts': received,
+            'received_offsets': [(part - 1) * manifest['part_size'] for part in received],
+            'received_bytes': sum(self._expected_part_size(manifest, part) for part in received),
+            'missing_parts': [
+                part for part in range(1, manifest['total_parts'] + 1) if part not in received_set
+            ],
+            'expires_at': manifest['expires_at']
+        }
+    
+    def begin_complete(self, upload_id: str) -> Tuple[Dict, StagedPartsReader]:
+        """
+        Lock the session for completion and return its manifest and assembled reader
+        
+        Raises 409 if parts are missing or another completion is in progress.
+        """
+        manifest = self._load_manifest(upload_id)
+        paths = [self._part_path(upload_id, part) for part in range(1, manifest['total_parts'] + 1)]
+        missing = [index + 1 for index, path in enumerate(paths) if not path.exists()]
+        if missing:
+            raise ResumableUploadError(f"Missing parts: {missing}", 409)
+        
+        try:
+            os.close(os.open(self._session_dir(upload_id) / COMPLETE_LOCK_NAME, os.O_CREAT | os.O_EXCL))
+        except FileExistsError:
+            raise ResumableUploadError("Upload is already being completed", 409)
+        
+        return manifest, StagedPartsReader(paths)
+    
+    def release_complete(self, upload_id: str):
+        """Allow a failed completion to be retried"""
+        try:
+            (self._session_dir(upload_id) / COMPLETE_LOCK_NAME).unlink()
+        except FileNotFoundError:
+            pass
+    
+    def abort(self, upload_id: str):
+        """Discard a session and its staged parts"""
+        shutil.rmtree(self._session_dir(upload_id), ignore_errors=True)
+    
+    def _sweep_expired(self):
+        """Remove sessions whose upload token has expired"""
+        if not self.staging_dir.exists():
+            return
+        now = time.time()
+        for session_dir in self.staging_dir.iterdir():
+            try:
+                manifest = json.loads((session_dir / MANIFEST_NAME).read_text())
+                if manifest['expires_at'] < now:
+                    shutil.rmtree(session_dir, ignore_errors=True)
+            except (FileNotFoundError, NotADirectoryError, ValueError, KeyError):
+                continue
+
+# Singleton instance
+resumable_upload_service = ResumableUploadService()
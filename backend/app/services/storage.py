@@ -3,18 +3,75 @@ WebDAV storage service for Hetzner Storage Box
 """
 
 import os
-import io
+import time
 import uuid
+import random
+import asyncio
+import threading
 import mimetypes
-from typing import Optional, Dict, BinaryIO, Tuple
+from typing import Optional, Dict, List, BinaryIO, AsyncIterator, Tuple
 from datetime import datetime, timedelta
-import requests
-from requests.auth import HTTPBasicAuth
+import httpx
 import hashlib
 import jwt
 
-class StorageService:
-    """Service for managing file uploads to Hetzner Storage Box via WebDAV"""
+from app.core.cache import TTLCache
+from app.services.file_cache import file_cache
+
+# Verbs that are safe to replay against WebDAV. MKCOL is not strictly idempotent,
+# but a replayed MKCOL only yields 405 (already exists), which callers accept.
+IDEMPOTENT_METHODS = frozenset(['GET', 'HEAD', 'PUT', 'DELETE', 'OPTIONS', 'PROPFIND', 'COPY', 'MKCOL'])
+
+# Upstream statuses worth retrying for idempotent verbs
+RETRY_STATUSES = frozenset([502, 503, 504])
+
+# Prefix for content-addressed objects when deduplication is enabled
+BLOB_PREFIX = 'blobs'
+
+# MKCOL statuses meaning the collection now exists (201 = created, 405 = already exists)
+COLLECTION_EXISTS_STATUSES = frozenset([201, 405])
+
+# Default read timeouts (seconds) per operation, overridable via STORAGE_<OP>_TIMEOUT
+DEFAULT_TIMEOUTS = {
+    'mkcol': 5,
+    'upload': 30,
+    'download': 30,
+    'head': 10,
+    'delete': 10,
+    'copy': 10,
+}
+
+class UploadTooLargeError(Exception):
+    """Raised when an upload exceeds the allowed maximum size"""
+
+class HashingFileStream:
+    """
+    Async chunk iterator over a file object for streaming request bodies
+    
+    MD5 and size are updated as chunks are sent, and UploadTooLargeError is
+    raised as soon as more than max_size bytes have been read.
+    """
+    
+    def __init__(self, file: BinaryIO, chunk_size: int, max_size: int):
+        self.file = file
+        self.chunk_size = chunk_size
+        self.max_size = max_size
+        self.md5 = hashlib.md5()
+        self.size = 0
+    
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        while True:
+            chunk = await asyncio.to_thread(self.file.read, self.chunk_size)
+            if not chunk:
+                break
+            self.size += len(chunk)
+            if self.size > self.max_size:
+                raise UploadTooLargeError(f"File exceeds maximum size of {self.max_size} bytes")
+            self.md5.update(chunk)
+            yield chunk
+
+class AsyncStorageService:
+    """Async service for managing file uploads to Hetzner Storage Box via WebDAV"""
     
     def __init__(self):
         # Use existing env variables, just reinterpret them for WebDAV
@@ -24,28 +81,121 @@ class StorageService:
         self.base_path = f"/{os.getenv('HETZNER_BUCKET', 'didc')}"
         
         # Auth for requests
-        self.auth = HTTPBasicAuth(self.username, self.password)
+        self.auth = httpx.BasicAuth(self.username, self.password or '')
+        
+        # Pool, timeout and retry configuration for the shared keep-alive client
+        self.connect_timeout = float(os.getenv('STORAGE_CONNECT_TIMEOUT', '5'))
+        self.timeouts = {
+            operation: float(os.getenv(f'STORAGE_{operation.upper()}_TIMEOUT', str(default)))
+            for operation, default in DEFAULT_TIMEOUTS.items()
+        }
+        self.limits = httpx.Limits(
+            max_keepalive_connections=int(os.getenv('STORAGE_POOL_CONNECTIONS', '10')),
+            max_connections=int(os.getenv('STORAGE_POOL_MAXSIZE', '20'))
+        )
+        self.max_retries = int(os.getenv('STORAGE_MAX_RETRIES', '3'))
+        self.retry_backoff = float(os.getenv('STORAGE_RETRY_BACKOFF', '0.3'))
+        
+        # Uploads are streamed in fixed-size chunks; memory per upload is bounded by the chunk size
+        self.upload_chunk_size = int(os.getenv('STORAGE_UPLOAD_CHUNK_SIZE', str(1024 * 1024)))
+        self.max_upload_size = int(os.getenv('STORAGE_MAX_UPLOAD_BYTES', str(500 * 1024 * 1024)))
+        
+        # Content-addressed mode: objects are stored once under their SHA-256 and shared by records
+        self.deduplicate = os.getenv('STORAGE_DEDUPLICATION', 'false').lower() == 'true'
+        self._client: Optional[httpx.AsyncClient] = None
+        
+        # Collections known to exist, so repeated uploads into a folder skip MKCOL
+        self.directory_cache = TTLCache(
+            maxsize=int(os.getenv('STORAGE_DIR_CACHE_SIZE', '4096')),
+            ttl=float(os.getenv('STORAGE_DIR_CACHE_TTL', '3600'))
+        )
         
         # Secret for signed URLs
         self.url_secret = os.getenv('URL_SIGNING_SECRET', 'di-companion-secret-key')
         
+        # Decoded signed-URL tokens, each kept until its own expiry
+        self.signed_url_cache = TTLCache(
+            maxsize=int(os.getenv('SIGNED_URL_CACHE_SIZE', '10000')),
+            ttl=3600
+        )
+        
         # Compatibility attributes for existing code
         self.bucket_name = os.getenv('HETZNER_BUCKET', 'didc')
         self.endpoint_url = self.base_url
+    
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Pooled keep-alive client, created lazily inside the running event loop"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                auth=self.auth,
+                limits=self.limits,
+                timeout=httpx.Timeout(self.timeouts['download'], connect=self.connect_timeout)
+            )
+        return self._client
+    
+    async def aclose(self):
+        """Close the pooled client and release its connections"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+    
+    def _timeout(self, operation: str) -> httpx.Timeout:
+        """Return the timeout for an operation"""
+        return httpx.Timeout(self.timeouts[operation], connect=self.connect_timeout)
+    
+    def _url(self, s3_key: str) -> str:
+        """Return the full WebDAV URL for a storage key"""
+        return f"{self.base_url}{self.base_path}/{s3_key}"
+    
+    async def _request(
+        self,
+        method: str,
+        url: str,
+        operation: str,
+        stream: bool = False,
+        retry: bool = True,
+        **kwargs
+    ) -> httpx.Response:
+        """
+        Send a request over the pooled client
         
-        # Initialize base directory
-        self._ensure_base_directory()
+        Idempotent verbs are retried with exponential backoff on transport
+        errors and 502/503/504 responses. Pass retry=False for requests with
+        a non-replayable body (streams).
+        """
+        retries = self.max_retries if retry and method in IDEMPOTENT_METHODS else 0
+        attempt = 0
+        while True:
+            request = self.client.build_request(method, url, timeout=self._timeout(operation), **kwargs)
+            try:
+                response = await self.client.send(request, stream=stream)
+            except httpx.TransportError:
+                if attempt >= retries:
+                    raise
+            else:
+                if response.status_code not in RETRY_STATUSES or attempt >= retries:
+                    return response
+                await response.aclose()
+            
+            await asyncio.sleep(self.retry_backoff * (2 ** attempt) * random.uniform(0.5, 1.0))
+            attempt += 1
     
-    def _ensure_base_directory(self):
-        """Create base directory if it doesn't exist"""
+    async def ensure_base_directory(self):
+        """Create base directory if it doesn't exist; run at startup to seed the directory cache"""
+        await self._make_collection(self.base_path)
+    
+    async def _make_collection(self, path: str):
+        """Issue MKCOL for a collection path and remember it if it now exists"""
         try:
-            response = requests.request(
+            response = await self._request(
                 'MKCOL',
-                f"{self.base_url}{self.base_path}",
-                auth=self.auth,
-                timeout=5
+                f"{self.base_url}{path}",
+                'mkcol'
             )
             # 201 = created, 405 = already exists, both are OK
+            if response.status_code in COLLECTION_EXISTS_STATUSES:
+                self.directory_cache.set(path, True)
         except:
             pass  # Directory might already exist
     
@@ -85,7 +235,7 @@ class StorageService:
         
         return "/".join(path_parts)
     
-    def upload_file(
+    async def upload_file(
         self,
         file: BinaryIO,
         filename: str,
@@ -93,16 +243,30 @@ class StorageService:
         entity_type: Optional[str] = None,
         entity_id: Optional[str] = None,
         content_type: Optional[str] = None,
-        metadata: Optional[Dict] = None
+        metadata: Optional[Dict] = None,
+        max_size: Optional[int] = None,
+        s3_key: Optional[str] = None
     ) -> Dict:
         """
         Upload a file via WebDAV
         
+        The file is streamed to storage in chunks of upload_chunk_size; MD5 and
+        size are computed on the fly. Uploads larger than max_size (defaults to
+        STORAGE_MAX_UPLOAD_BYTES) raise UploadTooLargeError, before any bytes
+        are sent when the file size is known up front.
+        
+        With STORAGE_DEDUPLICATION enabled, seekable files are hashed locally
+        first and stored under blobs/<sha256>; if that blob already exists the
+        PUT is skipped entirely and the existing object is referenced.
+        
+        Pass s3_key to upload to a pre-generated key (e.g. from a presigned
+        upload token) instead of generating one.
+        
         Returns:
             Dict with upload details (s3_key, s3_url, etag, size, etc.)
         """
         # Generate storage key (compatible with S3 naming)
-        s3_key = self.generate_s3_key(filename, category, entity_type, entity_id)
+        s3_key = s3_key or self.generate_s3_key(filename, category, entity_type, entity_id)
         
         # Full WebDAV path
         full_path = f"{self.base_path}/{s3_key}"
@@ -113,70 +277,156 @@ class StorageService:
             content_type, _ = mimetypes.guess_type(filename)
             content_type = content_type or 'application/octet-stream'
         
-        # Read file content
-        file_content = file.read()
-        file_size = len(file_content)
+        max_size = max_size or self.max_upload_size
         
-        # Calculate MD5 hash
-        md5_hash = hashlib.md5(file_content).hexdigest()
+        # Reject oversized files early when the size is known (spooled uploads are seekable)
+        declared_size = self._remaining_size(file)
+        if declared_size is not None and declared_size > max_size:
+            raise UploadTooLargeError(f"File exceeds maximum size of {max_size} bytes")
+        
+        # Content-addressed mode: hash the local spool first so duplicates skip the transfer
+        sha256_hash = None
+        if self.deduplicate and declared_size is not None:
+            sha256_hash, md5_hash = await asyncio.to_thread(self._hash_file, file)
+            s3_key = self.blob_key(sha256_hash)
+            full_path = f"{self.base_path}/{s3_key}"
+            full_url = f"{self.base_url}{full_path}"
+            
+            if await self.get_file_info(s3_key) is not None:
+                return self._upload_result(s3_key, md5_hash, declared_size, content_type, sha256_hash, True)
         
         # Create parent directories
-        self._create_parent_directories(full_path)
+        await self._create_parent_directories(full_path)
         
         # Prepare headers
-        headers = {
-            'Content-Type': content_type,
-            'Content-Length': str(file_size),
-        }
+        headers = {'Content-Type': content_type}
+        if declared_size is not None:
+            headers['Content-Length'] = str(declared_size)
         
         # Add metadata as custom headers
         if metadata:
             for key, value in metadata.items():
                 headers[f'X-Meta-{key}'] = str(value)
         
-        # Upload via PUT
-        response = requests.put(
+        # Stream upload via PUT
+        start_position = file.tell() if declared_size is not None else None
+        stream = HashingFileStream(file, self.upload_chunk_size, max_size)
+        response = await self._request(
+            'PUT',
             full_url,
-            data=file_content,
-            auth=self.auth,
-            headers=headers,
-            timeout=30
+            'upload',
+            retry=False,
+            content=stream,
+            headers=headers
         )
         
+        if response.status_code in (404, 409):
+            # A cached parent collection is gone: forget it, recreate and retry once if we can rewind
+            self._invalidate_directories(full_path)
+            if start_position is not None:
+                await self._create_parent_directories(full_path)
+                file.seek(start_position)
+                stream = HashingFileStream(file, self.upload_chunk_size, max_size)
+                response = await self._request(
+                    'PUT',
+                    full_url,
+                    'upload',
+                    retry=False,
+                    content=stream,
+                    headers=headers
+                )
+        
+        md5_hash = stream.md5.hexdigest()
+        file_size = stream.size
+        
         if response.status_code not in [200, 201, 204]:
             raise Exception(f"Upload failed: {response.status_code} - {response.text}")
         
-        # Return S3-compatible response
+        return self._upload_result(s3_key, md5_hash, file_size, content_type, sha256_hash, False)
+    
+    def _upload_result(
+        self,
+        s3_key: str,
+        md5_hash: str,
+        file_size: int,
+        content_type: str,
+        sha256_hash: Optional[str],
+        deduplicated: bool
+    ) -> Dict:
+        """Build the S3-compatible upload response"""
         return {
             'bucket': self.bucket_name,
             's3_key': s3_key,
-            's3_url': full_url,
+            's3_url': self._url(s3_key),
             'etag': md5_hash,  # Use MD5 as ETag
             'size_bytes': file_size,
             'content_type': content_type,
             'md5_hash': md5_hash,
+            'sha256': sha256_hash,
+            'deduplicated': deduplicated,
             'uploaded_at': datetime.now().isoformat()
         }
     
-    def _create_parent_directories(self, full_path: str):
-        """Create parent directories recursively"""
-        parts = full_path.split('/')[:-1]  # Exclude filename
-        current_path = ""
+    def blob_key(self, sha256_hash: str) -> str:
+        """Return the content-addressed storage key for a SHA-256 digest"""
+        return f"{BLOB_PREFIX}/{sha256_hash[:2]}/{sha256_hash[2:4]}/{sha256_hash}"
+    
+    def is_blob_key(self, s3_key: Optional[str]) -> bool:
+        """Check whether a storage key refers to a shared content-addressed blob"""
+        return bool(s3_key) and s3_key.startswith(f"{BLOB_PREFIX}/")
+    
+    def _hash_file(self, file: BinaryIO) -> Tuple[str, str]:
+        """Compute SHA-256 and MD5 of a seekable file in chunks, then rewind it"""
+        start_position = file.tell()
+        sha256 = hashlib.sha256()
+        md5 = hashlib.md5()
+        while True:
+            chunk = file.read(self.upload_chunk_size)
+            if not chunk:
+                break
+            sha256.update(chunk)
+            md5.update(chunk)
+        file.seek(start_position)
+        return sha256.hexdigest(), md5.hexdigest()
+    
+    def _remaining_size(self, file: BinaryIO) -> Optional[int]:
+        """Return the number of bytes left in a seekable file, or None if unknown"""
+        try:
+            position = file.tell()
+            file.seek(0, os.SEEK_END)
+            size = file.tell() - position
+            file.seek(position)
+            return size
+        except (AttributeError, OSError, ValueError):
+            return None
+    
+    def _parent_directories(self, full_path: str) -> List[str]:
+        """Return the collection paths above full_path, outermost first"""
+        parts = [part for part in full_path.split('/')[:-1] if part]  # Exclude filename
+        return ['/' + '/'.join(parts[:depth]) for depth in range(1, len(parts) + 1)]
+    
+    async def _create_parent_directories(self, full_path: str):
+        """
+        Create parent directories recursively
         
-        for part in parts:
-            if not part:
-                continue
-            current_path = f"{current_path}/{part}" if current_path else f"/{part}"
-            
-            try:
-                requests.request(
-                    'MKCOL',
-                    f"{self.base_url}{current_path}",
-                    auth=self.auth,
-                    timeout=5
-                )
-            except:
-                pass  # Directory might already exist
+        Walks up from the deepest parent until a collection known to exist is
+        found in the directory cache, then issues MKCOL only for the levels
+        below it.
+        """
+        directories = self._parent_directories(full_path)
+        missing = []
+        for directory in reversed(directories):
+            if self.directory_cache.get(directory):
+                break
+            missing.append(directory)
+        
+        for directory in reversed(missing):
+            await self._make_collection(directory)
+    
+    def _invalidate_directories(self, full_path: str):
+        """Forget cached parent collections of a path after storage reported them missing"""
+        for directory in self._parent_directories(full_path):
+            self.directory_cache.pop(directory)
     
     def generate_presigned_url(
         self,
@@ -195,21 +445,43 @@ class StorageService:
         Returns:
             Signed URL string for API proxy endpoint
         """
-        expiry = datetime.utcnow() + timedelta(seconds=expires_in)
+        return self.generate_presigned_urls([(s3_key, response_content_type)], expires_in)[0]
+    
+    def generate_presigned_urls(
+        self,
+        objects: List[Tuple[str, Optional[str]]],
+        expires_in: int = 3600
+    ) -> List[str]:
+        """
+        Generate signed URLs for many objects at once
         
-        payload = {
-            'path': s3_key,
-            'exp': expiry.timestamp(),
-        }
+        The expiry and API base are computed once per call and repeated
+        (s3_key, content_type) pairs share one token.
         
-        if response_content_type:
-            payload['content_type'] = response_content_type
+        Args:
+            objects: (s3_key, response_content_type) pairs
+            expires_in: URL expiration time in seconds (default: 1 hour)
         
-        token = jwt.encode(payload, self.url_secret, algorithm='HS256')
+        Returns:
+            Signed URLs in the same order as objects
+        """
+        expiry = (datetime.utcnow() + timedelta(seconds=expires_in)).timestamp()
         
-        # Return URL to API endpoint that will validate and proxy
+        # Return URLs to the API endpoint that will validate and proxy
         api_base = os.getenv('API_BASE_URL', 'http://localhost:8000')
-        return f"{api_base}/api/files/access/{token}"
+        
+        urls = {}
+        for s3_key, content_type in objects:
+            if (s3_key, content_type) in urls:
+                continue
+            payload = {'path': s3_key, 'exp': expiry}
+            if content_type:
+                payload['content_type'] = content_type
+            
+            token = jwt.encode(payload, self.url_secret, algorithm='HS256')
+            urls[(s3_key, content_type)] = f"{api_base}/api/files/access/{token}"
+        
+        return [urls[(s3_key, content_type)] for s3_key, content_type in objects]
     
     def generate_presigned_post(
         self,
@@ -242,33 +514,62 @@ class StorageService:
         
         return {
             'url': f"{api_base}/api/files/upload",
+            'resumable_url': f"{api_base}/api/files/uploads",
             'fields': {
                 'token': upload_token,
                 'key': s3_key
             }
         }
     
-    def delete_file(self, s3_key: str) -> bool:
+    async def open_stream(self, s3_key: str, headers: Optional[Dict] = None) -> httpx.Response:
+        """
+        Open a streaming download for a file over the pooled client
+        
+        The caller is responsible for consuming the body or calling aclose()
+        so the connection is returned to the pool.
+        
+        Returns:
+            Streaming httpx.Response
+        """
+        # Ask for the raw bytes so Content-Length/Content-Range stay valid when proxied
+        return await self._request(
+            'GET',
+            self._url(s3_key),
+            'download',
+            stream=True,
+            headers={'Accept-Encoding': 'identity', **(headers or {})}
+        )
+    
+    async def download_file(self, s3_key: str) -> Optional[bytes]:
+        """
+        Download a whole file into memory
+        
+        Returns:
+            File content or None if not found
+        """
+        try:
+            response = await self._request('GET', self._url(s3_key), 'download')
+            if response.status_code != 200:
+                return None
+            return response.content
+        except:
+            return None
+    
+    async def delete_file(self, s3_key: str) -> bool:
         """
         Delete a file from storage
         
         Returns:
             True if successful, False otherwise
         """
+        file_cache.invalidate(s3_key)
         try:
-            full_path = f"{self.base_path}/{s3_key}"
-            full_url = f"{self.base_url}{full_path}"
-            
-            response = requests.delete(
-                full_url,
-                auth=self.auth,
-                timeout=10
-            )
+            response = await self._request('DELETE', self._url(s3_key), 'delete')
             return response.status_code in [200, 204, 404]  # 404 = already gone
         except:
             return False
     
-    def get_file_info(self, s3_key: str) -> Optional[Dict]:
+    async def get_file_info(self, s3_key: str) -> Optional[Dict]:
         """
         Get metadata for a file
         
@@ -276,14 +577,7 @@ class StorageService:
             Dict with file metadata or None if not found
         """
         try:
-            full_path = f"{self.base_path}/{s3_key}"
-            full_url = f"{self.base_url}{full_path}"
-            
-            response = requests.head(
-                full_url,
-                auth=self.auth,
-                timeout=10
-            )
+            response = await self._request('HEAD', self._url(s3_key), 'head')
             
             if response.status_code != 200:
                 return None
@@ -298,7 +592,7 @@ class StorageService:
         except:
             return None
     
-    def copy_file(
+    async def copy_file(
         self,
         source_key: str,
         destination_key: str,
@@ -310,22 +604,57 @@ class StorageService:
         Returns:
             True if successful, False otherwise
         """
+        file_cache.invalidate(destination_key)
         try:
             # WebDAV COPY method
-            source_path = f"{self.base_path}/{source_key}"
-            dest_path = f"{self.base_path}/{destination_key}"
-            
-            response = requests.request(
+            await self._create_parent_directories(f"{self.base_path}/{destination_key}")
+            response = await self._request(
                 'COPY',
-                f"{self.base_url}{source_path}",
-                headers={'Destination': f"{self.base_url}{dest_path}"},
-                auth=self.auth,
-                timeout=10
+                self._url(source_key),
+                'copy',
+                headers={'Destination': self._url(destination_key)}
+            )
+            if response.status_code == 409:
+                self._invalidate_directories(f"{self.base_path}/{destination_key}")
+            return response.status_code in [201, 204]
+        except:
+            return False
+    
+    async def move_file(self, source_key: str, destination_key: str, overwrite: bool = True) -> bool:
+        """
+        Move (rename) a file within storage
+        
+        The move is atomic on the server: the source is gone from the moment
+        the destination exists.
+        
+        Returns:
+            True if successful, False otherwise (including a missing source)
+        """
+        file_cache.invalidate(source_key)
+        file_cache.invalidate(destination_key)
+        try:
+            # WebDAV MOVE method; not retried, a replay after success would find no source
+            await self._create_parent_directories(f"{self.base_path}/{destination_key}")
+            response = await self._request(
+                'MOVE',
+                self._url(source_key),
+                'copy',
+                headers={'Destination': self._url(destination_key), 'Overwrite': 'T' if overwrite else 'F'}
             )
+            if response.status_code == 409:
+                self._invalidate_directories(f"{self.base_path}/{destination_key}")
             return response.status_code in [201, 204]
         except:
             return False
     
+    def stats(self) -> Dict:
+        """Return storage cache metrics"""
+        return {
+            'directory_cache': self.directory_cache.stats(),
+            'signed_url_cache': self.signed_url_cache.stats(),
+            'file_cache': file_cache.stats()
+        }
+    
     def list_files(
         self,
         prefix: str = '',
@@ -343,17 +672,99 @@ class StorageService:
         # In production, implement PROPFIND XML parsing
         return {'files': []}
     
-    def validate_signed_url(self, token: str) -> Optional[str]:
+    def validate_upload_token(self, token: str) -> Optional[Dict]:
         """
-        Validate a signed URL token and return the storage path
+        Validate a presigned upload token and return its claims
+        (path, exp, max_size, content_type)
+        """
+        try:
+            payload = jwt.decode(token, self.url_secret, algorithms=['HS256'])
+        except jwt.PyJWTError:
+            return None
+        return payload if payload.get('path') else None
+    
+    def decode_signed_url(self, token: str) -> Optional[Dict]:
+        """
+        Validate a signed URL token and return its claims (path, exp, content_type)
+        
+        Verified tokens are cached until they expire, so repeated fetches of
+        the same signed URL skip the HMAC check.
         """
+        payload = self.signed_url_cache.get(token)
+        if payload is not None:
+            if payload['exp'] > time.time():
+                return payload
+            self.signed_url_cache.pop(token)
+            return None
+        
         try:
             payload = jwt.decode(token, self.url_secret, algorithms=['HS256'])
-            return payload.get('path')
         except jwt.ExpiredSignatureError:
             return None
         except:
             return None
+        
+        if not payload.get('path') or 'exp' not in payload:
+            return None
+        
+        self.signed_url_cache.set(token, payload, ttl=payload['exp'] - time.time())
+        return payload
+    
+    def validate_signed_url(self, token: str) -> Optional[str]:
+        """
+        Validate a signed URL token and return the storage path
+        """
+        payload = self.decode_signed_url(token)
+        return payload.get('path') if payload else None
+
+
+class StorageService:
+    """
+    Synchronous wrapper around AsyncStorageService for scripts
+    
+    Coroutines run on a private event loop thread so the wrapped service keeps
+    a single pooled client across calls. Pure helpers (key generation, signed
+    URLs) and configuration attributes are delegated directly.
+    """
+    
+    def __init__(self):
+        self._service = AsyncStorageService()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+    
+    def __getattr__(self, name):
+        return getattr(self._service, name)
+    
+    def _run(self, coro):
+        """Run a coroutine on the wrapper's event loop and wait for the result"""
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(
+                    target=self._loop.run_forever,
+                    name='storage-service-loop',
+                    daemon=True
+                ).start()
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+    
+    def upload_file(self, file: BinaryIO, filename: str, **kwargs) -> Dict:
+        return self._run(self._service.upload_file(file, filename, **kwargs))
+    
+    def download_file(self, s3_key: str) -> Optional[bytes]:
+        return self._run(self._service.download_file(s3_key))
+    
+    def delete_file(self, s3_key: str) -> bool:
+        return self._run(self._service.delete_file(s3_key))
+    
+    def get_file_info(self, s3_key: str) -> Optional[Dict]:
+        return self._run(self._service.get_file_info(s3_key))
+    
+    def copy_file(self, source_key: str, destination_key: str, destination_bucket: Optional[str] = None) -> bool:
+        return self._run(self._service.copy_file(source_key, destination_key, destination_bucket))
+    
+    def move_file(self, source_key: str, destination_key: str, overwrite: bool = True) -> bool:
+        return self._run(self._service.move_file(source_key, destination_key, overwrite))
 
-# Singleton instance
+# Singleton instances: the async service is used by the API, the sync wrapper by scripts
+async_storage_service = AsyncStorageService()
 storage_service = StorageService()
\ No newline at end of file
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Benchmark user-scoped Supabase access: a fresh client per request vs the pooled async database
+
+Runs against an in-process stub of Supabase Auth and PostgREST, so it needs
+no project or network. For each approach it measures, per request, the time
+to get a user-scoped client and run one table query, and the peak memory
+allocated (tracemalloc) while doing so.
+
+Usage: python benchmarks/supabase_client_bench.py [--iterations 200]
+"""
+
+import os
+import sys
+import json
+import time
+import base64
+import asyncio
+import argparse
+import threading
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+def fake_jwt(claims: dict) -> str:
+    """Unsigned token in JWT shape; the stub never checks signatures"""
+    def encode(part: dict) -> str:
+        return base64.urlsafe_b64encode(json.dumps(part).encode()).decode().rstrip("=")
+    return f"{encode({'alg': 'HS256', 'typ': 'JWT'})}.{encode(claims)}.signature"
+
+USER = {
+    "id": "00000000-0000-0000-0000-000000000001",
+    "aud": "authenticated",
+    "role": "authenticated",
+    "email": "founder@example.com",
+    "app_metadata": {},
+    "user_metadata": {},
+    "created_at": "2024-01-01T00:00:00Z"
+}
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Answers GoTrue /user and any PostgREST GET with canned JSON"""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        # postgrest-py sends a JSON body even on GET; drain it to keep the connection reusable
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        body = json.dumps(USER if self.path.startswith("/auth/v1/user") else []).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+def start_stub() -> str:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_address[1]}"
+
+async def measure(name: str, query, iterations: int):
+    # Warm up connections and lazy imports before measuring
+    for _ in range(5):
+        await query()
+
+    latencies = []
+    peaks = []
+    tracemalloc.start()
+    for _ in range(iterations):
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        started = time.perf_counter()
+        await query()
+        latencies.append(time.perf_counter() - started)
+        peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+    tracemalloc.stop()
+    latencies.sort()
+
+    print(
+        f"{name:<28} "
+        f"mean {sum(latencies) / len(latencies) * 1000:7.2f} ms  "
+        f"p50 {latencies[len(latencies) // 2] * 1000:7.2f} ms  "
+        f"p95 {latencies[int(len(latencies) * 0.95)] * 1000:7.2f} ms  "
+        f"peak alloc {sum(peaks) / len(peaks) / 1024:8.1f} KiB/req"
+    )
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    base_url = start_stub()
+    service_key = fake_jwt({"role": "service_role", "exp": int(time.time()) + 3600})
+    os.environ["SUPABASE_URL"] = base_url
+    os.environ["SUPABASE_SERVICE_KEY"] = service_key
+    os.environ["SUPABASE_ANON_KEY"] = fake_jwt({"role": "anon", "exp": int(time.time()) + 3600})
+
+    from supabase import create_client
+    from app.core.database import database
+
+    access_token = fake_jwt({"sub": USER["id"], "role": "authenticated", "exp": int(time.time()) + 3600})
+
+    async def per_request_client():
+        # Previous get_supabase_client behaviour; it passed None as the refresh
+        # token, which this gotrue version rejects, so an empty one is used here
+        client = create_client(base_url, os.environ["SUPABASE_ANON_KEY"])
+        client.auth.set_session(access_token, "")
+        client.table("invitations").select("id").limit(1).execute()
+
+    async def pooled_database():
+        await database.table("invitations", access_token).select("id").limit(1).execute()
+
+    print(f"{args.iterations} requests, one table query each")
+    await measure("create_client + set_session", per_request_client, args.iterations)
+    await measure("pooled async database", pooled_database, args.iterations)
+    await database.aclose()
+
+if __name__ == "__main__":
+    asyncio.run(main())
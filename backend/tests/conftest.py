@@ -0,0 +1,51 @@
+import os
+
+# Configuration read at import time by app.core; set before the app is imported
+os.environ.setdefault('SUPABASE_URL', 'http://supabase.test')
+os.environ.setdefault('SUPABASE_SERVICE_KEY', 'service.key.signature')
+os.environ.setdefault('SUPABASE_ANON_KEY', 'anon.key.signature')
+os.environ.setdefault('SUPABASE_JWT_SECRET', 'test-jwt-secret-with-at-least-32-bytes')
+os.environ.setdefault('HETZNER_S3_ENDPOINT', 'http://storage.test')
+os.environ.setdefault('HETZNER_SECRET_KEY', 'storage-secret')
+os.environ.setdefault('GEMINI_API_KEY', 'gemini-key')
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core import auth
+from app.core.database import AsyncDatabase, database
+from app.main import app
+from app.services import conversation_cache, conversation_history
+from app.services.storage import AsyncStorageService
+from tests.fake_postgrest import FakePostgrest
+from tests.fake_webdav import FakeWebdav
+
+USER = auth.AuthenticatedUser(id='user-1', email='founder@example.com', role='authenticated', access_token='user-token')
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    """Route every repository query to an in-memory PostgREST"""
+    fake = FakePostgrest()
+    client = httpx.AsyncClient(base_url=database.base_url, transport=fake.transport())
+    monkeypatch.setattr(AsyncDatabase, 'client', property(lambda self: client))
+    yield fake
+    conversation_cache.conversation_cache.clear()
+    conversation_history.tail_cache.clear()
+
+@pytest.fixture
+def fake_storage(monkeypatch):
+    """Route every storage request to an in-memory WebDAV server"""
+    fake = FakeWebdav()
+    client = httpx.AsyncClient(transport=fake.transport())
+    monkeypatch.setattr(AsyncStorageService, 'client', property(lambda self: client))
+    return fake
+
+@pytest.fixture
+def api(fake_db, fake_storage):
+    """Test client for the app, authenticated as USER"""
+    for dependency in (auth.get_optional_user, auth.get_current_user, auth.get_current_user_checked):
+        app.dependency_overrides[dependency] = lambda: USER
+    with TestClient(app) as client:
+        yield client
+    app.dependency_overrides.clear()
@@ -0,0 +1,198 @@
+"""
+In-memory PostgREST for tests
+
+Serves the subset of the PostgREST API the repositories use (filters,
+and/or logic trees, multi-column order, limit/offset/Range, exact counts,
+insert/upsert/update/delete, and calls to functions registered in
+functions) through an httpx.MockTransport, so tests run against the real
+request builders without a database.
+"""
+
+import json
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List
+from urllib.parse import parse_qsl
+
+import httpx
+
+RESERVED_PARAMS = ('select', 'order', 'limit', 'offset', 'on_conflict', 'columns')
+
+def _split(expression: str) -> List[str]:
+    """Split a logic tree's arguments on top-level commas, respecting quotes and parentheses"""
+    parts, depth, current, quoted, index = [], 0, '', False, 0
+    while index < len(expression):
+        char = expression[index]
+        if quoted and char == '\\':
+            current += expression[index:index + 2]
+            index += 2
+            continue
+        if char == '"':
+            quoted = not quoted
+        elif not quoted and char == '(':
+            depth += 1
+        elif not quoted and char == ')':
+            depth -= 1
+        if not quoted and depth == 0 and char == ',':
+            parts.append(current)
+            current = ''
+        else:
+            current += char
+        index += 1
+    parts.append(current)
+    return parts
+
+def _unquote(value: str) -> str:
+    if value.startswith('"') and value.endswith('"'):
+        return value[1:-1].replace('\\"', '"').replace('\\\\', '\\')
+    return value
+
+def _compare(value, op: str, argument: str) -> bool:
+    if op == 'is':
+        return value is None if argument == 'null' else str(value).lower() == argument
+    if op == 'in':
+        return value is not None and str(value) in [_unquote(item) for item in _split(argument[1:-1])]
+    if value is None:
+        return False
+    value, argument = str(value), _unquote(argument)
+    return {
+        'eq': value == argument,
+        'neq': value != argument,
+        'gt': value > argument,
+        'gte': value >= argument,
+        'lt': value < argument,
+        'lte': value <= argument,
+    }[op]
+
+def _condition(row: Dict, expression: str) -> bool:
+    """Evaluate a logic tree expression such as or(a.eq.1,and(b.gt.2,c.is.null))"""
+    for keyword in ('and', 'or'):
+        if expression.startswith(f'{keyword}('):
+            results = [_condition(row, part) for part in _split(expression[len(keyword) + 1:-1])]
+            return all(results) if keyword == 'and' else any(results)
+    column, op, argument = expression.split('.', 2)
+    return _compare(row.get(column), op, argument)
+
+class FakePostgrest:
+    """Tables of dict rows behind a PostgREST-shaped HTTP handler"""
+
+    def __init__(self):
+        self.tables: Dict[str, List[Dict]] = {}
+        self.requests: List[httpx.Request] = []
+        # Database functions by name: called with the RPC arguments, they return the result rows
+        self.functions: Dict[str, Callable[[Dict], List[Dict]]] = {}
+        # Columns to reject in selects, as for a migration that hasn't been applied
+        self.missing_columns: Dict[str, List[str]] = {}
+        self._clock = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+    def rows(self, table: str) -> List[Dict]:
+        return self.tables.setdefault(table, [])
+
+    def timestamp(self) -> str:
+        """Strictly increasing created_at values for inserted rows"""
+        self._clock += timedelta(seconds=1)
+        return self._clock.isoformat()
+
+    def insert(self, table: str, **row) -> Dict:
+        row.setdefault('id', str(uuid.uuid4()))
+        row.setdefault('created_at', self.timestamp())
+        self.rows(table).append(row)
+        return row
+
+    def transport(self) -> httpx.MockTransport:
+        return httpx.MockTransport(self.handle)
+
+    def _matches(self, row: Dict, params: List) -> bool:
+        for key, value in params:
+            if key in RESERVED_PARAMS:
+                continue
+            if key in ('and', 'or'):
+                if not _condition(row, f'{key}{value}'):
+                    return False
+                continue
+            op, _, argument = value.partition('.')
+            if not _compare(row.get(key), op, argument):
+                return False
+        return True
+
+    @staticmethod
+    def _project(row: Dict, select: str) -> Dict:
+        if not select or select == '*':
+            return dict(row)
+        columns = [column.strip() for column in _split(select)]
+        # Embedded resources (e.g. startups(name)) are returned as stored on the row
+        names = [column.split('(')[0].split(':')[0].strip() for column in columns]
+        return {name: row.get(name) for name in names}
+
+    @staticmethod
+    def _order(rows: List[Dict], order: str) -> List[Dict]:
+        for part in reversed(order.split(',')):
+            column, direction = (part.split('.') + ['asc'])[:2]
+            present = [row for row in rows if row.get(column) is not None]
+            missing = [row for row in rows if row.get(column) is None]
+            present.sort(key=lambda row: row[column], reverse=direction == 'desc')
+            rows = present + missing
+        return rows
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        table = request.url.path.rsplit('/', 1)[-1]
+        params = parse_qsl(request.url.query.decode(), keep_blank_values=True)
+        options = dict(params)
+        prefer = request.headers.get('prefer', '')
+        rows = self.rows(table)
+        rpc = request.url.path.rsplit('/', 2)[-2] == 'rpc'
+
+        for column in self.missing_columns.get(table, []):
+            if column in options.get('select', ''):
+                return httpx.Response(400, json={
+                    'code': '42703', 'message': f'column {table}.{column} does not exist', 'details': None, 'hint': None
+                })
+
+        if request.method in ('GET', 'HEAD') or rpc:
+            if rpc:
+                rows = self.functions[table](json.loads(request.content) if request.content else {})
+            matched = [row for row in rows if self._matches(row, params)]
+            if 'order' in options:
+                matched = self._order(matched, options['order'])
+            offset = int(options.get('offset', 0))
+            limit = int(options['limit']) if 'limit' in options else None
+            if request.headers.get('range'):
+                start, end = request.headers['range'].split('-')
+                offset, limit = int(start), int(end) - int(start) + 1
+            page = matched[offset:offset + limit if limit is not None else None]
+            headers = {}
+            if 'count=exact' in prefer:
+                span = f'{offset}-{offset + len(page) - 1}' if page else '*'
+                headers['content-range'] = f'{span}/{len(matched)}'
+            return httpx.Response(200, json=[self._project(row, options.get('select')) for row in page], headers=headers)
+
+        body = json.loads(request.content) if request.content else None
+        returned = []
+        if request.method == 'POST':
+            for item in body if isinstance(body, list) else [body]:
+                existing = next((row for row in rows if 'id' in item and row['id'] == item['id']), None)
+                if existing is not None:
+                    if 'resolution=merge-duplicates' in prefer:
+                        existing.update(item)
+                        returned.append(existing)
+                    elif 'resolution=ignore-duplicates' not in prefer:
+                        return httpx.Response(409, json={'message': 'duplicate key value violates unique constraint'})
+                    continue
+                returned.append(self.insert(table, **item))
+            status = 201
+        elif request.method == 'PATCH':
+            returned = [row for row in rows if self._matches(row, params)]
+            for row in returned:
+                row.update(body)
+            status = 200
+        elif request.method == 'DELETE':
+            returned = [row for row in rows if self._matches(row, params)]
+            self.tables[table] = [row for row in rows if row not in returned]
+            status = 200
+        else:
+            return httpx.Response(405)
+
+        if 'return=minimal' in prefer:
+            return httpx.Response(204 if request.method != 'POST' else 201)
+        return httpx.Response(status, json=[self._project(row, options.get('select')) for row in returned])
@@ -0,0 +1,59 @@
+"""
+In-memory WebDAV storage for tests
+
+Implements the verbs AsyncStorageService sends (MKCOL, PUT, HEAD, GET,
+DELETE, COPY, MOVE) over an httpx.MockTransport. Objects are keyed by URL
+path; collections are not tracked, so MKCOL always succeeds.
+"""
+
+from typing import Callable, Dict, List, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+class FakeWebdav:
+    """Objects by path behind a WebDAV-shaped HTTP handler"""
+
+    def __init__(self):
+        self.objects: Dict[str, bytes] = {}
+        self.requests: List[httpx.Request] = []
+        # Called with the request before a MOVE is applied, to interleave other work
+        self.before_move: Optional[Callable[[httpx.Request], None]] = None
+
+    def keys(self, prefix: str = '') -> List[str]:
+        return [path for path in self.objects if path.startswith(prefix)]
+
+    def transport(self) -> httpx.MockTransport:
+        return httpx.MockTransport(self.handle)
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        path = request.url.path
+
+        if request.method == 'MKCOL':
+            return httpx.Response(201)
+        if request.method == 'PUT':
+            self.objects[path] = request.content
+            return httpx.Response(201)
+        if request.method in ('HEAD', 'GET'):
+            if path not in self.objects:
+                return httpx.Response(404)
+            content = self.objects[path]
+            headers = {'Content-Length': str(len(content)), 'Content-Type': 'application/octet-stream'}
+            return httpx.Response(200, content=content if request.method == 'GET' else b'', headers=headers)
+        if request.method == 'DELETE':
+            return httpx.Response(204 if self.objects.pop(path, None) is not None else 404)
+        if request.method in ('COPY', 'MOVE'):
+            if request.method == 'MOVE' and self.before_move:
+                self.before_move(request)
+            destination = urlsplit(request.headers['Destination']).path
+            if path not in self.objects:
+                return httpx.Response(404)
+            exists = destination in self.objects
+            if exists and request.headers.get('Overwrite') == 'F':
+                return httpx.Response(412)
+            self.objects[destination] = self.objects[path]
+            if request.method == 'MOVE':
+                del self.objects[path]
+            return httpx.Response(204 if exists else 201)
+        return httpx.Response(405)
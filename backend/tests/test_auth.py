@@ -0,0 +1,94 @@
+import time
+
+import jwt
+import pytest
+from cryptography.hazmat.primitives.asymmetric import rsa
+from fastapi import HTTPException
+
+from app.core import auth
+
+SECRET = 'auth-test-secret-with-at-least-32-bytes'
+
+@pytest.fixture(autouse=True)
+def local_keys(monkeypatch):
+    """Known HS256 secret, no remote Supabase Auth and an empty claims cache"""
+    monkeypatch.setattr(auth, 'SUPABASE_JWT_SECRET', SECRET)
+    remote_calls = []
+
+    async def verify_remotely(token):
+        remote_calls.append(token)
+        return None
+    monkeypatch.setattr(auth, '_verify_remotely', verify_remotely)
+    auth.claims_cache.clear()
+    yield remote_calls
+    auth.claims_cache.clear()
+
+def make_token(key=SECRET, algorithm='HS256', headers=None, **claims):
+    claims = {'sub': 'user-1', 'aud': 'authenticated', 'role': 'authenticated', 'exp': int(time.time()) + 3600, **claims}
+    return jwt.encode(claims, key, algorithm=algorithm, headers=headers)
+
+async def test_valid_hs256_token():
+    user = await auth.verify_token(make_token(email='founder@example.com'))
+    assert (user.id, user.email, user.role) == ('user-1', 'founder@example.com', 'authenticated')
+
+@pytest.mark.parametrize('token', [
+    make_token(exp=int(time.time()) - 10),
+    make_token(aud='anon-service'),
+    make_token(key='some-other-secret-with-at-least-32-bytes'),
+])
+async def test_expired_wrong_audience_and_forged_tokens_are_rejected(token):
+    assert await auth.verify_token(token) is None
+
+async def test_unsigned_token_falls_through_to_supabase_auth(local_keys):
+    token = make_token(key=None, algorithm='none')
+    assert await auth.verify_token(token) is None
+    assert local_keys == [token]
+
+async def test_claims_cache_entry_expires_with_the_token():
+    token = make_token(exp=int(time.time()) + 5)
+    assert await auth.verify_token(token)
+
+    _, expires_at = auth.claims_cache._data[auth._token_key(token)]
+    assert expires_at - time.monotonic() <= 5
+
+async def test_unknown_kid_refreshes_the_key_set(monkeypatch):
+    keys = {kid: rsa.generate_private_key(public_exponent=65537, key_size=2048) for kid in ('old', 'new')}
+    published = ['old']
+    client = jwt.PyJWKClient('http://supabase.test/auth/v1/.well-known/jwks.json', cache_keys=True)
+    fetches = []
+
+    def fetch_data():
+        fetches.append(list(published))
+        jwks = {'keys': [
+            {**jwt.algorithms.RSAAlgorithm.to_jwk(keys[kid].public_key(), as_dict=True), 'kid': kid, 'use': 'sig'}
+            for kid in published
+        ]}
+        client.jwk_set_cache.put(jwks)
+        return jwks
+    monkeypatch.setattr(client, 'fetch_data', fetch_data)
+    monkeypatch.setattr(auth, '_jwks_client', client)
+
+    assert await auth.verify_token(make_token(keys['old'], 'RS256', {'kid': 'old'}))
+    assert await auth.verify_token(make_token(keys['old'], 'RS256', {'kid': 'old'}, email='again'))
+    assert fetches == [['old']]
+
+    # Key rotation: a token signed with a key not in the cached set triggers one refresh
+    published.append('new')
+    assert await auth.verify_token(make_token(keys['new'], 'RS256', {'kid': 'new'}))
+    assert fetches == [['old'], ['old', 'new']]
+
+async def test_checked_dependency_rejects_revoked_sessions(local_keys, monkeypatch):
+    token = make_token()
+    assert await auth.get_current_user(f'Bearer {token}')
+
+    # Supabase Auth no longer knows the session, e.g. after sign-out
+    with pytest.raises(HTTPException) as error:
+        await auth.get_current_user_checked(f'Bearer {token}')
+    assert error.value.status_code == 401
+    assert local_keys == [token]
+    assert auth.claims_cache.get(auth._token_key(token)) is None
+
+    async def verify_remotely(token):
+        return {'sub': 'user-1'}
+    monkeypatch.setattr(auth, '_verify_remotely', verify_remotely)
+    assert (await auth.get_current_user_checked(f'Bearer {token}')).id == 'user-1'
@@ -0,0 +1,49 @@
+import io
+import hashlib
+
+import pytest
+
+from app.services.blob_references import release_blob, retain_blob
+from app.services.storage import async_storage_service
+
+CONTENT = b'pitch deck'
+
+BLOB_KEY = async_storage_service.blob_key(hashlib.sha256(CONTENT).hexdigest())
+BLOB_PATH = f'{async_storage_service.base_path}/{BLOB_KEY}'
+
+@pytest.fixture
+def deduplicated(monkeypatch):
+    monkeypatch.setattr(async_storage_service, 'deduplicate', True)
+
+def upload(api):
+    response = api.post('/api/files/upload', files={'file': ('deck.pdf', CONTENT, 'application/pdf')})
+    assert response.status_code == 200
+    return response.json()
+
+def test_deleting_one_of_two_references_keeps_blob(api, fake_db, fake_storage, deduplicated):
+    first, second = upload(api), upload(api)
+    assert first['storage_path'] == second['storage_path'] == BLOB_KEY
+
+    assert api.delete(f"/api/files/{first['id']}").status_code == 200
+    assert fake_storage.objects == {BLOB_PATH: CONTENT}
+
+    assert api.delete(f"/api/files/{second['id']}").status_code == 200
+    assert fake_storage.objects == {}
+
+async def test_release_restores_blob_referenced_meanwhile(fake_db, fake_storage):
+    fake_storage.objects[BLOB_PATH] = CONTENT
+
+    # An upload inserts its row after the reference count but before the blob is deleted
+    fake_storage.before_move = lambda request: fake_db.insert('files', storage_path=BLOB_KEY, deleted_at=None)
+    released = await release_blob(BLOB_KEY)
+
+    assert not released
+    assert fake_storage.objects == {BLOB_PATH: CONTENT}
+
+async def test_retain_uploads_blob_released_before_row_was_inserted(fake_db, fake_storage, deduplicated):
+    assert await retain_blob(BLOB_KEY, io.BytesIO(CONTENT), 'application/pdf')
+    assert fake_storage.objects == {BLOB_PATH: CONTENT}
+
+    # Without the content a missing blob can only be reported
+    del fake_storage.objects[BLOB_PATH]
+    assert not await retain_blob(BLOB_KEY)
@@ -0,0 +1,104 @@
+from app.services import conversation_history, gemini
+from app.services.message_writer import message_writer
+
+from tests.conftest import USER
+
+def seed_conversation(fake_db, count, **fields):
+    conversation = fake_db.insert(
+        'chat_conversations',
+        user_id=USER.id,
+        agent_id='agent-1',
+        startup_id=None,
+        last_message_at=fake_db.timestamp(),
+        **fields
+    )
+    for index in range(count):
+        fake_db.insert(
+            'chat_messages',
+            conversation_id=conversation['id'],
+            content=f'message {index}',
+            sender='user' if index % 2 == 0 else 'agent'
+        )
+    return conversation
+
+def test_history_pages_back_through_long_conversation(api, fake_db):
+    seed_conversation(fake_db, 120)
+
+    pages, params = [], {'agent_id': 'agent-1'}
+    while True:
+        body = api.get('/api/chat/history', params=params).json()
+        pages.insert(0, [message['content'] for message in body['messages']])
+        if not body['has_more']:
+            break
+        params = {'agent_id': 'agent-1', 'before': body['before_cursor']}
+
+    assert [len(page) for page in pages] == [20, 50, 50]
+    assert sum(pages, []) == [f'message {index}' for index in range(120)]
+
+def test_chat_without_client_history_sends_whole_conversation(api, fake_db, monkeypatch):
+    seed_conversation(fake_db, 120)
+    sent = {}
+
+    async def generate_reply(request, summary=None):
+        sent['history'] = [message.content for message in request.conversationHistory]
+        return 'reply'
+    monkeypatch.setattr(gemini, 'generate_reply', generate_reply)
+
+    response = api.post('/api/chat', json={'message': 'next', 'systemPrompt': 'prompt', 'agentId': 'agent-1'})
+
+    assert response.status_code == 200
+    assert sent['history'] == [f'message {index}' for index in range(120)]
+
+def test_chat_without_client_history_skips_summarized_messages(api, fake_db, monkeypatch):
+    seed_conversation(fake_db, 120, history_summary='earlier turns', history_summary_count=30)
+    sent = {}
+
+    async def generate_reply(request, summary=None):
+        sent['history'] = [message.content for message in request.conversationHistory]
+        sent['summary'] = summary
+        return 'reply'
+    monkeypatch.setattr(gemini, 'generate_reply', generate_reply)
+
+    api.post('/api/chat', json={'message': 'next', 'systemPrompt': 'prompt', 'agentId': 'agent-1'})
+
+    assert sent['summary'] == 'earlier turns'
+    assert sent['history'] == [f'message {index}' for index in range(30, 120)]
+
+def test_queued_messages_are_read_before_they_are_written(api, fake_db, monkeypatch):
+    seed_conversation(fake_db, 2)
+    sent = {}
+
+    async def generate_reply(request, summary=None):
+        sent['history'] = [message.content for message in request.conversationHistory]
+        return f'reply to {request.message}'
+    monkeypatch.setattr(gemini, 'generate_reply', generate_reply)
+    # Keep the turn's messages queued in the writer until shutdown
+    monkeypatch.setattr(message_writer, 'flush_interval', 3600)
+
+    api.post('/api/chat', json={'message': 'first', 'systemPrompt': 'prompt', 'agentId': 'agent-1'})
+    assert len(fake_db.rows('chat_messages')) == 2
+
+    # As after the tail cache evicted the conversation
+    conversation_history.tail_cache.clear()
+    api.post('/api/chat', json={'message': 'second', 'systemPrompt': 'prompt', 'agentId': 'agent-1'})
+    assert sent['history'] == ['message 0', 'message 1', 'first', 'reply to first']
+
+    body = api.get('/api/chat/history', params={'agent_id': 'agent-1', 'limit': 3}).json()
+    assert [message['content'] for message in body['messages']] == ['reply to first', 'second', 'reply to second']
+    body = api.get('/api/chat/history', params={'agent_id': 'agent-1', 'before': body['before_cursor']}).json()
+    assert [message['content'] for message in body['messages']] == ['message 0', 'message 1', 'first']
+    assert not body['has_more']
+
+def test_naive_since_is_compared_as_utc_with_queued_messages(api, fake_db, monkeypatch):
+    seed_conversation(fake_db, 2)
+
+    async def generate_reply(request, summary=None):
+        return 'reply'
+    monkeypatch.setattr(gemini, 'generate_reply', generate_reply)
+    monkeypatch.setattr(message_writer, 'flush_interval', 3600)
+    api.post('/api/chat', json={'message': 'queued', 'systemPrompt': 'prompt', 'agentId': 'agent-1'})
+
+    # Seeded rows are from 2024-01-01; the queued ones are from now
+    response = api.get('/api/chat/history', params={'agent_id': 'agent-1', 'since': '2024-06-01T00:00:00'})
+    assert response.status_code == 200
+    assert [message['content'] for message in response.json()['messages']] == ['queued', 'reply']
@@ -0,0 +1,32 @@
+import json
+
+from app.core.database import database
+from app.core.supabase import SUPABASE_ANON_KEY, SUPABASE_SERVICE_KEY
+from app.repositories import conversation_repository
+from app.services import gemini
+
+async def test_user_queries_send_anon_key_with_user_token(fake_db):
+    await database.table('invitations', access_token='user-token').select('id').execute()
+    await database.table('invitations').select('id').execute()
+
+    user, service = fake_db.requests
+    assert (user.headers['authorization'], user.headers['apikey']) == ('Bearer user-token', SUPABASE_ANON_KEY)
+    assert (service.headers['authorization'], service.headers['apikey']) == (f'Bearer {SUPABASE_SERVICE_KEY}', SUPABASE_SERVICE_KEY)
+
+def test_conversations_work_without_summary_columns(api, fake_db, monkeypatch):
+    async def stream_reply(request, timings, summary=None):
+        yield 'hel'
+        yield 'lo'
+    monkeypatch.setattr(gemini, 'stream_reply', stream_reply)
+    monkeypatch.setattr(conversation_repository, 'summaries_available', True)
+    fake_db.missing_columns['chat_conversations'] = ['history_summary', 'history_summary_count']
+
+    # As at startup
+    api.portal.call(conversation_repository.check_schema)
+    assert not conversation_repository.summaries_available
+
+    response = api.post('/api/chat/stream', json={'message': 'hi', 'systemPrompt': 'prompt', 'agentId': 'agent-1'})
+    assert response.status_code == 200
+    done = response.text.split('event: done\ndata: ')[1]
+    assert json.loads(done)['response'] == 'hello'
+    assert len(fake_db.rows('chat_conversations')) == 1
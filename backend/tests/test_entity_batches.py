@@ -0,0 +1,81 @@
+import pytest
+
+@pytest.fixture(autouse=True)
+def entity_functions(fake_db):
+    """Mirror list_entity_files / list_entity_documents from add_entity_page_functions.sql"""
+    def list_entity_rows(table, live):
+        def function(arguments):
+            result = []
+            for key in arguments['keys']:
+                rows = [
+                    row for row in fake_db.rows(table)
+                    if row['entity_type'] == key['entity_type'] and row['entity_id'] == key['entity_id']
+                    and key.get('entity_field') in (None, row.get('entity_field'))
+                    and arguments['filter_category'] in (None, row.get('category'))
+                    and not (live and row.get('deleted_at'))
+                    and (key.get('created_at') is None or (row['created_at'], row['id']) < (key['created_at'], key['id']))
+                ]
+                rows.sort(key=lambda row: (row['created_at'], row['id']), reverse=True)
+                result += rows[:arguments['per_key']]
+            return result
+        return function
+
+    fake_db.functions['list_entity_files'] = list_entity_rows('files', live=True)
+    fake_db.functions['list_entity_documents'] = list_entity_rows('documents', live=False)
+
+def attach_files(fake_db, entity_id, count):
+    for index in range(count):
+        fake_db.insert(
+            'files',
+            filename=f'{entity_id}-{index}.pdf',
+            storage_path=f'startups/{entity_id}-{index}.pdf',
+            mime_type='application/pdf',
+            is_public=False,
+            entity_type='startup',
+            entity_id=entity_id,
+            deleted_at=None
+        )
+
+def test_busy_entity_does_not_crowd_out_others(api, fake_db):
+    attach_files(fake_db, 'quiet', 2)
+    attach_files(fake_db, 'busy', 30)
+
+    keys = [{'entity_type': 'startup', 'entity_id': 'busy'}, {'entity_type': 'startup', 'entity_id': 'quiet'}]
+    fake_db.requests.clear()
+    body = api.post('/api/files/entities', json={'keys': keys, 'limit': 10, 'fields': 'filename'}).json()
+    assert len(fake_db.requests) == 1
+
+    busy, quiet = body['groups']
+    assert [file['filename'] for file in quiet['files']] == ['quiet-1.pdf', 'quiet-0.pdf']
+    assert not quiet['has_more']
+    assert len(busy['files']) == 10 and busy['has_more']
+    assert body['has_more']
+    assert all(file['signed_url'] for file in busy['files'] + quiet['files'])
+
+def test_each_key_pages_with_its_own_cursor(api, fake_db):
+    attach_files(fake_db, 'busy', 25)
+
+    names, key = [], {'entity_type': 'startup', 'entity_id': 'busy'}
+    while True:
+        group = api.post('/api/files/entities', json={'keys': [key], 'limit': 10}).json()['groups'][0]
+        names += [file['filename'] for file in group['files']]
+        if not group['has_more']:
+            break
+        key = {**key, 'cursor': group['next_cursor']}
+
+    assert names == [f'busy-{index}.pdf' for index in reversed(range(25))]
+
+def test_document_keys_with_and_without_field_overlap(api, fake_db):
+    for index in range(3):
+        fake_db.insert('documents', filename=f'deck-{index}.pdf', entity_type='startup', entity_id='s1', entity_field='deck')
+    fake_db.insert('documents', filename='logo.png', entity_type='startup', entity_id='s1', entity_field='logo')
+
+    keys = [
+        {'entity_type': 'startup', 'entity_id': 's1'},
+        {'entity_type': 'startup', 'entity_id': 's1', 'entity_field': 'deck'},
+    ]
+    every, deck = api.post('/api/documents/entities', json={'keys': keys, 'limit': 2, 'fields': 'filename'}).json()['groups']
+
+    assert [doc['filename'] for doc in every['documents']] == ['logo.png', 'deck-2.pdf'] and every['has_more']
+    assert [doc['filename'] for doc in deck['documents']] == ['deck-2.pdf', 'deck-1.pdf'] and deck['has_more']
+    assert set(every['documents'][0]) == {'id', 'created_at', 'filename', 'url'}
@@ -0,0 +1,10 @@
+from fastapi.testclient import TestClient
+
+from app.main import app
+
+def test_metrics_require_authentication():
+    assert TestClient(app).get('/health/metrics').status_code == 401
+
+def test_metrics_for_authenticated_users(api):
+    body = api.get('/health/metrics').json()
+    assert 'database' in body and 'chat' in body
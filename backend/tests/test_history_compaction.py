@@ -0,0 +1,58 @@
+import asyncio
+
+from app.core.config import settings
+from app.models.chat import ChatMessage, ChatRequest
+from app.repositories import conversation_repository
+from app.services import gemini, history_compaction
+
+def test_window_keeps_the_newest_messages_that_fit(monkeypatch):
+    monkeypatch.setattr(settings, 'CHAT_HISTORY_TOKEN_BUDGET', 100)
+    monkeypatch.setattr(settings, 'CHAT_HISTORY_SUMMARY_MAX_TOKENS', 20)
+    monkeypatch.setattr(settings, 'CHAT_HISTORY_RECENT_MESSAGES', 5)
+    # 11 estimated tokens each
+    history = [ChatMessage(role='user', content='x' * 40) for _ in range(10)]
+
+    # 100 - 10 fixed - 20 summary leaves room for 6 messages, capped at the 5 most recent
+    assert history_compaction._window_start(history, 0, 10) == 5
+    # ...and for 3 when the fixed part grows
+    assert history_compaction._window_start(history, 0, 40) == 7
+    # Never before the summarized prefix, and empty when nothing fits
+    assert history_compaction._window_start(history, 8, 10) == 8
+    assert history_compaction._window_start(history, 0, 75) == 10
+
+async def test_summary_is_generated_in_the_background_and_applied_next_turn(monkeypatch):
+    monkeypatch.setattr(settings, 'CHAT_HISTORY_TOKEN_BUDGET', 100)
+    monkeypatch.setattr(settings, 'CHAT_HISTORY_SUMMARY_MAX_TOKENS', 20)
+    monkeypatch.setattr(settings, 'CHAT_HISTORY_RECENT_MESSAGES', 5)
+    monkeypatch.setattr(conversation_repository, 'summaries_available', True)
+    release, calls, saved = asyncio.Event(), [], []
+
+    async def summarize(summary, messages):
+        calls.append(len(messages))
+        await release.wait()
+        return 'earlier turns'
+    monkeypatch.setattr(gemini, 'summarize', summarize)
+
+    async def save_summary(conversation_id, summary, count):
+        saved.append((conversation_id, summary, count))
+    monkeypatch.setattr(conversation_repository, 'save_summary', save_summary)
+
+    conversation = {'id': 'conversation-1'}
+    request = ChatRequest(
+        message='next', systemPrompt='prompt', agentId='agent-1',
+        conversationHistory=[ChatMessage(role='user', content='x' * 40) for _ in range(10)]
+    )
+
+    # The over-budget turn is not held up by the summary, and a second one doesn't start another
+    compacted, summary = await history_compaction.compact_history(request, conversation)
+    assert (len(compacted.conversationHistory), summary) == (5, None)
+    await history_compaction.compact_history(request, conversation)
+    await asyncio.sleep(0)
+    assert calls == [5]
+
+    release.set()
+    await history_compaction.close()
+    assert saved == [('conversation-1', 'earlier turns', 5)]
+
+    compacted, summary = await history_compaction.compact_history(request, conversation)
+    assert (len(compacted.conversationHistory), summary) == (5, 'earlier turns')
@@ -0,0 +1,20 @@
+from app.repositories import message_repository
+from app.services import conversation_history
+from app.services.message_writer import message_writer
+
+async def test_dropped_batch_evicts_cached_tail(fake_db, monkeypatch):
+    async def insert_batch(batch):
+        raise RuntimeError('database unavailable')
+    monkeypatch.setattr(message_repository, 'insert_batch', insert_batch)
+    monkeypatch.setattr(message_writer, 'max_retries', 0)
+    monkeypatch.setattr(message_writer, 'dropped', 0)
+
+    await conversation_history.load_history('conversation-1')
+    message_writer.enqueue('conversation-1', 'hi', 'user')
+    conversation_history.record_message('conversation-1', 'hi', 'user')
+    assert conversation_history.tail_cache.get('conversation-1').total == 1
+
+    await message_writer.close()
+
+    assert message_writer.dropped == 1
+    assert conversation_history.tail_cache.get('conversation-1') is None
@@ -0,0 +1,34 @@
+import time
+
+import pytest
+
+from app.services.resumable_upload import ResumableUploadError, ResumableUploadService
+
+CLAIMS = {'path': 'documents/deck.pdf', 'exp': time.time() + 3600, 'max_size': 1024, 'content_type': 'application/pdf'}
+
+@pytest.fixture
+def uploads(tmp_path, monkeypatch):
+    monkeypatch.setenv('UPLOAD_STAGING_DIR', str(tmp_path))
+    monkeypatch.setenv('UPLOAD_PART_SIZE', '4')
+    return ResumableUploadService()
+
+async def chunks(data):
+    yield data
+
+async def test_retried_initiate_resumes_the_tokens_session(uploads):
+    first = uploads.initiate(CLAIMS, 'deck.pdf', 10, 'application/pdf', 'documents', None, None)
+    await uploads.write_part(first['upload_id'], 1, chunks(b'%PDF'))
+
+    retried = uploads.initiate(CLAIMS, 'deck.pdf', 10, None, 'documents', None, None)
+    assert retried['upload_id'] == first['upload_id']
+    assert uploads.status(retried['upload_id'])['received_parts'] == [1]
+    assert len(list(uploads.staging_dir.iterdir())) == 1
+
+    other = uploads.initiate({**CLAIMS, 'path': 'documents/other.pdf'}, 'other.pdf', 10, None, 'documents', None, None)
+    assert other['upload_id'] != first['upload_id']
+
+def test_initiate_rejects_different_file_for_same_token(uploads):
+    uploads.initiate(CLAIMS, 'deck.pdf', 10, None, 'documents', None, None)
+    with pytest.raises(ResumableUploadError) as error:
+        uploads.initiate(CLAIMS, 'deck.pdf', 12, None, 'documents', None, None)
+    assert error.value.status_code == 409
@@ -0,0 +1,15 @@
+import httpx
+
+from app.services.storage import async_storage_service
+
+def test_signed_url_is_only_cached_privately_until_it_expires(api, fake_storage):
+    fake_storage.objects[f'{async_storage_service.base_path}/startups/deck.pdf'] = b'pitch deck'
+    url = async_storage_service.generate_presigned_url('startups/deck.pdf', expires_in=600)
+
+    response = api.get(httpx.URL(url).path)
+
+    assert response.status_code == 200
+    assert response.content == b'pitch deck'
+    cache_control = response.headers['Cache-Control']
+    assert cache_control.startswith('private, max-age=')
+    assert 590 <= int(cache_control.rsplit('=', 1)[1]) <= 600
@@ -0,0 +1,13 @@
+import io
+
+from app.services.storage import async_storage_service
+
+def test_startup_creates_base_collection_for_uploads(api, fake_storage):
+    base = async_storage_service.base_path
+    assert [request.url.path for request in fake_storage.requests if request.method == 'MKCOL'] == [base]
+
+    fake_storage.requests.clear()
+    api.portal.call(async_storage_service.upload_file, io.BytesIO(b'pitch'), 'deck.pdf', 'documents')
+
+    created = [request.url.path for request in fake_storage.requests if request.method == 'MKCOL']
+    assert base not in created
@@ -14,6 +14,9 @@ interface ChatContextType {
     sendProgrammaticMessage: (content: string, systemPrompt: string, agentId: string, startupId?: string) => Promise<void>;
     clearMessages: () => void;
     loadConversation: (agentId: string, startupId?: string) => Promise<void>;
+    loadOlderMessages: () => Promise<void>;
+    hasOlderMessages: boolean;
+    isLoadingOlder: boolean;
     isLoading: boolean;
     isMobileKeyboardVisible: boolean;
     setMobileKeyboardVisible: (visible: boolean) => void;
@@ -29,6 +32,38 @@ export const useChatContext = () => {
     return context;
 };
 
+// Fetch one page of conversation history, the latest or the one before a cursor
+const fetchHistoryPage = async (token: string, agentId: string, startupId?: string, before?: string) => {
+    const params = new URLSearchParams({ agent_id: agentId });
+    if (startupId) {
+        params.set('startup_id', startupId);
+    }
+    if (before) {
+        params.set('before', before);
+    }
+
+    const response = await fetch(`/api/chat/history?${params}`, {
+        headers: {
+            'Authorization': `Bearer ${token}`
+        }
+    });
+
+    if (!response.ok) {
+        throw new Error('Failed to load conversation');
+    }
+
+    const data = await response.json();
+
+    // Convert backend messages to UI messages
+    const pageMessages: Message[] = data.messages.map((msg: any) => ({
+        id: msg.id,
+        content: msg.content,
+        sender: msg.sender,
+        timestamp: new Date(msg.created_at),
+    }));
+    return { pageMessages, olderCursor: data.has_more ? data.before_cursor as string : null };
+};
+
 interface ChatProviderProps {
     children: ReactNode;
 }
@@ -37,6 +72,9 @@ export const ChatProvider: React.FC<ChatProviderProps> = ({ children }) => {
     const [messages, setMessages] = useState<Message[]>([]);
     const [isLoading, setIsLoading] = useState(false);
     const [isMobileKeyboardVisible, setIsMobileKeyboardVisible] = useState(false);
+    const [conversation, setConversation] = useState<{ agentId: string; startupId?: string } | null>(null);
+    const [olderCursor, setOlderCursor] = useState<string | null>(null);
+    const [isLoadingOlder, setIsLoadingOlder] = useState(false);
 
     const addMessage = useCallback((message: Message) => {
         setMessages(prev => [...prev, message]);
@@ -44,10 +82,13 @@ export const ChatProvider: React.FC<ChatProviderProps> = ({ children }) => {
 
     const clearMessages = useCallback(() => {
         setMessages([]);
+        setOlderCursor(null);
     }, []);
 
-    // Load conversation history from backend
+    // Load the latest page of conversation history from backend; older pages load on demand
     const loadConversation = useCallback(async (agentId: string, startupId?: string) => {
+        setConversation({ agentId, startupId });
+        setOlderCursor(null);
         try {
             // Get auth token
             const { data: { session } } = await supabase.auth.getSession();
@@ -59,28 +100,9 @@ export const ChatProvider: React.FC<ChatProviderProps> = ({ children }) => {
                 return;
             }
 
-            // Call backend to get conversation history
-            const response = await fetch(`/api/chat/history?agent_id=${agentId}${startupId ? `&startup_id=${startupId}` : ''}`, {
-                headers: {
-                    'Authorization': `Bearer ${token}`
-                }
-            });
-
-            if (!response.ok) {
-                throw new Error('Failed to load conversation');
-            }
-
-            const data = await response.json();
-
-            // Convert backend messages to UI messages
-            const loadedMessages: Message[] = data.messages.map((msg: any) => ({
-                id: msg.id,
-                content: msg.content,
-                sender: msg.sender,
-                timestamp: new Date(msg.created_at),
-            }));
-
-            setMessages(loadedMessages);
+            const { pageMessages, olderCursor } = await fetchHistoryPage(token, agentId, startupId);
+            setMessages(pageMessages);
+            setOlderCursor(olderCursor);
         } catch (error) {
             console.error('Error loading conversation:', error);
             // Continue without persistence on error
@@ -88,6 +110,30 @@ export const ChatProvider: React.FC<ChatProviderProps> = ({ children }) => {
         }
     }, []);
 
+    // Prepend the page of history before the oldest loaded message
+    const loadOlderMessages = useCallback(async () => {
+        if (!conversation || !olderCursor || isLoadingOlder) {
+            return;
+        }
+
+        setIsLoadingOlder(true);
+        try {
+            const { data: { session } } = await supabase.auth.getSession();
+            const token = session?.access_token;
+            if (!token) {
+                return;
+            }
+
+            const page = await fetchHistoryPage(token, conversation.agentId, conversation.startupId, olderCursor);
+            setMessages(prev => [...page.pageMessages, ...prev]);
+            setOlderCursor(page.olderCursor);
+        } catch (error) {
+            console.error('Error loading earlier messages:', error);
+        } finally {
+            setIsLoadingOlder(false);
+        }
+    }, [conversation, olderCursor, isLoadingOlder]);
+
     const sendProgrammaticMessage = useCallback(async (content: string, systemPrompt: string, agentId: string, startupId?: string) => {
         // Only show the user's question, not the system prompt
         const userMessage: Message = {
@@ -105,8 +151,9 @@ export const ChatProvider: React.FC<ChatProviderProps> = ({ children }) => {
             const { data: { session } } = await supabase.auth.getSession();
             const token = session?.access_token;
 
-            // Get current messages for conversation history
-            const conversationHistory = messages.map(msg => ({
+            // Signed-in conversations are persisted, so the backend loads their history itself.
+            // Anonymous chats have no stored conversation and send what's on screen.
+            const conversationHistory = token ? undefined : messages.map(msg => ({
                 role: msg.sender === 'user' ? 'user' : 'assistant',
                 content: msg.content,
             }));
@@ -166,6 +213,9 @@ export const ChatProvider: React.FC<ChatProviderProps> = ({ children }) => {
             sendProgrammaticMessage,
             clearMessages,
             loadConversation,
+            loadOlderMessages,
+            hasOlderMessages: olderCursor !== null,
+            isLoadingOlder,
             isLoading,
             isMobileKeyboardVisible,
             setMobileKeyboardVisible: setIsMobileKeyboardVisible,
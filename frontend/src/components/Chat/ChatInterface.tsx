@@ -28,7 +28,7 @@ interface ChatInterfaceProps {
 }
 
 const ChatInterface: React.FC<ChatInterfaceProps> = ({ selectedAgent, onAgentChange, isMobile = false }) => {
-    const { messages, addMessage, sendProgrammaticMessage, clearMessages, loadConversation, isLoading, setMobileKeyboardVisible } = useChatContext();
+    const { messages, addMessage, sendProgrammaticMessage, clearMessages, loadConversation, loadOlderMessages, hasOlderMessages, isLoadingOlder, isLoading, setMobileKeyboardVisible } = useChatContext();
     const { startup } = useAuthContext();
     const [inputValue, setInputValue] = useState('');
     const messagesEndRef = useRef<HTMLDivElement>(null);
@@ -61,9 +61,11 @@ const ChatInterface: React.FC<ChatInterfaceProps> = ({ selectedAgent, onAgentCha
         messagesEndRef.current?.scrollIntoView({ behavior: 'smooth' });
     };
 
+    // Follow new messages, but stay put when earlier ones are prepended
+    const lastMessageId = messages[messages.length - 1]?.id;
     useEffect(() => {
         scrollToBottom();
-    }, [messages]);
+    }, [lastMessageId]);
 
     // Auto-scroll to bottom when keyboard appears on mobile and notify about keyboard visibility
     useEffect(() => {
@@ -371,6 +373,16 @@ ${assessmentExport}`;
                         minHeight: 0, // Allow flex item to shrink
                     }}
                 >
+                    {hasOlderMessages && (
+                        <Button
+                            size="small"
+                            onClick={loadOlderMessages}
+                            disabled={isLoadingOlder}
+                            sx={{ alignSelf: 'center' }}
+                        >
+                            {isLoadingOlder ? <CircularProgress size={16} /> : 'Load earlier messages'}
+                        </Button>
+                    )}
                     {messages.map((message) => (
                         <Box
                             key={message.id}
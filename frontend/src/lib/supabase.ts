@@ -2199,19 +2199,27 @@ export async function deleteDocument(documentId: string): Promise<void> {
   }
 }
 
+// One page of an entity's documents, newest first; pass nextCursor back to get the next page
+export type EntityDocumentPage = {
+  documents: Document[];
+  nextCursor: string | null;
+};
+
 export async function getEntityDocuments(
   entityType: string,
   entityId: string,
-  entityField?: string
-): Promise<Document[]> {
+  entityField?: string,
+  cursor?: string
+): Promise<EntityDocumentPage> {
   try {
     const backendUrl = import.meta.env.VITE_BACKEND_URL || 'http://localhost:8000';
 
     // Build query params
     const params = new URLSearchParams();
     if (entityField) params.append('entity_field', entityField);
+    if (cursor) params.append('cursor', cursor);
 
-    // Fetch from backend
+    // Fetch one page from backend; the next page's cursor comes in X-Next-Cursor
     const response = await fetch(
       `${backendUrl}/api/documents/entity/${entityType}/${entityId}?${params}`,
       {
@@ -2227,22 +2235,26 @@ export async function getEntityDocuments(
     const documents = await response.json();
 
     // Add URLs to each document
-    return documents.map((doc: any) => ({
-      ...doc,
-      url: getDocumentUrl(doc.id)
-    }));
+    return {
+      documents: documents.map((doc: any) => ({
+        ...doc,
+        url: getDocumentUrl(doc.id)
+      })),
+      nextCursor: response.headers.get('X-Next-Cursor'),
+    };
   } catch (error) {
     console.error('Error fetching entity documents:', error);
-    return [];
+    return { documents: [], nextCursor: null };
   }
 }
 
 // Convenience function for startup method documents
 export async function getStartupMethodDocuments(
   startupMethodId: string,
-  field: string = 'resultFiles'
-): Promise<Document[]> {
-  return getEntityDocuments('startup_method', startupMethodId, field);
+  field: string = 'resultFiles',
+  cursor?: string
+): Promise<EntityDocumentPage> {
+  return getEntityDocuments('startup_method', startupMethodId, field, cursor);
 }
 
 // ============================================================================